@@ -0,0 +1,95 @@
+"""
+Benchmark del tempo di caricamento della galleria all'avvio.
+
+Confronta, per gallerie sintetiche di diverse dimensioni:
+- pickle: la vecchia cache (unpickle di matrice e nomi, poi copia nella galleria)
+- npy: lettura completa dell'istantanea .npy in memoria
+- mmap: istantanea mappata in memoria (leggi_istantanea + imposta_mappata),
+  il percorso usato da RiconoscitoreFacciale.carica_volti_noti
+
+I file sono appena scritti, quindi già nella page cache: i tempi misurano il
+costo di deserializzazione e copia, non la lettura dal disco.
+
+Uso:
+    python benchmarks/benchmark_avvio_galleria.py --volti 1000 10000 100000
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.utils.GalleriaEmbeddings import GalleriaEmbeddings, normalizza_righe
+from src.utils.istantanea_galleria import leggi_istantanea, scrivi_istantanea, stato_cartella
+
+
+def cronometra(funzione, ripetizioni):
+    """Tempo minimo di esecuzione in ms su più ripetizioni."""
+    tempi = []
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        funzione()
+        tempi.append(time.perf_counter() - inizio)
+    return min(tempi) * 1000
+
+
+def prepara(directory, numero_volti, dimensione):
+    """Scrive la vecchia cache pickle e l'istantanea della galleria."""
+    rng = np.random.default_rng(0)
+    matrice = normalizza_righe(rng.standard_normal((numero_volti, dimensione)).astype(np.float32))
+    nomi = [f'persona_{i:06d}' for i in range(numero_volti)]
+
+    cartella = os.path.join(directory, 'volti')
+    os.makedirs(cartella)
+
+    percorso_pickle = os.path.join(directory, 'cache.pkl')
+    with open(percorso_pickle, 'wb') as f:
+        pickle.dump({'embeddings': matrice, 'nomi': nomi, 'modello': 'sintetico'}, f)
+
+    scrivi_istantanea(directory, cartella, stato_cartella(cartella), matrice, nomi, 'sintetica')
+    return cartella, percorso_pickle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--volti', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--dimensione', type=int, default=512)
+    parser.add_argument('--ripetizioni', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'volti':>8}{'pickle ms':>12}{'npy ms':>10}{'mmap ms':>10}{'speedup':>10}")
+
+    for numero_volti in args.volti:
+        with tempfile.TemporaryDirectory() as directory:
+            cartella, percorso_pickle = prepara(directory, numero_volti, args.dimensione)
+
+            def carica_pickle():
+                with open(percorso_pickle, 'rb') as f:
+                    dati = pickle.load(f)
+                GalleriaEmbeddings().imposta(dati['embeddings'], list(dati['nomi']))
+
+            def carica_npy():
+                matrice, nomi, _ = leggi_istantanea(directory, cartella)
+                GalleriaEmbeddings().imposta(np.array(matrice), nomi)
+
+            def carica_mmap():
+                matrice, nomi, _ = leggi_istantanea(directory, cartella)
+                GalleriaEmbeddings().imposta_mappata(matrice, nomi)
+
+            tempo_pickle = cronometra(carica_pickle, args.ripetizioni)
+            tempo_npy = cronometra(carica_npy, args.ripetizioni)
+            tempo_mmap = cronometra(carica_mmap, args.ripetizioni)
+
+            print(f"{numero_volti:>8}{tempo_pickle:>12.2f}{tempo_npy:>10.2f}{tempo_mmap:>10.2f}"
+                  f"{tempo_pickle / tempo_mmap:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
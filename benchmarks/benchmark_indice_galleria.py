@@ -0,0 +1,87 @@
+"""
+Benchmark recall-latenza dell'indice approssimato (IVF) rispetto alla ricerca esatta.
+
+Genera una galleria sintetica di embeddings normalizzati raggruppati per
+identità e misura, per diversi valori di nprobe, la latenza media per query e
+la recall@1 rispetto all'indice esatto.
+
+Uso:
+    python benchmarks/benchmark_indice_galleria.py --volti 100000 --query 500
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.utils.GalleriaEmbeddings import GalleriaEmbeddings, normalizza_righe
+from src.utils.IndiceGalleria import IndiceFlat, IndiceIVF
+
+
+def genera_galleria(numero_volti, dimensione, seed=0):
+    """Crea embeddings sintetici con una struttura a cluster simile a quella reale."""
+    rng = np.random.default_rng(seed)
+    numero_cluster = max(1, numero_volti // 1000)
+
+    centri = normalizza_righe(rng.standard_normal((numero_cluster, dimensione)).astype(np.float32))
+    appartenenza = rng.integers(0, numero_cluster, numero_volti)
+    rumore = rng.standard_normal((numero_volti, dimensione)).astype(np.float32) * (1.0 / np.sqrt(dimensione))
+
+    return normalizza_righe(centri[appartenenza] + rumore)
+
+
+def genera_query(galleria, numero_query, seed=1):
+    """Crea query come versioni perturbate di volti della galleria."""
+    rng = np.random.default_rng(seed)
+    indici = rng.choice(len(galleria), numero_query, replace=False)
+    rumore = rng.standard_normal((numero_query, galleria.dimensione)).astype(np.float32) * (0.6 / np.sqrt(galleria.dimensione))
+    return normalizza_righe(galleria.matrice[indici] + rumore)
+
+
+def misura(indice, query, dimensione_batch):
+    """Restituisce (indici trovati, latenza media per query in ms)."""
+    risultati = []
+    inizio = time.perf_counter()
+    for posizione in range(0, len(query), dimensione_batch):
+        indici, _ = indice.cerca(query[posizione:posizione + dimensione_batch])
+        risultati.append(indici)
+    durata = time.perf_counter() - inizio
+    return np.concatenate(risultati), durata / len(query) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--volti', type=int, default=100000)
+    parser.add_argument('--dimensione', type=int, default=512)
+    parser.add_argument('--query', type=int, default=500)
+    parser.add_argument('--batch', type=int, default=1, help="Query per chiamata a cerca()")
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    galleria = GalleriaEmbeddings()
+    galleria.aggiungi_molti(genera_galleria(args.volti, args.dimensione), [str(i) for i in range(args.volti)])
+    query = genera_query(galleria, args.query)
+
+    esatto, latenza_esatta = misura(IndiceFlat(galleria), query, args.batch)
+    print(f"Galleria: {args.volti} volti x {args.dimensione}, {args.query} query (batch {args.batch})")
+    print(f"{'indice':<14}{'recall@1':>10}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'flat':<14}{1.0:>10.3f}{latenza_esatta:>12.3f}{1.0:>10.1f}")
+
+    ivf = IndiceIVF(galleria, minimo_addestramento=0)
+    inizio = time.perf_counter()
+    ivf.ricostruisci()
+    print(f"Addestramento IVF ({len(ivf.centroidi)} liste): {time.perf_counter() - inizio:.2f}s")
+
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        trovati, latenza = misura(ivf, query, args.batch)
+        recall = float(np.mean(trovati == esatto))
+        print(f"{f'ivf/{nprobe}':<14}{recall:>10.3f}{latenza:>12.3f}{latenza_esatta / latenza:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,460 @@
+"""
+Suite di benchmark offline dei percorsi critici del riconoscimento.
+
+Misura, senza download e senza rete:
+- rilevamento_volti: _rileva_volti_semplice sulle immagini di data/volti
+- preprocessing: _preprocessa_immagine_onnx su un volto ritagliato
+- embedding: _estrai_embedding_onnx su un volto (rilevamento e inferenza) e
+  embeddings_volti a batch (solo inferenza)
+- identificazione: identifica_volto (volto ritagliato letto da file) e
+  identifica_embeddings (solo matching) con gallerie sintetiche da 10 a
+  100000 volti
+- cache: scrittura e lettura di CacheEmbeddings, caricamento della galleria
+  di data/volti a freddo (cache vuota) e dall'istantanea
+- pipeline: frame al secondo di processa_rilevazioni su frame sintetici
+  composti con le immagini di data/volti, seriale e con la pipeline parallela,
+  con l'accelerazione rispetto a un worker e i worker occupati in media
+  (tempo di rilevamento volti, preprocessing e inferenza / durata): su una
+  macchina con un solo core la pipeline non può accelerare, ma i worker
+  occupati mostrano se il lavoro viene distribuito
+
+Il modello di riconoscimento è il modello minimo versionato in
+benchmarks/modelli (vedi genera_modello_minimo.py) e la cache degli
+embeddings viene scritta in una cartella temporanea, quindi la suite non
+tocca data/cache e dà risultati confrontabili su qualsiasi macchina.
+
+Con --output i risultati vengono salvati in JSON insieme a commit, versioni
+delle librerie e piattaforma. Con --confronta i tempi mediani (p50) vengono
+confrontati con quelli di un file precedente: il processo termina con
+codice 1 se un caso rallenta oltre --soglia, quindi può essere usato come
+controllo di regressione tra due commit sulla stessa macchina.
+
+Uso:
+    python benchmarks/benchmark_riconoscimento.py --output base.json
+    python benchmarks/benchmark_riconoscimento.py --output nuovo.json --confronta base.json
+    python benchmarks/benchmark_riconoscimento.py --sezioni identificazione --volti 10 1000
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import onnxruntime
+
+RADICE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RADICE))
+
+from src.config.configurazione_attuale import configurazione
+from src.utils import utils
+from src.utils.CacheEmbeddings import CacheEmbeddings
+from src.utils.GalleriaEmbeddings import normalizza_righe
+from src.utils.RiconoscitoreFacciale import RiconoscitoreFacciale
+from src.utils.registrazione_volti import elenca_immagini
+from src.utils.registro_modelli import impronta_modello
+from src.utils.statistiche_attuali import stats
+
+MODELLO_MINIMO = RADICE / 'benchmarks' / 'modelli' / 'volto_minimo.onnx'
+CARTELLA_VOLTI = RADICE / 'data' / 'volti'
+
+# Stadi della pipeline parallela eseguiti sul pool di worker
+STADI_WORKER = ('rilevamento_volti', 'preprocessing', 'inferenza_onnx')
+
+SEZIONI = ('rilevamento', 'preprocessing', 'embedding', 'identificazione', 'cache', 'pipeline')
+VERSIONE_FORMATO = 1
+
+
+@contextlib.contextmanager
+def silenzioso():
+    """Scarta i messaggi stampati dal codice misurato (la scrittura sul terminale falserebbe i tempi)."""
+    with open(os.devnull, 'w') as nulla, contextlib.redirect_stdout(nulla):
+        yield
+
+
+def riepiloga(tempi_ns):
+    """
+    Returns:
+        dict: ripetizioni, media, p50, p95, minimo e massimo in millisecondi
+    """
+    tempi = np.asarray(tempi_ns, dtype=np.float64) / 1e6
+    return {
+        'ripetizioni': len(tempi),
+        'media_ms': float(tempi.mean()),
+        'p50_ms': float(np.percentile(tempi, 50)),
+        'p95_ms': float(np.percentile(tempi, 95)),
+        'minimo_ms': float(tempi.min()),
+        'massimo_ms': float(tempi.max()),
+    }
+
+
+def cronometra(funzione, ripetizioni, riscaldamento=1, prepara=None):
+    """
+    Misura più esecuzioni di una funzione.
+
+    Args:
+        funzione: Funzione senza argomenti da misurare
+        ripetizioni: Esecuzioni misurate
+        riscaldamento: Esecuzioni iniziali non misurate (allocazioni, cache di onnxruntime)
+        prepara: Funzione eseguita prima di ogni esecuzione, fuori dalla misura
+
+    Returns:
+        dict: Riepilogo dei tempi (vedi riepiloga)
+    """
+    tempi = []
+    with silenzioso():
+        for ripetizione in range(riscaldamento + ripetizioni):
+            if prepara is not None:
+                prepara()
+            inizio = time.perf_counter_ns()
+            funzione()
+            durata = time.perf_counter_ns() - inizio
+            if ripetizione >= riscaldamento:
+                tempi.append(durata)
+    return riepiloga(tempi)
+
+
+class Suite:
+    """Stato condiviso dalle sezioni: riconoscitore, immagini di prova e risultati raccolti."""
+
+    def __init__(self, args, directory):
+        self.args = args
+        self.directory = directory
+        self.risultati = []
+
+        with silenzioso():
+            self.riconoscitore = RiconoscitoreFacciale(percorso_modello=str(MODELLO_MINIMO))
+
+        self.percorsi = [str(CARTELLA_VOLTI / file) for _, file in elenca_immagini(str(CARTELLA_VOLTI))]
+        self.immagini = [cv2.imread(percorso) for percorso in self.percorsi]
+        if not self.percorsi or any(immagine is None for immagine in self.immagini):
+            raise SystemExit(f"Immagini di prova non leggibili in {CARTELLA_VOLTI}")
+
+        # Volti ritagliati dal rilevatore: l'input tipico di preprocessing ed embedding
+        self.volti = []
+        for immagine in self.immagini:
+            roi = self.riconoscitore._estrai_roi_volto(immagine)
+            self.volti.append(roi[0] if roi is not None else immagine)
+
+        # identifica_volto legge i volti ritagliati dal disco, come i ritagli salvati delle persone
+        self.percorsi_volti = []
+        for numero, volto in enumerate(self.volti):
+            percorso = os.path.join(directory, f'volto_{numero}.jpg')
+            cv2.imwrite(percorso, volto)
+            self.percorsi_volti.append(percorso)
+
+        self.dimensione = len(self.riconoscitore.embeddings_volti(self.volti[:1])[0])
+
+    def registra(self, caso, tempi, **parametri):
+        """Aggiunge un risultato e lo stampa."""
+        al_secondo = parametri.pop('al_secondo', None)
+        risultato = {'caso': caso, 'parametri': parametri, **tempi}
+        if al_secondo is not None:
+            risultato['al_secondo'] = al_secondo
+        self.risultati.append(risultato)
+
+        descrizione = ' '.join(f'{chiave}={valore}' for chiave, valore in parametri.items())
+        colonna_al_secondo = f'{al_secondo:>12.1f}' if al_secondo is not None else ''
+        print(f"{caso:<24}{descrizione:<34}{tempi['p50_ms']:>11.3f}{tempi['p95_ms']:>11.3f}"
+              f"{tempi['media_ms']:>11.3f}{colonna_al_secondo}")
+
+    def rilevamento(self):
+        immagini = itertools.cycle(self.immagini)
+        tempi = cronometra(lambda: self.riconoscitore._rileva_volti_semplice(next(immagini)), self.args.ripetizioni)
+        self.registra('rilevamento_volti', tempi, rilevatore=self.riconoscitore.rilevatore.nome)
+
+    def preprocessing(self):
+        volti = itertools.cycle(self.volti)
+        tempi = cronometra(lambda: self.riconoscitore._preprocessa_immagine_onnx(next(volti)),
+                           self.args.ripetizioni * len(self.volti))
+        self.registra('preprocessing', tempi)
+
+    def embedding(self):
+        volti = itertools.cycle(self.volti)
+        tempi = cronometra(lambda: self.riconoscitore._estrai_embedding_onnx(next(volti)), self.args.ripetizioni)
+        self.registra('embedding', tempi, volti=1)
+
+        # Solo inferenza a batch: volti già preparati, come nella pipeline
+        dimensione_batch = self.riconoscitore.dimensione_batch
+        batch = list(itertools.islice(itertools.cycle(self.volti), dimensione_batch))
+        tempi = cronometra(lambda: self.riconoscitore.embeddings_volti(batch), self.args.ripetizioni)
+        self.registra('embedding_batch', tempi, volti=dimensione_batch,
+                      al_secondo=dimensione_batch / (tempi['p50_ms'] / 1000))
+
+    def identificazione(self):
+        riconoscitore = self.riconoscitore
+        rng = np.random.default_rng(0)
+        percorsi = itertools.cycle(self.percorsi_volti)
+
+        for numero_volti in self.args.volti:
+            galleria = normalizza_righe(rng.standard_normal((numero_volti, self.dimensione)).astype(np.float32))
+            riconoscitore.galleria.imposta(galleria, [f'persona_{i:06d}' for i in range(numero_volti)])
+            riconoscitore.indice.ricostruisci()
+            parametri = {'volti': numero_volti, 'indice': riconoscitore.indice.tipo}
+
+            tempi = cronometra(lambda: riconoscitore.identifica_volto(next(percorsi)), self.args.ripetizioni)
+            self.registra('identifica_volto', tempi, **parametri)
+
+            query = normalizza_righe(rng.standard_normal((self.args.query, self.dimensione)).astype(np.float32))
+            tempi = cronometra(lambda: riconoscitore.identifica_embeddings(query[0]), self.args.ripetizioni)
+            self.registra('identifica_embeddings', tempi, query=1, **parametri)
+
+            tempi = cronometra(lambda: riconoscitore.identifica_embeddings(query), self.args.ripetizioni)
+            self.registra('identifica_embeddings', tempi, query=self.args.query, **parametri,
+                          al_secondo=self.args.query / (tempi['p50_ms'] / 1000))
+
+        riconoscitore.galleria.svuota()
+        riconoscitore.indice.ricostruisci()
+
+    def cache(self):
+        riconoscitore = self.riconoscitore
+        numero_voci = self.args.voci_cache
+        rng = np.random.default_rng(1)
+        embeddings = rng.standard_normal((numero_voci, self.dimensione)).astype(np.float32)
+        impronte = [f'{i:064x}' for i in range(numero_voci)]
+        cartelle = (os.path.join(self.directory, f'cache_{i}') for i in itertools.count())
+        stato = {}
+
+        def nuova_cache():
+            stato['cache'] = CacheEmbeddings(MODELLO_MINIMO, 'benchmark', directory=next(cartelle))
+
+        def scrivi():
+            for impronta, embedding in zip(impronte, embeddings):
+                stato['cache'].aggiungi(impronta, embedding)
+
+        tempi = cronometra(scrivi, self.args.ripetizioni_lente, prepara=nuova_cache)
+        self.registra('cache_scrittura', tempi, voci=numero_voci,
+                      al_secondo=numero_voci / (tempi['p50_ms'] / 1000))
+
+        # Apertura a freddo (indice su disco) e lettura di tutti gli embeddings
+        directory = stato['cache'].directory_base
+        tempi = cronometra(lambda: CacheEmbeddings(MODELLO_MINIMO, 'benchmark', directory=directory).leggi(impronte),
+                           self.args.ripetizioni_lente)
+        self.registra('cache_lettura', tempi, voci=numero_voci,
+                      al_secondo=numero_voci / (tempi['p50_ms'] / 1000))
+
+        # Galleria di data/volti: cache vuota a ogni ripetizione, poi dall'istantanea
+        def cache_vuota():
+            riconoscitore.cache = CacheEmbeddings(riconoscitore.percorso_onnx, riconoscitore._versione_preprocessing(),
+                                                  directory=next(cartelle))
+            riconoscitore.galleria.svuota()
+
+        tempi = cronometra(lambda: riconoscitore.carica_volti_noti(str(CARTELLA_VOLTI)), self.args.ripetizioni_lente,
+                           prepara=cache_vuota)
+        self.registra('galleria_freddo', tempi, immagini=len(self.percorsi))
+
+        tempi = cronometra(lambda: riconoscitore.carica_volti_noti(str(CARTELLA_VOLTI)), self.args.ripetizioni_lente,
+                           prepara=riconoscitore.galleria.svuota)
+        self.registra('galleria_istantanea', tempi, immagini=len(self.percorsi))
+
+    def pipeline(self):
+        riconoscitore = self.riconoscitore
+        with silenzioso():
+            riconoscitore.carica_volti_noti(str(CARTELLA_VOLTI))
+
+        frame, persone = componi_frame(self.immagini)
+        numero_frame = self.args.frame
+        worker_configurati = configurazione.NUMERO_WORKER_PIPELINE
+        al_secondo_seriale = None
+
+        try:
+            for numero_worker in dict.fromkeys(self.args.worker or [1, worker_configurati]):
+                configurazione.NUMERO_WORKER_PIPELINE = numero_worker
+
+                def esegui():
+                    utils.processa_rilevazioni(risultati_sintetici(frame, persone, numero_frame, self.args.durata_traccia),
+                                               riconoscitore)
+
+                tempi = cronometra(esegui, self.args.ripetizioni_lente, prepara=utils.azzera_stato_analisi)
+                riepilogo_stadi = stats.riepilogo_tempi_stadi()
+                stadi = {stadio: round(riepilogo['p50_ms'], 4) for stadio, riepilogo in riepilogo_stadi.items()}
+                al_secondo = numero_frame / (tempi['p50_ms'] / 1000)
+                self.registra('processa_rilevazioni', tempi, frame=numero_frame, persone=len(persone),
+                              worker=numero_worker, al_secondo=al_secondo)
+                self.risultati[-1]['p50_stadi_ms'] = stadi
+
+                # Tempo degli stadi dei worker nell'ultima ripetizione rispetto alla durata mediana
+                lavoro_ms = sum(riepilogo_stadi[stadio]['totale_ms'] for stadio in STADI_WORKER
+                                if stadio in riepilogo_stadi)
+                self.risultati[-1]['worker_occupati'] = round(lavoro_ms / tempi['p50_ms'], 2)
+                if numero_worker == 1:
+                    al_secondo_seriale = al_secondo
+                if al_secondo_seriale:
+                    self.risultati[-1]['accelerazione'] = round(al_secondo / al_secondo_seriale, 2)
+                print(f"{'':<24}worker occupati {self.risultati[-1]['worker_occupati']:.2f}, accelerazione "
+                      f"{self.risultati[-1].get('accelerazione', float('nan')):.2f}x")
+        finally:
+            configurazione.NUMERO_WORKER_PIPELINE = worker_configurati
+
+
+class _Tensore:
+    """Valori con l'interfaccia dei tensori torch letta dalla pipeline (cpu, numpy, item)."""
+
+    def __init__(self, valori):
+        self.valori = np.asarray(valori)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.valori
+
+    def item(self):
+        return self.valori.item()
+
+
+def componi_frame(immagini, larghezza=1280, altezza=720):
+    """
+    Compone un frame HD con le immagini di data/volti affiancate come persone.
+
+    Returns:
+        tuple: (frame BGR, lista dei box (x1, y1, x2, y2) delle persone)
+    """
+    rng = np.random.default_rng(2)
+    frame = rng.integers(0, 256, (altezza, larghezza, 3), dtype=np.uint8)
+    larghezza_posto = larghezza // len(immagini)
+    persone = []
+
+    for posizione, immagine in enumerate(immagini):
+        scala = min((altezza - 40) / immagine.shape[0], (larghezza_posto - 20) / immagine.shape[1])
+        ridotta = cv2.resize(immagine, None, fx=scala, fy=scala, interpolation=cv2.INTER_AREA)
+        x1, y1 = posizione * larghezza_posto + 10, 20
+        frame[y1:y1 + ridotta.shape[0], x1:x1 + ridotta.shape[1]] = ridotta
+        persone.append((x1, y1, x1 + ridotta.shape[1], y1 + ridotta.shape[0]))
+
+    return frame, persone
+
+
+def risultati_sintetici(frame, persone, numero_frame, durata_traccia):
+    """
+    Genera risultati con la struttura di quelli di YOLO (boxes, orig_img).
+
+    Ogni `durata_traccia` frame le persone ricevono nuovi ID di tracciamento,
+    come se nella scena entrassero persone nuove: la pipeline continua così a
+    estrarre embeddings invece di saltare le tracce già risolte.
+    """
+    for indice in range(numero_frame):
+        primo_id = (indice // durata_traccia) * len(persone) + 1
+        boxes = [SimpleNamespace(cls=0, id=_Tensore(primo_id + numero), xyxy=[_Tensore(box)])
+                 for numero, box in enumerate(persone)]
+        yield SimpleNamespace(boxes=boxes, orig_img=frame)
+
+
+def metadati(args):
+    """Commit, versioni, piattaforma e configurazione a cui si riferiscono i risultati."""
+    def git(*comando):
+        try:
+            return subprocess.run(['git', *comando], cwd=RADICE, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'versione_formato': VERSIONE_FORMATO,
+        'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git('rev-parse', 'HEAD'),
+        'modifiche_locali': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'piattaforma': platform.platform(),
+        'processore': platform.processor() or platform.machine(),
+        'cpu': os.cpu_count(),
+        'versioni': {'numpy': np.__version__, 'opencv': cv2.__version__, 'onnxruntime': onnxruntime.__version__},
+        'modello': {'file': str(MODELLO_MINIMO.relative_to(RADICE)), 'impronta': impronta_modello(str(MODELLO_MINIMO))},
+        'configurazione': {
+            'rilevatore_volti': configurazione.RILEVATORE_VOLTI,
+            'allineamento_volti': configurazione.ALLINEAMENTO_VOLTI,
+            'tipo_indice_galleria': configurazione.TIPO_INDICE_GALLERIA,
+            'dimensione_batch_embedding': configurazione.DIMENSIONE_BATCH_EMBEDDING,
+            'finestra_frame_batch': configurazione.FINESTRA_FRAME_BATCH,
+        },
+        'argomenti': {chiave: valore for chiave, valore in vars(args).items() if chiave not in ('output', 'confronta')},
+    }
+
+
+def chiave(risultato):
+    return risultato['caso'], json.dumps(risultato['parametri'], sort_keys=True)
+
+
+def confronta(risultati, precedenti, soglia):
+    """
+    Confronta i tempi mediani con quelli di un'esecuzione precedente.
+
+    Returns:
+        int: Numero di casi rallentati oltre la soglia (frazione, ad esempio 0.2 = +20%)
+    """
+    precedenti = {chiave(risultato): risultato for risultato in precedenti['risultati']}
+    regressioni = 0
+
+    print(f"\n{'caso':<24}{'parametri':<34}{'prima ms':>11}{'ora ms':>11}{'delta':>9}  esito")
+    for risultato in risultati:
+        precedente = precedenti.get(chiave(risultato))
+        if precedente is None:
+            continue
+
+        prima, ora = precedente['p50_ms'], risultato['p50_ms']
+        delta = (ora - prima) / prima if prima > 0 else 0.0
+        rallentato = delta > soglia
+        regressioni += rallentato
+
+        descrizione = ' '.join(f'{nome}={valore}' for nome, valore in risultato['parametri'].items())
+        print(f"{risultato['caso']:<24}{descrizione:<34}{prima:>11.3f}{ora:>11.3f}{delta:>+9.1%}  "
+              f"{'REGRESSIONE' if rallentato else 'ok'}")
+
+    return regressioni
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sezioni', nargs='+', choices=SEZIONI, default=list(SEZIONI))
+    parser.add_argument('--ripetizioni', type=int, default=20, help="Ripetizioni dei casi rapidi")
+    parser.add_argument('--ripetizioni-lente', type=int, default=3, help="Ripetizioni di cache e pipeline")
+    parser.add_argument('--volti', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000],
+                        help="Dimensioni delle gallerie sintetiche")
+    parser.add_argument('--query', type=int, default=32, help="Embeddings per il matching a batch")
+    parser.add_argument('--voci-cache', type=int, default=1000)
+    parser.add_argument('--frame', type=int, default=60, help="Frame sintetici per la pipeline")
+    parser.add_argument('--durata-traccia', type=int, default=10, help="Frame dopo cui le persone cambiano ID")
+    parser.add_argument('--worker', type=int, nargs='+',
+                        help="Valori di NUMERO_WORKER_PIPELINE (default: 1 e quello configurato)")
+    parser.add_argument('--output', type=Path, help="File JSON dei risultati")
+    parser.add_argument('--confronta', type=Path, help="File JSON di un'esecuzione precedente")
+    parser.add_argument('--soglia', type=float, default=0.2, help="Rallentamento tollerato del p50 (0.2 = +20%%)")
+    args = parser.parse_args()
+
+    if not MODELLO_MINIMO.exists():
+        raise SystemExit(f"Modello non trovato: {MODELLO_MINIMO} (genera con benchmarks/genera_modello_minimo.py)")
+
+    dir_cache_configurata = configurazione.DIR_CACHE_EMBEDDINGS
+    with tempfile.TemporaryDirectory() as directory:
+        configurazione.DIR_CACHE_EMBEDDINGS = os.path.join(directory, 'embeddings')
+        try:
+            suite = Suite(args, directory)
+            print(f"{'caso':<24}{'parametri':<34}{'p50 ms':>11}{'p95 ms':>11}{'media ms':>11}{'al secondo':>12}")
+            for sezione in SEZIONI:
+                if sezione in args.sezioni:
+                    getattr(suite, sezione)()
+        finally:
+            configurazione.DIR_CACHE_EMBEDDINGS = dir_cache_configurata
+
+    documento = {'metadati': metadati(args), 'risultati': suite.risultati}
+    if args.output:
+        args.output.write_text(json.dumps(documento, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+        print(f"\nRisultati salvati in {args.output}")
+
+    if args.confronta:
+        precedenti = json.loads(args.confronta.read_text(encoding='utf-8'))
+        sys.exit(1 if confronta(suite.risultati, precedenti, args.soglia) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Confronto tra il rilevatore Haar e il rilevatore ONNX (SCRFD) sugli stessi ritagli.
+
+I ritagli sono generati dalle immagini di `data/volti`, inserite in sfondi di
+dimensione crescente per simulare i ritagli di persona della pipeline video.
+Per ogni dimensione vengono riportati latenza media per ritaglio e numero di
+ritagli in cui è stato trovato almeno un volto.
+
+Uso:
+    python benchmarks/benchmark_rilevatori.py --modello models/scrfd/scrfd_500m_kps.onnx
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.config.configurazione_attuale import configurazione
+from src.utils.RilevatoreVolti import RilevatoreHaar, RilevatoreONNX
+
+
+def genera_ritagli(cartella, dimensioni):
+    """Crea, per ogni immagine e dimensione, un ritaglio con il volto centrato."""
+    immagini = [cv2.imread(os.path.join(cartella, nome)) for nome in sorted(os.listdir(cartella))
+                if nome.lower().endswith(configurazione.ESTENSIONI_IMMAGINI)]
+    immagini = [immagine for immagine in immagini if immagine is not None]
+
+    ritagli = {}
+    for dimensione in dimensioni:
+        ritagli[dimensione] = []
+        for immagine in immagini:
+            # Il soggetto occupa metà del lato, come in un ritaglio di persona a mezzo busto
+            lato = dimensione // 2
+            scala = lato / max(immagine.shape[:2])
+            soggetto = cv2.resize(immagine, None, fx=scala, fy=scala)
+
+            sfondo = np.full((dimensione, dimensione, 3), 114, dtype=np.uint8)
+            y = (dimensione - soggetto.shape[0]) // 2
+            x = (dimensione - soggetto.shape[1]) // 2
+            sfondo[y:y + soggetto.shape[0], x:x + soggetto.shape[1]] = soggetto
+            ritagli[dimensione].append(sfondo)
+
+    return ritagli
+
+
+def misura(rilevatore, ritagli, ripetizioni):
+    """Restituisce (latenza media in ms, ritagli con almeno un volto)."""
+    rilevatore.rileva(ritagli[0])  # riscaldamento
+
+    trovati = sum(len(rilevatore.rileva(ritaglio)) > 0 for ritaglio in ritagli)
+
+    inizio = time.perf_counter()
+    for _ in range(ripetizioni):
+        for ritaglio in ritagli:
+            rilevatore.rileva(ritaglio)
+    durata = time.perf_counter() - inizio
+
+    return durata / (ripetizioni * len(ritagli)) * 1000, trovati
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cartella', default=configurazione.DIRVOLTI)
+    parser.add_argument('--modello', default=configurazione.RILEVATORE_ONNX_PATH)
+    parser.add_argument('--dimensioni', type=int, nargs='+', default=[160, 320, 640, 1280])
+    parser.add_argument('--ripetizioni', type=int, default=5)
+    args = parser.parse_args()
+
+    rilevatori = {'haar': RilevatoreHaar()}
+    if os.path.exists(args.modello):
+        rilevatori['onnx'] = RilevatoreONNX(args.modello)
+    else:
+        print(f"Modello ONNX non trovato ({args.modello}): misuro solo Haar")
+
+    ritagli = genera_ritagli(args.cartella, args.dimensioni)
+
+    print(f"{'ritaglio':<10}" + ''.join(f"{nome + ' ms':>12}{nome + ' volti':>14}" for nome in rilevatori))
+    for dimensione, lista in ritagli.items():
+        riga = f"{dimensione:<10}"
+        for rilevatore in rilevatori.values():
+            latenza, trovati = misura(rilevatore, lista, args.ripetizioni)
+            riga += f"{latenza:>12.2f}{f'{trovati}/{len(lista)}':>14}"
+        print(riga)
+
+
+if __name__ == '__main__':
+    main()
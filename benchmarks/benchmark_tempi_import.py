@@ -0,0 +1,121 @@
+"""
+Benchmark dei tempi di import dei punti di ingresso.
+
+Ogni punto di ingresso viene importato in un interprete nuovo con
+`python -X importtime`; il tempo riportato è la somma dei tempi cumulativi
+dei moduli importati dal punto di ingresso, escluso l'avvio dell'interprete.
+Oltre al budget di tempo si verifica che non vengano caricati i backend
+pesanti che il punto di ingresso non usa (ad esempio torch tramite
+ultralytics per il solo matching ONNX).
+
+Il processo termina con codice 1 se un budget viene superato o se viene
+importato un modulo vietato, quindi può essere usato come controllo in CI.
+
+Uso:
+    python benchmarks/benchmark_tempi_import.py
+    python benchmarks/benchmark_tempi_import.py --punti matching --scala 2
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+RADICE = Path(__file__).resolve().parent.parent
+
+# Backend caricati solo al primo utilizzo (download, ritaglio video, tracciamento)
+BACKEND_PIGRI = ('ultralytics', 'torch', 'yt_dlp', 'ffmpeg', 'wget', 'deepface', 'huggingface_hub')
+
+# nome -> (moduli importati, budget in ms, moduli che non devono essere caricati)
+PUNTI_INGRESSO = {
+    'registrazione': (['src.utils.registrazione_volti', 'src.utils.RiconoscitoreFacciale'], 400,
+                      BACKEND_PIGRI + ('streamlit',)),
+    'matching': (['src.utils.RiconoscitoreFacciale'], 400,
+                 BACKEND_PIGRI + ('streamlit',)),
+    'analisi_video': (['src.utils.utils'], 500,
+                      BACKEND_PIGRI + ('streamlit',)),
+    'ui_risultati': (['src.utils.gestore_analisi_attuale'], 150,
+                     BACKEND_PIGRI + ('cv2', 'onnxruntime', 'numpy')),
+}
+
+
+def importtime(moduli):
+    """
+    Esegue `python -X importtime` e restituisce le righe del report.
+
+    Returns:
+        tuple: (lista di (cumulativo in us, livello, modulo), errore o None)
+    """
+    codice = '; '.join(f'import {modulo}' for modulo in moduli) or 'pass'
+    ambiente = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(RADICE), os.environ.get('PYTHONPATH')])))
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', codice],
+                              cwd=RADICE, env=ambiente, capture_output=True, text=True)
+
+    righe = []
+    errore = []
+    for riga in processo.stderr.splitlines():
+        if not riga.startswith('import time:'):
+            errore.append(riga)
+            continue
+        campi = riga[len('import time:'):].split('|')
+        if len(campi) != 3 or not campi[1].strip().isdigit():
+            continue  # intestazione
+        nome = campi[2].rstrip()
+        livello = (len(nome) - len(nome.lstrip()) - 1) // 2
+        righe.append((int(campi[1]), livello, nome.strip()))
+
+    if processo.returncode != 0:
+        return righe, errore[-1] if errore else f'codice di uscita {processo.returncode}'
+    return righe, None
+
+
+def misura(moduli, moduli_avvio):
+    """
+    Returns:
+        tuple: (tempo in ms, insieme dei moduli caricati, errore o None)
+    """
+    righe, errore = importtime(moduli)
+    caricati = {nome for _, _, nome in righe}
+    # Solo gli import di primo livello dovuti al punto di ingresso, non all'avvio dell'interprete
+    totale = sum(cumulativo for cumulativo, livello, nome in righe if livello == 0 and nome not in moduli_avvio)
+    return totale / 1000, caricati, errore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--punti', nargs='+', choices=sorted(PUNTI_INGRESSO), default=sorted(PUNTI_INGRESSO))
+    parser.add_argument('--ripetizioni', type=int, default=3, help="Misure per punto di ingresso (si tiene la minima)")
+    parser.add_argument('--scala', type=float, default=1.0, help="Moltiplicatore dei budget (macchine lente)")
+    args = parser.parse_args()
+
+    moduli_avvio = {nome for _, _, nome in importtime([])[0]}
+    violazioni = 0
+
+    print(f"{'punto di ingresso':<20}{'ms':>10}{'budget':>10}  esito")
+
+    for nome in args.punti:
+        moduli, budget, vietati = PUNTI_INGRESSO[nome]
+        budget *= args.scala
+
+        misure = [misura(moduli, moduli_avvio) for _ in range(args.ripetizioni)]
+        tempo = min(tempo for tempo, _, _ in misure)
+        _, caricati, errore = misure[-1]
+
+        if errore:
+            print(f"{nome:<20}{'-':>10}{budget:>10.0f}  ERRORE: {errore}")
+            violazioni += 1
+            continue
+
+        problemi = [f"caricato {modulo}" for modulo in vietati if modulo in caricati]
+        if tempo > budget:
+            problemi.append("budget superato")
+        violazioni += bool(problemi)
+
+        print(f"{nome:<20}{tempo:>10.1f}{budget:>10.0f}  {', '.join(problemi) or 'ok'}")
+
+    sys.exit(1 if violazioni else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Genera il modello ONNX minimo usato dai benchmark al posto di AuraFace.
+
+Il modello ha la stessa interfaccia di un modello di riconoscimento reale
+(input NCHW float32 112x112 con batch dinamico, un embedding per volto), ma
+è composto solo da una convoluzione, un pooling e una proiezione lineare con
+pesi casuali a seed fisso: pesa poche centinaia di KB, non richiede download
+e produce sempre lo stesso file, quindi l'impronta del modello (e la cache
+degli embeddings) resta stabile tra un commit e l'altro.
+
+Gli embeddings non distinguono le identità come quelli di un modello
+addestrato: il modello serve a misurare la pipeline, non l'accuratezza.
+
+Uso:
+    python benchmarks/genera_modello_minimo.py
+    python benchmarks/genera_modello_minimo.py --dimensione 128 --output /tmp/modello.onnx
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+MODELLO_MINIMO = Path(__file__).resolve().parent / 'modelli' / 'volto_minimo.onnx'
+
+LATO_INPUT = 112
+CANALI_CONVOLUZIONE = 16
+LATO_POOLING = 8
+
+
+def crea_modello(dimensione=64, seed=0):
+    """
+    Costruisce il grafo Conv(3x3, passo 2) -> Relu -> AveragePool -> Flatten -> MatMul.
+
+    Args:
+        dimensione: Lunghezza dell'embedding in uscita
+        seed: Seed dei pesi casuali
+
+    Returns:
+        onnx.ModelProto: Modello verificato con onnx.checker
+    """
+    rng = np.random.default_rng(seed)
+
+    lato_convoluzione = LATO_INPUT // 2
+    lato_pooling = lato_convoluzione // LATO_POOLING
+    caratteristiche = CANALI_CONVOLUZIONE * lato_pooling * lato_pooling
+
+    filtri = (rng.standard_normal((CANALI_CONVOLUZIONE, 3, 3, 3)) / np.sqrt(27)).astype(np.float32)
+    bias = np.zeros(CANALI_CONVOLUZIONE, dtype=np.float32)
+    proiezione = (rng.standard_normal((caratteristiche, dimensione)) / np.sqrt(caratteristiche)).astype(np.float32)
+
+    nodi = [
+        helper.make_node('Conv', ['input', 'filtri', 'bias'], ['convoluzione'],
+                         kernel_shape=[3, 3], strides=[2, 2], pads=[1, 1, 1, 1]),
+        helper.make_node('Relu', ['convoluzione'], ['attivazione']),
+        helper.make_node('AveragePool', ['attivazione'], ['pooling'],
+                         kernel_shape=[LATO_POOLING, LATO_POOLING], strides=[LATO_POOLING, LATO_POOLING]),
+        helper.make_node('Flatten', ['pooling'], ['caratteristiche'], axis=1),
+        helper.make_node('MatMul', ['caratteristiche', 'proiezione'], ['embedding']),
+    ]
+
+    grafo = helper.make_graph(
+        nodi, 'volto_minimo',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, ['batch', 3, LATO_INPUT, LATO_INPUT])],
+        [helper.make_tensor_value_info('embedding', TensorProto.FLOAT, ['batch', dimensione])],
+        initializer=[numpy_helper.from_array(filtri, 'filtri'),
+                     numpy_helper.from_array(bias, 'bias'),
+                     numpy_helper.from_array(proiezione, 'proiezione')],
+    )
+
+    modello = helper.make_model(grafo, producer_name='faces_recognitions-benchmark',
+                                opset_imports=[helper.make_opsetid('', 13)])
+    # IR 8 è letto anche dalle versioni di onnxruntime meno recenti
+    modello.ir_version = 8
+    onnx.checker.check_model(modello)
+    return modello
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dimensione', type=int, default=64, help="Lunghezza dell'embedding")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, default=MODELLO_MINIMO)
+    args = parser.parse_args()
+
+    modello = crea_modello(args.dimensione, args.seed)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    onnx.save(modello, str(args.output))
+    print(f"Modello salvato: {args.output} ({args.output.stat().st_size / 1024:.0f} KB)")
+
+
+if __name__ == '__main__':
+    main()
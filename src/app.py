@@ -13,8 +13,22 @@ def carica_file(nome_cartella, descrizione, tipi_file, accept_multiple_files=Fal
         if not accept_multiple_files:
             files = [files]  # convertiamo il file singolo in lista per gestione uniforme
         for file in files:
-            with open(os.path.join(nome_cartella, file.name), "wb") as f:
+            percorso = os.path.join(nome_cartella, file.name)
+
+            # Il file_uploader ripropone lo stesso file a ogni interazione: si salva solo un nuovo caricamento
+            chiave_caricamento = f"caricato_{percorso}"
+            identificativo = getattr(file, "file_id", None) or file.size
+            if st.session_state.get(chiave_caricamento) == identificativo:
+                continue
+
+            with open(percorso, "wb") as f:
                 f.write(file.getbuffer())
+            st.session_state[chiave_caricamento] = identificativo
+
+            # Un nuovo modello custom sostituisce quello eventualmente già in memoria
+            if percorso.endswith(".onnx"):
+                from src.utils.registro_modelli import rimuovi
+                rimuovi(percorso)
         st.success(f"File salvati correttamente nella cartella '{nome_cartella}'")
 
 st.title("Modelli Face Recognition")
@@ -43,15 +57,14 @@ if custom:
 
 #vai alla pagina dei risultati o del confronto, se possibile
 if st.button("Vedi i risultati"):
-    if (option.__contains__("Custom (ONNX)")):
-        if glob.glob('data/modello/*.onnx'):  # Controlla se esiste un file .onnx
-            if(len(option) == 1):
-                st.switch_page("pages/risultato.py")
-            else:
-                st.switch_page("pages/confronto.py")
+    if not option:
+        st.warning("Scegli almeno un modello")
+    elif option.__contains__("Custom (ONNX)") and not glob.glob('data/modello/*.onnx'):  # Controlla se esiste un file .onnx
+        st.warning("Devi caricare il modello custom prima di continuare")
+    else:
+        # Letti dalla pagina del confronto
+        st.session_state["modelli"] = option
+        if(len(option) == 1):
+            st.switch_page("pages/risultato.py")
         else:
-            st.warning("Devi caricare il modello custom prima di continuare")
-
-
-
-
+            st.switch_page("pages/confronto.py")
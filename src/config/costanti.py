@@ -30,7 +30,14 @@ class Config:
 
     # === CONFIGURAZIONE VIDEO ===
     URLVIDEO = "https://www.youtube.com/watch?v=6U4-KZSoe6g"
-    FRAMEDASALTARE = 3
+    FRAMEDASALTARE = 3  # Passo fisso, o passo base del campionamento adattivo
+
+    # === CAMPIONAMENTO ADATTIVO ===
+    CAMPIONAMENTO_ADATTIVO = True
+    CAMPIONAMENTO_PASSO_MINIMO = 1
+    CAMPIONAMENTO_PASSO_MASSIMO = 30
+    CAMPIONAMENTO_SOGLIA_MOVIMENTO = 2.0  # Differenza media (0-255) sotto cui la scena è ferma
+    CAMPIONAMENTO_SOGLIA_CAMBIO_SCENA = 40.0  # Differenza media oltre cui c'è un cambio di scena
     SECONDOINIZIO = 14
     DURATAVIDEO = 14
 
@@ -45,8 +52,14 @@ class Config:
     # === PARAMETRI RICONOSCIMENTO ===
     SOGLIA_CONFIDENZA_DEFAULT = 0.55
     DIMENSIONE_MINIMA_IMMAGINE = 40
+    DIMENSIONE_MINIMA_VOLTO = DIMENSIONE_MINIMA_IMMAGINE // 2  # Lato minimo di un volto nel ritaglio
     MARGINE_BOUNDING_BOX = 20
 
+    # === AGGREGAZIONE PER TRACCIA ===
+    CAMPIONI_MASSIMI_TRACCIA = 5  # Tentativi di embedding massimi per ID di tracciamento
+    TRACCE_MASSIME_MEMORIZZATE = 10000
+    SOGLIA_NITIDEZZA_VOLTO = 100.0  # Varianza del Laplaciano oltre cui un volto è considerato nitido
+
     # === CONFIGURAZIONE YOLO ===
     YOLO_CONFIDENCE = 0.3
     YOLO_IOU = 0.5
@@ -55,7 +68,18 @@ class Config:
     # === ESTENSIONI FILE ===
     ESTENSIONI_IMMAGINI = ('.jpg', '.jpeg', '.png', '.bmp')
 
-    # === CACHE FILES (con percorsi completi) ===
+    # === CACHE EMBEDDINGS ===
+    DIR_CACHE_EMBEDDINGS = f'{CACHE_DIR}/embeddings'
+    VERSIONE_PREPROCESSING = 1  # Da incrementare se cambia il preprocessing dei volti (invalida la cache)
+    # Galleria mappata da disco finché la cartella dei volti non cambia (aggiunte, rimozioni, rinomine,
+    # dimensione o data di modifica di un'immagine)
+    ISTANTANEA_GALLERIA = True
+    # Identità con più immagini di riferimento (sottocartelle di DIRVOLTI)
+    MODALITA_PUNTEGGIO_IDENTITA = 'max'  # 'max' (immagine più simile), 'centroide' o 'topk'
+    TOPK_PUNTEGGIO_IDENTITA = 3  # Immagini mediate dalla modalità 'topk'
+    NUMERO_THREAD_REGISTRAZIONE = None  # Thread di decodifica e rilevamento nella registrazione (None = numero di core)
+
+    # === CACHE FILES LEGACY (pickle, rimossi da rimuovi_files_cache_e_contenuto_auraface_dir) ===
     CACHE_EMBEDDINGS_VOLTI = f'{CACHE_DIR}/cache_embeddings_volti.pkl'
     CACHE_EMBEDDINGS_AURAFACE = f'{CACHE_DIR}/cache_embeddings_volti_auraface.pkl'
     CACHE_EMBEDDINGS_BUFFALO = f'{CACHE_DIR}/cache_embeddings_volti_buffalo_l.pkl'
@@ -69,9 +93,61 @@ class Config:
     # === MODELLI ===
     AURAFACE_DIR = f'{MODELS_DIR}/auraface'
     AURAFACE_MODEL_REPO = "fal/AuraFace-v1"
+    BUFFALO_DIR = f'{MODELS_DIR}/buffalo_l'
+    BUFFALO_MODELLO_RICONOSCIMENTO = 'w600k_r50.onnx'  # Modello di riconoscimento del pacchetto buffalo_l di InsightFace
+    MODELLO_CUSTOM_DIR = f'{DATA_DIR}/modello'  # Modelli ONNX caricati dall'interfaccia
+
+    # === RILEVATORE VOLTI ONNX (SCRFD) ===
+    RILEVATORE_ONNX_PATH = f'{MODELS_DIR}/scrfd/scrfd_500m_kps.onnx'
+    RILEVATORE_ONNX_DIMENSIONE_INPUT = (320, 320)  # (larghezza, altezza) se il modello è dinamico
+    RILEVATORE_ONNX_SOGLIA = 0.5
+    RILEVATORE_ONNX_SOGLIA_NMS = 0.4
 
     # === PROVIDER ONNX ===
     ONNX_PROVIDERS = ["CUDAExecutionProvider", "CPUExecutionProvider"]
+    ONNX_THREAD_INTRA_OP = 0  # 0 = scelta automatica di onnxruntime
+
+    # === RILEVAMENTO VOLTI ===
+    RILEVATORE_VOLTI = 'haar'  # 'haar' (OpenCV) o 'onnx' (SCRFD/RetinaFace)
+    ALLINEAMENTO_VOLTI = True  # Allineamento ArcFace a 5 punti (solo con rilevatori che forniscono landmark)
+
+    # === INFERENZA A BATCH ===
+    DIMENSIONE_BATCH_EMBEDDING = 32  # Volti massimi per singola inferenza ONNX
+    FINESTRA_FRAME_BATCH = 1  # Frame campionati da accumulare prima dell'inferenza
+
+    # === PIPELINE PARALLELA ===
+    NUMERO_WORKER_PIPELINE = 4  # Thread per embedding e matching (1 = elaborazione seriale)
+    DIMENSIONE_CODA_PIPELINE = 8  # Frame massimi in attesa tra uno stadio e il successivo
+
+    # === SORGENTI FRAME ===
+    SORGENTE_VIDEO = None  # File, URL (rtsp://, http://), indice o /dev/videoN di una webcam, cartella di immagini (None = PATHVIDEOTAGLIATO)
+    DIMENSIONE_BUFFER_SORGENTE_LIVE = 4  # Frame in attesa da una sorgente live: oltre si scartano i più vecchi
+    DURATA_MASSIMA_SORGENTE_LIVE = None  # Secondi di lettura di una sorgente live (None = fino alla fine del flusso)
+
+    # === STATISTICHE ===
+    STORICO_PUNTEGGI_CONFIDENZA = 1000  # Ultimi punteggi conservati per il grafico dei risultati
+    STORICO_ID_PERSONA = 100  # Ultimi ID di tracciamento conservati per persona
+
+    # === METRICHE PROMETHEUS ===
+    PORTA_METRICHE = None  # Porta dell'endpoint /metrics durante le analisi (None = disattivato)
+    INDIRIZZO_METRICHE = '127.0.0.1'
+
+    # === ANALISI IN BACKGROUND ===
+    NUMERO_PROCESSI_ANALISI = 1  # Analisi eseguite in parallelo, ognuna in un processo separato
+    ANALISI_MASSIME_MEMORIZZATE = 20  # Analisi concluse conservate in memoria
+    INTERVALLO_AGGIORNAMENTO_RISULTATI = 1.0  # Secondi tra un controllo e l'altro della pagina dei risultati
+
+    # === ELABORAZIONE A SEGMENTI ===
+    DIR_SEGMENTI = f'{DATA_DIR}/segmenti'
+    DURATA_SEGMENTO_SECONDI = 600
+    NUMERO_PROCESSI_SEGMENTI = None  # None = numero di core
+    NUMERO_WORKER_PIPELINE_SEGMENTI = 1  # Worker della pipeline in ciascun processo
+
+    # === INDICE GALLERIA ===
+    TIPO_INDICE_GALLERIA = 'flat'  # 'flat' (esatto) o 'ivf' (approssimato)
+    IVF_NUMERO_LISTE = None  # None = automatico (2 * sqrt(volti))
+    IVF_NPROBE = 8
+    IVF_MINIMO_ADDESTRAMENTO = 1024
 
     # === DIMENSIONI STANDARD ===
     FACE_SIZE_STANDARD = (112, 112)  # Dimensione standard per ArcFace
@@ -1,4 +1,96 @@
+import time
+
 import streamlit as st
-import os
+import plotly.express as px
+import pandas as pd
+
+from src.config.configurazione_attuale import configurazione
+from src.utils.GestoreAnalisi import COMPLETATA, FALLITA
+from src.utils.gestore_analisi_attuale import gestore_analisi
+
+# Il confronto decodifica e rileva una sola volta e calcola gli embeddings con
+# entrambi i modelli sugli stessi volti; gira in background come l'analisi
+st.title("Confronto tra i due modelli")
+st.divider()
+
+modelli = st.session_state.get("modelli", [])
+if len(modelli) != 2:
+    st.warning("Scegli due modelli da confrontare nella pagina iniziale")
+    st.stop()
+
+id_confronto = st.session_state.get("id_confronto")
+stato = gestore_analisi.stato(id_confronto) if id_confronto else None
+
+if stato is None or stato["parametri"]["modelli"] != modelli:
+    st.write(f"Modelli: **{modelli[0]}** e **{modelli[1]}**")
+    scarica_dati = st.toggle("Scarica volti e video di esempio prima del confronto")
+    if st.button("Avvia confronto"):
+        st.session_state["id_confronto"] = gestore_analisi.avvia_confronto(modelli, scarica_dati=scarica_dati)
+        st.rerun()
+    st.stop()
+
+if stato["stato"] == FALLITA:
+    st.error(f"Confronto {id_confronto} fallito: {stato['errore']}")
+    if st.button("Nuovo confronto"):
+        del st.session_state["id_confronto"]
+        st.rerun()
+    st.stop()
+
+if stato["stato"] != COMPLETATA:
+    st.info(f"Confronto {id_confronto} {stato['stato'].replace('_', ' ')} da {stato['secondi']:.0f}s...")
+    time.sleep(configurazione.INTERVALLO_AGGIORNAMENTO_RISULTATI)
+    st.rerun()
+
+confronto = gestore_analisi.risultato(id_confronto)["confronto"]
+per_modello = confronto["per_modello"]
+
+st.subheader(f'Frame processati: {confronto["frame_processati"]}')
+st.caption(f'{confronto["ritagli"]} ritagli, {confronto["volti"]} volti rilevati una sola volta per entrambi i modelli; '
+           f'confronto eseguito a {confronto["frame_al_secondo"]:.1f} frame/s')
+
+colonne = st.columns(2)
+for colonna, nome in zip(colonne, confronto["modelli"]):
+    dati = per_modello[nome]
+    with colonna:
+        st.subheader(nome)
+        st.caption(f'{dati["modello"]}, galleria di {dati["volti_galleria"]} volti')
+        st.metric("Frame/s stimati (modello da solo)", f'{dati["frame_al_secondo"]:.1f}')
+        st.metric("Volti/s (embedding)", f'{dati["volti_al_secondo"]:.1f}')
+        st.metric("Embedding per volto p50 (ms)", f'{dati["embedding_per_volto"]["p50_ms"]:.2f}')
+        st.metric("Identificazioni riuscite", dati["identificazioni_riuscite"])
+        st.metric("Identificazioni fallite", dati["tentativi_falliti"])
+        st.metric("Confidenza media", f'{dati["confidenza"]["media"]:.3f}')
+
+st.subheader("Tempi per fase (ms)")
+st.caption("Fasi condivise, eseguite una sola volta")
+st.dataframe(pd.DataFrame.from_dict(confronto["tempi_condivisi"], orient="index"))
+
+st.caption("Fasi di ciascun modello")
+colonne_tempi = ["media_ms", "p50_ms", "p95_ms", "p99_ms"]
+tempi_modelli = {nome: pd.DataFrame.from_dict(dict(per_modello[nome]["tempi_stadi"],
+                                                   embedding_per_volto=per_modello[nome]["embedding_per_volto"]),
+                                              orient="index")[colonne_tempi]
+                 for nome in confronto["modelli"]}
+st.dataframe(pd.concat(tempi_modelli, axis=1))
+
+st.subheader("Distribuzione delle confidenze")
+righe = []
+for nome in confronto["modelli"]:
+    conteggi = per_modello[nome]["istogramma_confidenza"]
+    for indice, conteggio in enumerate(conteggi):
+        righe.append({"Confidenza": (indice + 0.5) / len(conteggi), "Identificazioni": conteggio, "Modello": nome})
+fig = px.bar(pd.DataFrame(righe), x="Confidenza", y="Identificazioni", color="Modello", barmode="overlay", opacity=0.6)
+st.plotly_chart(fig)
+st.dataframe(pd.DataFrame({nome: per_modello[nome]["confidenza"] for nome in confronto["modelli"]}))
+
+st.subheader("Concordanza tra i modelli")
+concordanza = dict(confronto["concordanza"])
+tasso = concordanza.pop("tasso")
+totale = concordanza.pop("totale")
+st.metric("Tracce con lo stesso esito", f"{tasso:.1%}", help=f"Su {totale} tracce: stessa persona o nessuna identificazione")
+df = pd.DataFrame({"Esito": list(concordanza), "Tracce": list(concordanza.values())})
+st.plotly_chart(px.bar(df, x="Esito", y="Tracce"))
 
-st.title("Confronto tra i due modelli")
\ No newline at end of file
+if st.button("Nuovo confronto"):
+    del st.session_state["id_confronto"]
+    st.rerun()
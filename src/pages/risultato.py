@@ -1,35 +1,62 @@
+import time
+
 import streamlit as st
 import plotly.express as px
 import pandas as pd
-import numpy as np
 
-from utils.StatisticheRiconoscimento import StatisticheRiconoscimento
 from src.config.configurazione_attuale import configurazione
-from src.utils.statistiche_attuali import stats
-from src.utils.utils import dizionario
-from src.utils.utils import do_all
-
-
-#self.identificazioni_riuscite = 0 -
-#self.tentativi_falliti = 0 -
-#self.punteggi_confidenza = [] -
-#self.frame_processati = 0 - 
-#self.tempistiche_embeddings = {}
-#self.avg_tempistiche_embeddings = -1
-#self.tempo_elaborazione_video = None
-#self.tempo_matching_volti_best = {}
-#self.tempo_matching_volti_all = {}
+from src.utils.GestoreAnalisi import COMPLETATA, FALLITA
+from src.utils.gestore_analisi_attuale import gestore_analisi
 
+# L'analisi gira in un processo in background: la pagina legge solo lo stato
+# del job, quindi si apre subito anche mentre un'analisi è in corso
 st.title("Resoconto del modello")
 st.divider()
+
+# Il modello scelto nella pagina iniziale
+modello = st.session_state.get("modelli", ["Auraface"])[0]
+
+id_analisi = st.session_state.get("id_analisi")
+stato = gestore_analisi.stato(id_analisi) if id_analisi else None
+
+if stato is None or stato["parametri"]["modello"] != modello:
+    st.write(f"Modello: **{modello}**")
+    scarica_dati = st.toggle("Scarica volti e video di esempio prima dell'analisi")
+    if st.button("Avvia analisi"):
+        st.session_state["id_analisi"] = gestore_analisi.avvia(scarica_dati=scarica_dati, modello=modello)
+        st.rerun()
+    st.stop()
+
+if stato["stato"] == FALLITA:
+    st.error(f"Analisi {id_analisi} fallita: {stato['errore']}")
+    if st.button("Nuova analisi"):
+        del st.session_state["id_analisi"]
+        st.rerun()
+    st.stop()
+
+if stato["stato"] != COMPLETATA:
+    st.info(f"Analisi {id_analisi} {stato['stato'].replace('_', ' ')} da {stato['secondi']:.0f}s...")
+    time.sleep(configurazione.INTERVALLO_AGGIORNAMENTO_RISULTATI)
+    st.rerun()
+
+# Statistiche della sola analisi di questa sessione
+stats = gestore_analisi.risultato(id_analisi)["stats"]
+
 st.subheader(f'Frame processati: {stats.frame_processati}')
 st.subheader(f'Identificazioni fallite: {stats.tentativi_falliti}')
 st.subheader(f'identificazioni riuscite: {stats.identificazioni_riuscite}')
 st.subheader("Grafico punteggi confidenza")
 
-df = pd.DataFrame({"Indice": range(len(stats.punteggi_confidenza)), "Valore": stats.punteggi_confidenza})
+# Solo gli ultimi punteggi sono conservati (STORICO_PUNTEGGI_CONFIDENZA); la media è su tutti
+st.caption(f"Media {stats.confidenza.media:.3f} su {stats.confidenza.conteggio} identificazioni")
+punteggi = list(stats.punteggi_confidenza)
+df = pd.DataFrame({"Indice": range(len(punteggi)), "Valore": punteggi})
 fig = px.line(df, x="Indice", y="Valore", markers=True)
 st.plotly_chart(fig)
 
+st.subheader("Tempi per fase (ms)")
+st.dataframe(pd.DataFrame.from_dict(stats.riepilogo_tempi_stadi(), orient="index"))
 
-
+if st.button("Nuova analisi"):
+    del st.session_state["id_analisi"]
+    st.rerun()
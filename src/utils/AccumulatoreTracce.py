@@ -0,0 +1,187 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from src.config.configurazione_attuale import configurazione
+
+
+class AccumulatoreTracce:
+    """
+    Accumulatore degli embeddings per traccia YOLO.
+
+    Per ogni ID di tracciamento mantiene la media degli embeddings pesata
+    sulla qualità del volto (dimensione, punteggio del rilevatore, nitidezza).
+    L'identificazione avviene sull'aggregato, più stabile del singolo ritaglio.
+    Una traccia è conclusa quando è stata identificata o quando ha esaurito
+    il budget di `campioni_massimi` tentativi: da quel momento non riceve più
+    embedding, limitando il lavoro per persona.
+
+    Ogni traccia ha al più `in_volo_massimi` ritagli in elaborazione (uno
+    per worker della pipeline) e mai più di quanti ne restano nel budget
+    (vedi `prenota`): più campioni della stessa traccia vengono elaborati in
+    parallelo, ma i tentativi completati non superano `campioni_massimi`.
+
+    La pipeline prenota dal thread produttore e applica gli esiti dal thread
+    chiamante: tutti gli accessi sono protetti da un lock. Oltre
+    `tracce_massime` viene dimenticata la traccia usata meno di recente.
+    """
+
+    def __init__(self, id_conosciuti=(), campioni_massimi=None, tracce_massime=None, in_volo_massimi=None):
+        """
+        Args:
+            id_conosciuti: Insieme degli ID già associati a una persona nota
+            campioni_massimi: Tentativi di embedding massimi per traccia
+            tracce_massime: Tracce ricordate al massimo (le meno recenti vengono dimenticate)
+            in_volo_massimi: Ritagli in elaborazione al massimo per traccia
+                (default: NUMERO_WORKER_PIPELINE, letto a ogni prenotazione)
+        """
+        self.id_conosciuti = id_conosciuti
+        self.campioni_massimi = campioni_massimi or configurazione.CAMPIONI_MASSIMI_TRACCIA
+        self.tracce_massime = tracce_massime or configurazione.TRACCE_MASSIME_MEMORIZZATE
+        self.in_volo_massimi = in_volo_massimi
+        self._tracce = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, id_tracciamento):
+        """True se la traccia non richiede altro lavoro: persona già nota o traccia conclusa."""
+        return id_tracciamento in self.id_conosciuti or self.e_conclusa(id_tracciamento)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._tracce)
+
+    def _cerca(self, id_tracciamento):
+        """Restituisce lo stato della traccia (None se assente) segnandola come usata di recente."""
+        traccia = self._tracce.get(id_tracciamento)
+        if traccia is not None:
+            self._tracce.move_to_end(id_tracciamento)
+        return traccia
+
+    def _traccia(self, id_tracciamento):
+        """Restituisce lo stato della traccia, creandolo se necessario."""
+        traccia = self._cerca(id_tracciamento)
+        if traccia is None:
+            traccia = {'somma': None, 'tentativi': 0, 'in_volo': 0, 'conclusa': False}
+            self._tracce[id_tracciamento] = traccia
+
+            # Dimentica le tracce usate meno di recente per mantenere la memoria limitata
+            while len(self._tracce) > self.tracce_massime:
+                self._tracce.popitem(last=False)
+        return traccia
+
+    def _registra_tentativo(self, traccia):
+        traccia['tentativi'] += 1
+        traccia['in_volo'] = max(0, traccia['in_volo'] - 1)
+        if traccia['tentativi'] >= self.campioni_massimi:
+            traccia['conclusa'] = True
+
+    def prenota(self, id_tracciamento):
+        """
+        Riserva un tentativo di embedding per la traccia.
+
+        La prenotazione resta attiva finché l'esito non viene registrato
+        (`aggiungi` o `registra_tentativo`), restituito (`rilascia`) o la
+        traccia non viene conclusa.
+
+        Returns:
+            bool: False se la traccia è conclusa, ha già `in_volo_massimi` ritagli
+                in elaborazione o le prenotazioni in corso coprono i tentativi rimasti
+        """
+        in_volo_massimi = max(1, self.in_volo_massimi or configurazione.NUMERO_WORKER_PIPELINE)
+        with self._lock:
+            traccia = self._traccia(id_tracciamento)
+            if (traccia['conclusa'] or traccia['in_volo'] >= in_volo_massimi
+                    or traccia['tentativi'] + traccia['in_volo'] >= self.campioni_massimi):
+                return False
+            traccia['in_volo'] += 1
+            return True
+
+    def rilascia(self, id_tracciamento):
+        """Restituisce la prenotazione senza consumare un tentativo (esito scartato)."""
+        with self._lock:
+            traccia = self._cerca(id_tracciamento)
+            if traccia is not None:
+                traccia['in_volo'] = max(0, traccia['in_volo'] - 1)
+
+    def registra_tentativo(self, id_tracciamento):
+        """Consuma un tentativo della traccia senza campioni (es. errore del worker)."""
+        with self._lock:
+            self._registra_tentativo(self._traccia(id_tracciamento))
+
+    def aggiungi(self, id_tracciamento, embedding, qualita):
+        """
+        Aggiunge un campione alla traccia e chiude la sua prenotazione.
+
+        Args:
+            id_tracciamento: ID YOLO della traccia
+            embedding: Embedding normalizzato del volto, o None se il volto non è stato trovato
+            qualita: Peso del campione in (0, 1]
+
+        Returns:
+            numpy.array: Embedding aggregato normalizzato, o None se la traccia non ha ancora campioni validi
+        """
+        with self._lock:
+            traccia = self._traccia(id_tracciamento)
+            self._registra_tentativo(traccia)
+
+            if embedding is not None and qualita > 0:
+                contributo = np.asarray(embedding, dtype=np.float32) * qualita
+                traccia['somma'] = contributo if traccia['somma'] is None else traccia['somma'] + contributo
+
+            somma = traccia['somma']
+
+        if somma is None:
+            return None
+
+        norma = np.linalg.norm(somma)
+        return somma / norma if norma > 0 else None
+
+    def concludi(self, id_tracciamento):
+        """Segna la traccia come decisa: non riceverà altri campioni."""
+        with self._lock:
+            traccia = self._traccia(id_tracciamento)
+            traccia['conclusa'] = True
+            traccia['in_volo'] = 0
+            traccia['somma'] = None
+
+    def e_conclusa(self, id_tracciamento):
+        """True se la traccia è stata decisa o ha esaurito il budget."""
+        with self._lock:
+            traccia = self._cerca(id_tracciamento)
+            return traccia is not None and traccia['conclusa']
+
+    def tentativi(self, id_tracciamento):
+        """Numero di tentativi di embedding registrati per la traccia."""
+        with self._lock:
+            traccia = self._tracce.get(id_tracciamento)
+            return 0 if traccia is None else traccia['tentativi']
+
+    def svuota(self):
+        """Dimentica tutte le tracce."""
+        with self._lock:
+            self._tracce.clear()
+
+
+def qualita_volto(volto, punteggio=1.0, soglia_nitidezza=None):
+    """
+    Stima la qualità di un volto ritagliato per pesarne l'embedding.
+
+    Combina dimensione (rispetto ai 112 pixel del modello), punteggio del
+    rilevatore e nitidezza (varianza del Laplaciano).
+
+    Returns:
+        float: Qualità in [0, 1]
+    """
+    if volto is None or volto.size == 0:
+        return 0.0
+
+    soglia_nitidezza = soglia_nitidezza or configurazione.SOGLIA_NITIDEZZA_VOLTO
+    altezza, larghezza = volto.shape[:2]
+
+    dimensione = min(1.0, min(altezza, larghezza) / configurazione.FACE_SIZE_STANDARD[0])
+    grigio = cv2.cvtColor(volto, cv2.COLOR_BGR2GRAY) if volto.ndim == 3 else volto
+    nitidezza = min(1.0, cv2.Laplacian(grigio, cv2.CV_64F).var() / soglia_nitidezza)
+
+    return float(dimensione * nitidezza * min(1.0, max(0.0, float(punteggio))))
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from src.config.configurazione_attuale import configurazione
+
+try:
+    import fcntl
+except ImportError:  # Windows: nessun blocco tra processi
+    fcntl = None
+
+
+class CacheEmbeddings:
+    """
+    Cache persistente degli embeddings indirizzata per contenuto.
+
+    Ogni embedding è identificato dall'hash del file immagine; la cache è
+    separata per impronta del file del modello e versione del preprocessing,
+    quindi cambiare modello, rilevatore o allineamento non riusa embeddings
+    incompatibili, e modificare un'immagine ricalcola solo quell'immagine.
+
+    Struttura su disco (una cartella per modello e preprocessing):
+    - embeddings.f32: matrice float32 (N, D) grezza, in sola aggiunta,
+      leggibile con np.memmap senza deserializzazione
+    - indice.jsonl: una riga {"hash", "riga"} per immagine (riga -1 se
+      nell'immagine non è stato trovato un volto)
+    - cache.json: modello, preprocessing e dimensione degli embeddings
+
+    Le impronte dei file vengono memorizzate per (percorso, dimensione,
+    data di modifica) in impronte.jsonl, così all'avvio i file invariati non
+    vengono riletti. Il file è in sola aggiunta e viene compattato quando le
+    voci superate sono più di quelle valide.
+    """
+
+    NESSUN_VOLTO = -1
+
+    def __init__(self, percorso_modello, versione_preprocessing, directory=None):
+        """
+        Args:
+            percorso_modello: File del modello ONNX usato per gli embeddings
+            versione_preprocessing: Stringa che identifica rilevatore, allineamento e normalizzazione
+            directory: Cartella base della cache (default: DIR_CACHE_EMBEDDINGS)
+        """
+        self.directory_base = directory or configurazione.DIR_CACHE_EMBEDDINGS
+        os.makedirs(self.directory_base, exist_ok=True)
+
+        self.file_impronte = os.path.join(self.directory_base, 'impronte.jsonl')
+        self.file_blocco_impronte = os.path.join(self.directory_base, '.blocco_impronte')
+        self._righe_impronte = 0
+        self._impronte = self._leggi_impronte()
+        self._compatta_impronte_se_necessario()
+
+        self.impronta_modello = self.impronta_file(percorso_modello)
+        self.versione_preprocessing = versione_preprocessing
+
+        self.directory = os.path.join(self.directory_base, f'{self.impronta_modello[:16]}_{versione_preprocessing}')
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.file_embeddings = os.path.join(self.directory, 'embeddings.f32')
+        self.file_indice = os.path.join(self.directory, 'indice.jsonl')
+        self.file_metadati = os.path.join(self.directory, 'cache.json')
+        self.file_blocco = os.path.join(self.directory, '.blocco')
+
+        self.dimensione = None
+        self._righe = {}
+        self._carica()
+
+    def __len__(self):
+        return len(self._righe)
+
+    def __contains__(self, impronta):
+        return impronta in self._righe
+
+    # === IMPRONTE DEI FILE ===
+
+    def _leggi_impronte(self):
+        """Legge le impronte memorizzate: percorso -> (dimensione, mtime_ns, hash)."""
+        impronte = {}
+        voci = _leggi_jsonl(self.file_impronte)
+        for voce in voci:
+            impronte[voce['percorso']] = (voce['dimensione'], voce['mtime_ns'], voce['hash'])
+        self._righe_impronte = len(voci)
+        return impronte
+
+    def _compatta_impronte_se_necessario(self):
+        """Compatta impronte.jsonl quando le voci superate sono più di quelle valide."""
+        if self._righe_impronte - len(self._impronte) > len(self._impronte):
+            self._compatta_impronte()
+
+    def _compatta_impronte(self):
+        """
+        Riscrive impronte.jsonl con l'ultima voce di ogni file ancora esistente.
+
+        Il file viene riletto sotto blocco (include le voci degli altri
+        processi), scritto su un nome temporaneo e poi rinominato, così chi
+        legge vede sempre un file completo.
+        """
+        with _BloccoFile(self.file_blocco_impronte):
+            voci = {}
+            for voce in _leggi_jsonl(self.file_impronte):
+                voci[voce['percorso']] = voce
+            voci = {percorso: voce for percorso, voce in voci.items() if os.path.exists(percorso)}
+
+            temporaneo = f'{self.file_impronte}.{os.getpid()}.tmp'
+            with open(temporaneo, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(voce) + '\n' for voce in voci.values())
+            os.replace(temporaneo, self.file_impronte)
+
+        self._impronte = {percorso: (voce['dimensione'], voce['mtime_ns'], voce['hash'])
+                          for percorso, voce in voci.items()}
+        self._righe_impronte = len(voci)
+
+    def impronta_file(self, percorso):
+        """
+        Restituisce lo SHA-256 del contenuto del file.
+
+        Il file viene riletto solo se dimensione o data di modifica sono
+        cambiate rispetto all'ultima impronta memorizzata.
+        """
+        percorso = os.path.abspath(percorso)
+        info = os.stat(percorso)
+
+        memorizzata = self._impronte.get(percorso)
+        if memorizzata is not None and memorizzata[:2] == (info.st_size, info.st_mtime_ns):
+            return memorizzata[2]
+
+        impronta = hash_file(percorso)
+        self._impronte[percorso] = (info.st_size, info.st_mtime_ns, impronta)
+        # Sotto blocco: una compattazione in corso in un altro processo non perde la voce
+        with _BloccoFile(self.file_blocco_impronte):
+            _aggiungi_jsonl(self.file_impronte, {'percorso': percorso, 'dimensione': info.st_size,
+                                                 'mtime_ns': info.st_mtime_ns, 'hash': impronta})
+        self._righe_impronte += 1
+        self._compatta_impronte_se_necessario()
+        return impronta
+
+    # === EMBEDDINGS ===
+
+    def _carica(self):
+        """Legge metadati e indice; le righe oltre la fine del file embeddings vengono ignorate."""
+        if os.path.exists(self.file_metadati):
+            with open(self.file_metadati, 'r', encoding='utf-8') as f:
+                self.dimensione = json.load(f)['dimensione']
+
+        righe_complete = self._righe_su_disco()
+        for voce in _leggi_jsonl(self.file_indice):
+            if voce['riga'] < righe_complete:
+                self._righe[voce['hash']] = voce['riga']
+
+    def _righe_su_disco(self):
+        """Numero di righe complete nel file embeddings."""
+        if not self.dimensione or not os.path.exists(self.file_embeddings):
+            return 0
+        return os.path.getsize(self.file_embeddings) // (self.dimensione * 4)
+
+    def contiene_volto(self, impronta):
+        """True se l'immagine è in cache e contiene un volto."""
+        return self._righe.get(impronta, self.NESSUN_VOLTO) != self.NESSUN_VOLTO
+
+    def leggi(self, impronte):
+        """
+        Legge gli embeddings di più immagini in un'unica matrice.
+
+        Args:
+            impronte: Hash di immagini presenti in cache con un volto
+
+        Returns:
+            numpy.array: Matrice float32 (len(impronte), D)
+        """
+        if not impronte:
+            return np.empty((0, self.dimensione or 0), dtype=np.float32)
+
+        # Solo le righe complete: una scrittura interrotta può lasciare una riga parziale in coda
+        matrice = np.memmap(self.file_embeddings, dtype=np.float32, mode='r',
+                            shape=(self._righe_su_disco(), self.dimensione))
+        return np.asarray(matrice[[self._righe[impronta] for impronta in impronte]])
+
+    def aggiungi(self, impronta, embedding):
+        """
+        Aggiunge l'embedding di un'immagine in coda alla cache.
+
+        Args:
+            impronta: Hash del contenuto dell'immagine
+            embedding: Vettore (D,), o None se nell'immagine non c'è un volto
+        """
+        with self._blocco():
+            if embedding is None:
+                riga = self.NESSUN_VOLTO
+            else:
+                embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+                self._imposta_dimensione(len(embedding))
+
+                # La posizione viene ricalcolata sotto blocco: altri processi possono aver aggiunto righe
+                riga = self._righe_su_disco()
+                with open(self.file_embeddings, 'r+b' if os.path.exists(self.file_embeddings) else 'wb') as f:
+                    f.seek(riga * self.dimensione * 4)
+                    f.write(embedding.tobytes())
+
+            # L'indice viene scritto dopo i dati: una riga senza voce è solo spazio perso
+            _aggiungi_jsonl(self.file_indice, {'hash': impronta, 'riga': riga})
+            self._righe[impronta] = riga
+
+    def _imposta_dimensione(self, dimensione):
+        """Registra la dimensione degli embeddings alla prima aggiunta."""
+        if self.dimensione is None:
+            self.dimensione = dimensione
+            with open(self.file_metadati, 'w', encoding='utf-8') as f:
+                json.dump({'impronta_modello': self.impronta_modello,
+                           'versione_preprocessing': self.versione_preprocessing,
+                           'dimensione': dimensione}, f)
+        elif dimensione != self.dimensione:
+            raise ValueError(f"Dimensione embedding {dimensione} diversa da quella della cache {self.dimensione}")
+
+    def _blocco(self):
+        """Blocco esclusivo tra processi durante le scritture."""
+        return _BloccoFile(self.file_blocco)
+
+
+class _BloccoFile:
+    """Context manager per un blocco esclusivo su file (nessun effetto senza fcntl)."""
+
+    def __init__(self, percorso):
+        self.percorso = percorso
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self.percorso, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def hash_file(percorso, dimensione_blocco=1 << 20):
+    """SHA-256 esadecimale del contenuto di un file."""
+    sha = hashlib.sha256()
+    with open(percorso, 'rb') as f:
+        for blocco in iter(lambda: f.read(dimensione_blocco), b''):
+            sha.update(blocco)
+    return sha.hexdigest()
+
+
+def _leggi_jsonl(percorso):
+    """Legge un file JSON Lines ignorando righe incomplete (scritture interrotte)."""
+    if not os.path.exists(percorso):
+        return []
+
+    voci = []
+    with open(percorso, 'r', encoding='utf-8') as f:
+        for riga in f:
+            try:
+                voci.append(json.loads(riga))
+            except json.JSONDecodeError:
+                continue
+    return voci
+
+
+def _aggiungi_jsonl(percorso, voce):
+    """Aggiunge una voce a un file JSON Lines con una singola scrittura."""
+    with open(percorso, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(voce) + '\n')
@@ -0,0 +1,116 @@
+import cv2
+import numpy as np
+
+from src.config.configurazione_attuale import configurazione
+
+
+class CampionatoreFisso:
+    """Campionamento a passo fisso: un frame ogni `passo`."""
+
+    # Il contenuto del frame non serve: i frame saltati possono non essere decodificati
+    usa_frame = False
+
+    def __init__(self, passo=None):
+        self.passo = passo or configurazione.FRAMEDASALTARE
+
+    def deve_processare(self, indice, frame=None, id_attivi=(), id_conosciuti=(), profondita_coda=0):
+        """Restituisce True se il frame va elaborato."""
+        return indice % self.passo == 0
+
+
+class CampionatoreAdattivo:
+    """
+    Campionamento adattivo dei frame basato su segnali economici.
+
+    - Differenza tra frame (su una miniatura in scala di grigi): un cambio di
+      scena forza l'elaborazione, una scena ferma allunga il passo.
+    - Tracce attive non ancora identificate: finché ce ne sono il passo resta
+      basso (minimo se la scena è in movimento); se tutte le tracce visibili
+      sono già note il passo si allunga fino al massimo a scena ferma. YOLO
+      gira comunque almeno ogni `passo_massimo` frame: gli ID attivi si
+      aggiornano solo sui frame elaborati, e senza questo richiamo una persona
+      che entra in una scena di sole tracce note non verrebbe mai rilevata.
+    - Profondità della coda della pipeline: se i worker sono in ritardo il
+      passo viene raddoppiato per rientrare nel budget di latenza.
+    """
+
+    usa_frame = True
+
+    def __init__(self, passo_base=None, passo_minimo=None, passo_massimo=None,
+                 soglia_movimento=None, soglia_cambio_scena=None, coda_massima=None):
+        self.passo_base = passo_base or configurazione.FRAMEDASALTARE
+        self.passo_minimo = passo_minimo or configurazione.CAMPIONAMENTO_PASSO_MINIMO
+        self.passo_massimo = passo_massimo or configurazione.CAMPIONAMENTO_PASSO_MASSIMO
+        self.soglia_movimento = soglia_movimento or configurazione.CAMPIONAMENTO_SOGLIA_MOVIMENTO
+        self.soglia_cambio_scena = soglia_cambio_scena or configurazione.CAMPIONAMENTO_SOGLIA_CAMBIO_SCENA
+        self.coda_massima = coda_massima or max(1, configurazione.DIMENSIONE_CODA_PIPELINE // 2)
+
+        self.passo = self.passo_base
+        self._miniatura_precedente = None
+        self._ultimo_processato = None
+
+    def differenza_frame(self, frame):
+        """
+        Differenza media assoluta (0-255) rispetto al frame precedente,
+        calcolata su una miniatura 32x18 in scala di grigi.
+        """
+        miniatura = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (32, 18), interpolation=cv2.INTER_AREA)
+        miniatura = miniatura.astype(np.int16)
+
+        precedente = self._miniatura_precedente
+        self._miniatura_precedente = miniatura
+
+        if precedente is None:
+            return float('inf')
+        return float(np.abs(miniatura - precedente).mean())
+
+    def deve_processare(self, indice, frame=None, id_attivi=(), id_conosciuti=(), profondita_coda=0):
+        """
+        Decide se il frame va elaborato e aggiorna il passo di campionamento.
+
+        Args:
+            indice: Indice del frame nel video
+            frame: Immagine del frame (per la differenza tra frame)
+            id_attivi: ID di tracciamento delle persone visibili
+            id_conosciuti: ID già associati a una persona nota
+            profondita_coda: Frame in attesa nella pipeline
+
+        Returns:
+            bool: True se il frame va elaborato
+        """
+        differenza = self.differenza_frame(frame) if frame is not None else 0.0
+        cambio_scena = differenza >= self.soglia_cambio_scena
+        id_attivi = [id_tracciamento for id_tracciamento in id_attivi if id_tracciamento is not None]
+        sconosciuti = [id_tracciamento for id_tracciamento in id_attivi if id_tracciamento not in id_conosciuti]
+
+        if cambio_scena:
+            self.passo = self.passo_minimo
+        elif sconosciuti:
+            # Persone da identificare: passo minimo se la scena è in movimento
+            self.passo = self.passo_minimo if differenza >= self.soglia_movimento else self.passo_base
+        elif id_attivi:
+            # Tutte le persone visibili sono già identificate: basta un controllo
+            # periodico per accorgersi di chi entra, più frequente se la scena si muove
+            self.passo = self.passo_massimo if differenza < self.soglia_movimento else self.passo_base
+        elif differenza < self.soglia_movimento:
+            # Scena ferma e vuota: allunga progressivamente il passo
+            self.passo = min(self.passo * 2, self.passo_massimo)
+        else:
+            self.passo = self.passo_base
+
+        # La pipeline è in ritardo: riduce il carico
+        if profondita_coda >= self.coda_massima:
+            self.passo = min(self.passo * 2, self.passo_massimo)
+
+        if not cambio_scena and self._ultimo_processato is not None and indice - self._ultimo_processato < self.passo:
+            return False
+
+        self._ultimo_processato = indice
+        return True
+
+
+def crea_campionatore():
+    """Crea il campionatore di frame configurato."""
+    if configurazione.CAMPIONAMENTO_ADATTIVO:
+        return CampionatoreAdattivo()
+    return CampionatoreFisso()
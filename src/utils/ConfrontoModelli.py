@@ -0,0 +1,366 @@
+import glob
+import os
+import time
+
+from src.config.configurazione_attuale import configurazione
+from src.utils.AccumulatoreTracce import AccumulatoreTracce
+from src.utils.IstogrammaTempi import IstogrammaTempi
+from src.utils.RiconoscitoreFacciale import RiconoscitoreFacciale
+from src.utils.StatisticheRiconoscimento import StatisticheRiconoscimento
+
+# Modelli selezionabili dall'interfaccia (vedi app.py)
+MODELLI_CONFRONTABILI = ('Auraface', 'Buffalo_l', 'Custom (ONNX)')
+
+# Esiti della concordanza tra i due modelli, per traccia (o per ritaglio senza traccia)
+STESSO_NOME = 'stesso_nome'
+NOMI_DIVERSI = 'nomi_diversi'
+SOLO_PRIMO = 'solo_primo'
+SOLO_SECONDO = 'solo_secondo'
+NESSUNO = 'nessuno'
+
+
+class ModelloInConfronto:
+    """
+    Parte di un confronto che dipende dal modello: embedding, aggregazione
+    per traccia, matching sulla propria galleria e relative statistiche.
+
+    Il riconoscitore registra i tempi di preprocessing, inferenza e matching
+    sulle statistiche del modello, separate da quelle delle fasi condivise.
+    """
+
+    def __init__(self, nome, riconoscitore):
+        self.nome = nome
+        self.riconoscitore = riconoscitore
+        self.stats = StatisticheRiconoscimento()
+        riconoscitore.stats = self.stats
+
+        self.tracce = AccumulatoreTracce(set())
+        self.identificate = {}
+        self.tempo_embedding_volto = IstogrammaTempi()
+        self.volti = 0
+        self.tempo_ns = 0
+
+    def risolta(self, id_tracciamento):
+        """True se il modello ha identificato la traccia o ne ha esaurito i tentativi."""
+        return id_tracciamento in self.identificate or self.tracce.e_conclusa(id_tracciamento)
+
+    def elabora(self, ritagli, volti, indici_volti, qualita):
+        """
+        Identifica con questo modello i volti già rilevati di un blocco di ritagli.
+
+        Args:
+            ritagli: Coppie (id_tracciamento, immagine_ritagliata)
+            volti: Volti rilevati e allineati, condivisi tra i modelli
+            indici_volti: Ritaglio di provenienza di ciascun volto
+            qualita: Qualità di ciascun volto
+
+        Returns:
+            dict: Posizione del ritaglio -> nome identificato ('-1' se non riconosciuto),
+                solo per i ritagli elaborati da questo modello
+        """
+        inizio = time.perf_counter_ns()
+
+        embeddings = {}
+        if volti:
+            embeddings = dict(zip(indici_volti, zip(self.riconoscitore.embeddings_volti(volti), qualita)))
+            durata_volto = (time.perf_counter_ns() - inizio) // len(volti)
+            for _ in volti:
+                self.tempo_embedding_volto.aggiungi(durata_volto)
+            self.volti += len(volti)
+            self.stats.aggiungi_embedding_estratti(len(volti))
+
+        esiti = {}
+        for posizione, (id_tracciamento, _) in enumerate(ritagli):
+            # La traccia resta aperta finché l'altro modello non la risolve: questo la ignora
+            if id_tracciamento is not None and self.risolta(id_tracciamento):
+                continue
+
+            embedding, qualita_volto = embeddings.get(posizione, (None, 0.0))
+            if id_tracciamento is None:
+                aggregato = embedding
+            else:
+                aggregato = self.tracce.aggiungi(id_tracciamento, embedding, qualita_volto)
+
+            if aggregato is None:
+                nome, confidenza = '-1', 0.0
+            else:
+                nome, confidenza = self.riconoscitore.identifica_embeddings(
+                    aggregato, configurazione.SOGLIA_CONFIDENZA_DEFAULT)[0]
+
+            if nome != '-1':
+                self.stats.aggiungi_successo(confidenza)
+                if id_tracciamento is not None:
+                    self.identificate[id_tracciamento] = nome
+                    self.tracce.concludi(id_tracciamento)
+            else:
+                self.stats.aggiungi_fallimento()
+            esiti[posizione] = nome
+
+        self.tempo_ns += time.perf_counter_ns() - inizio
+        return esiti
+
+    def dimentica(self, id_tracciamento):
+        """Rilascia lo stato di una traccia già conteggiata nella concordanza."""
+        self.identificate.pop(id_tracciamento, None)
+
+
+class ConfrontoModelli:
+    """
+    Confronto di due modelli di riconoscimento sugli stessi frame e ritagli.
+
+    Decodifica, tracciamento YOLO, ritaglio delle persone e rilevamento (e
+    allineamento) dei volti vengono eseguiti una sola volta e registrati
+    sulle statistiche condivise; solo embedding, aggregazione per traccia e
+    matching vengono ripetuti per ciascun modello, sugli stessi volti. Il
+    confronto costa quindi quanto un'analisi più un embedding in più per
+    volto, non il doppio.
+
+    Una traccia riceve ritagli (nel limite di CAMPIONI_MASSIMI_TRACCIA)
+    finché entrambi i modelli non l'hanno risolta; a quel punto l'esito
+    dei due modelli viene confrontato (stesso nome, nomi diversi,
+    riconosciuta da uno solo o da nessuno).
+    """
+
+    def __init__(self, riconoscitori, stats, accumulatore_tracce):
+        """
+        Args:
+            riconoscitori: Dizionario nome -> RiconoscitoreFacciale (due modelli) con la galleria già caricata
+            stats: Statistiche delle fasi condivise (quelle del tracciamento)
+            accumulatore_tracce: Accumulatore usato dal tracciamento per il budget di ritagli per traccia
+        """
+        if len(riconoscitori) != 2:
+            raise ValueError("Il confronto richiede esattamente due modelli")
+
+        self.modelli = [ModelloInConfronto(nome, riconoscitore) for nome, riconoscitore in riconoscitori.items()]
+        self.stats = stats
+        self.accumulatore_tracce = accumulatore_tracce
+        self.concordanza = dict.fromkeys((STESSO_NOME, NOMI_DIVERSI, SOLO_PRIMO, SOLO_SECONDO, NESSUNO), 0)
+        self._tracce_aperte = set()
+        self.ritagli = 0
+        self.volti = 0
+        self.tempo_ns = 0
+
+    def esegui(self, results, raccogli_ritagli):
+        """
+        Elabora i risultati del tracciamento con entrambi i modelli.
+
+        I ritagli vengono accumulati su FINESTRA_FRAME_BATCH frame (o fino a
+        DIMENSIONE_BATCH_EMBEDDING ritagli), come in processa_rilevazioni.
+
+        Args:
+            results: Risultati YOLO dei frame campionati
+            raccogli_ritagli: Funzione (risultato, ritagli_in_attesa) -> nuovi ritagli
+                (vedi utils.raccogli_ritagli_frame)
+        """
+        inizio = time.perf_counter_ns()
+        ritagli_in_attesa = []
+        frame_in_attesa = 0
+
+        for risultato in results:
+            self.stats.incrementa_frame()
+            if risultato.boxes is not None:
+                ritagli_in_attesa.extend(raccogli_ritagli(risultato, ritagli_in_attesa))
+            frame_in_attesa += 1
+
+            if (frame_in_attesa >= configurazione.FINESTRA_FRAME_BATCH
+                    or len(ritagli_in_attesa) >= configurazione.DIMENSIONE_BATCH_EMBEDDING):
+                self._confronta_ritagli(ritagli_in_attesa)
+                ritagli_in_attesa = []
+                frame_in_attesa = 0
+
+        if ritagli_in_attesa:
+            self._confronta_ritagli(ritagli_in_attesa)
+
+        # Le tracce ancora aperte a fine video vengono confrontate con l'esito raggiunto
+        for id_tracciamento in list(self._tracce_aperte):
+            self._chiudi_traccia(id_tracciamento)
+
+        self.tempo_ns += time.perf_counter_ns() - inizio
+
+    def _confronta_ritagli(self, ritagli):
+        """Rileva i volti una volta e li identifica con entrambi i modelli."""
+        if not ritagli:
+            return
+
+        # Rilevamento e allineamento sono indipendenti dal modello: registrati sulle statistiche condivise
+        volti, indici_volti, qualita = self.modelli[0].riconoscitore.prepara_volti(
+            [immagine for _, immagine in ritagli], self.stats)
+
+        # Gli embedding vengono contati da ciascun modello: qui solo i volti rilevati
+        self.ritagli += len(ritagli)
+        self.volti += len(volti)
+        self.stats.aggiungi_volti_rilevati(len(volti))
+
+        esiti = [modello.elabora(ritagli, volti, indici_volti, qualita) for modello in self.modelli]
+
+        inizio = time.perf_counter_ns()
+        for posizione, (id_tracciamento, _) in enumerate(ritagli):
+            if id_tracciamento is None:
+                self._conta(esiti[0].get(posizione, '-1'), esiti[1].get(posizione, '-1'))
+                continue
+
+            # Il tentativo conta sul budget condiviso e chiude la prenotazione del ritaglio
+            self.accumulatore_tracce.registra_tentativo(id_tracciamento)
+            self._tracce_aperte.add(id_tracciamento)
+            if all(modello.risolta(id_tracciamento) for modello in self.modelli):
+                self._chiudi_traccia(id_tracciamento)
+        self.stats.registra_tempo_stadio('aggiornamento_tracciamento', time.perf_counter_ns() - inizio)
+
+    def _chiudi_traccia(self, id_tracciamento):
+        """Conta l'esito della traccia e smette di raccoglierne i ritagli."""
+        self._conta(*(modello.identificate.get(id_tracciamento, '-1') for modello in self.modelli))
+        for modello in self.modelli:
+            modello.dimentica(id_tracciamento)
+        self._tracce_aperte.discard(id_tracciamento)
+        self.accumulatore_tracce.concludi(id_tracciamento)
+
+    def _conta(self, primo, secondo):
+        if primo != '-1' and secondo != '-1':
+            self.concordanza[STESSO_NOME if primo == secondo else NOMI_DIVERSI] += 1
+        elif primo != '-1':
+            self.concordanza[SOLO_PRIMO] += 1
+        elif secondo != '-1':
+            self.concordanza[SOLO_SECONDO] += 1
+        else:
+            self.concordanza[NESSUNO] += 1
+
+    def riepilogo(self):
+        """
+        Risultati del confronto, serializzabili.
+
+        Il throughput stimato di ciascun modello è quello che avrebbe
+        un'analisi con il solo modello: tempo delle fasi condivise più il
+        tempo speso dal modello.
+
+        Returns:
+            dict: frame, ritagli e volti elaborati, tempi delle fasi condivise,
+                per ogni modello tempi, throughput, embedding per volto e
+                confidenze, e la concordanza tra i due modelli
+        """
+        tempo_modelli = sum(modello.tempo_ns for modello in self.modelli)
+        tempo_condiviso = max(0, self.tempo_ns - tempo_modelli)
+        frame = self.stats.frame_processati
+
+        per_modello = {}
+        for modello in self.modelli:
+            tempo_analisi = (tempo_condiviso + modello.tempo_ns) / 1e9
+            stats = modello.stats
+            per_modello[modello.nome] = {
+                'modello': modello.riconoscitore.modello_attivo,
+                'percorso': modello.riconoscitore.percorso_onnx,
+                'volti_galleria': len(modello.riconoscitore.galleria),
+                'tempo_modello_s': modello.tempo_ns / 1e9,
+                'frame_al_secondo': frame / tempo_analisi if tempo_analisi > 0 else 0.0,
+                'volti_al_secondo': modello.volti / (modello.tempo_embedding_volto.totale / 1e9)
+                if modello.tempo_embedding_volto.totale else 0.0,
+                'embedding_per_volto': modello.tempo_embedding_volto.riepilogo(),
+                'tempi_stadi': stats.riepilogo_tempi_stadi(),
+                'identificazioni_riuscite': stats.identificazioni_riuscite,
+                'tentativi_falliti': stats.tentativi_falliti,
+                'confidenza': stats.confidenza.riepilogo(),
+                'istogramma_confidenza': list(stats.confidenza.conteggi),
+            }
+
+        nomi = [modello.nome for modello in self.modelli]
+        totale = sum(self.concordanza.values())
+        concordanza = {
+            STESSO_NOME: self.concordanza[STESSO_NOME],
+            NOMI_DIVERSI: self.concordanza[NOMI_DIVERSI],
+            f'solo_{nomi[0]}': self.concordanza[SOLO_PRIMO],
+            f'solo_{nomi[1]}': self.concordanza[SOLO_SECONDO],
+            NESSUNO: self.concordanza[NESSUNO],
+            'totale': totale,
+            # Stesso esito: stessa persona o entrambi non riconosciuto
+            'tasso': (self.concordanza[STESSO_NOME] + self.concordanza[NESSUNO]) / totale if totale else 0.0,
+        }
+
+        return {
+            'modelli': nomi,
+            'frame_processati': frame,
+            'frame_letti': self.stats.frame_letti,
+            'ritagli': self.ritagli,
+            'volti': self.volti,
+            'durata_s': self.tempo_ns / 1e9,
+            'frame_al_secondo': frame / (self.tempo_ns / 1e9) if self.tempo_ns else 0.0,
+            'tempo_condiviso_s': tempo_condiviso / 1e9,
+            'tempi_condivisi': self.stats.riepilogo_tempi_stadi(),
+            'per_modello': per_modello,
+            'concordanza': concordanza,
+        }
+
+
+def percorso_modello(nome):
+    """
+    File ONNX di un modello selezionabile dall'interfaccia.
+
+    Returns:
+        str: Percorso del modello, o None per AuraFace (scaricato se assente)
+    """
+    if nome == 'Auraface':
+        return None
+
+    if nome == 'Buffalo_l':
+        percorso = os.path.join(configurazione.BUFFALO_DIR, configurazione.BUFFALO_MODELLO_RICONOSCIMENTO)
+        if not os.path.isfile(percorso):
+            raise Exception(f"Modello buffalo_l non trovato: estrarre {configurazione.BUFFALO_MODELLO_RICONOSCIMENTO} "
+                            f"in {configurazione.BUFFALO_DIR}")
+        return percorso
+
+    if nome == 'Custom (ONNX)':
+        # L'ultimo modello caricato dall'interfaccia
+        modelli = [percorso for percorso in glob.glob(os.path.join(configurazione.MODELLO_CUSTOM_DIR, '*.onnx'))
+                   if os.path.getsize(percorso) > 0]
+        if not modelli:
+            raise Exception(f"Nessun modello ONNX custom in {configurazione.MODELLO_CUSTOM_DIR}")
+        return max(modelli, key=os.path.getmtime)
+
+    raise ValueError(f"Modello sconosciuto: {nome} (disponibili: {', '.join(MODELLI_CONFRONTABILI)})")
+
+
+def crea_riconoscitore(nome):
+    """
+    Crea il riconoscitore di un modello selezionabile, senza ripiegare su AuraFace.
+
+    Returns:
+        RiconoscitoreFacciale: Riconoscitore con il modello richiesto
+    """
+    percorso = percorso_modello(nome)
+
+    # Ripiegare su AuraFace renderebbe il confronto privo di senso (e potrebbe scaricarlo)
+    try:
+        return RiconoscitoreFacciale(percorso_modello=percorso, ripiego_auraface=percorso is None)
+    except Exception as e:
+        raise Exception(f"Impossibile caricare il modello '{nome}' da {percorso or 'AuraFace'}: {e}") from e
+
+
+def confronta_modelli(modelli, percorso_video=None):
+    """
+    Confronta due modelli sullo stesso video (eseguita in un processo worker).
+
+    Args:
+        modelli: Nomi dei due modelli (vedi MODELLI_CONFRONTABILI)
+        percorso_video: Video, URL di un flusso, webcam o cartella di immagini
+            (vedi crea_sorgente; default: SORGENTE_VIDEO o PATHVIDEOTAGLIATO)
+
+    Returns:
+        dict: Riepilogo del confronto (vedi ConfrontoModelli.riepilogo)
+    """
+    from src.utils import utils
+    from src.utils.EsportatoreMetriche import avvia_esportatore_metriche
+    from src.utils.statistiche_attuali import stats
+
+    if len(set(modelli)) != 2:
+        raise ValueError("Scegliere due modelli diversi da confrontare")
+
+    riconoscitori = {}
+    for nome in modelli:
+        riconoscitori[nome] = crea_riconoscitore(nome)
+        riconoscitori[nome].carica_volti_noti(configurazione.DIRVOLTI)
+
+    # Le statistiche condivise partono dopo il caricamento delle gallerie
+    utils.azzera_stato_analisi()
+    avvia_esportatore_metriche(stats)
+
+    confronto = ConfrontoModelli(riconoscitori, stats, utils._accumulatore_tracce)
+    confronto.esegui(utils.creazione_e_tracciamento_video_con_YOLO(percorso_video), utils.raccogli_ritagli_frame)
+    return confronto.riepilogo()
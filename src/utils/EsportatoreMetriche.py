@@ -0,0 +1,182 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.config.configurazione_attuale import configurazione
+from src.utils.registro_modelli import tempi_caricamento
+
+PREFISSO = 'riconoscimento'
+TIPO_CONTENUTO = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Limiti superiori (secondi) degli istogrammi di latenza esportati
+LIMITI_LATENZA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (attributo di StatisticheRiconoscimento, nome del contatore, descrizione)
+CONTATORI = (
+    ('frame_letti', 'frame_letti_total', 'Frame letti dalla sorgente'),
+    ('frame_processati', 'frame_processati_total', 'Frame campionati ed elaborati'),
+    ('volti_rilevati', 'volti_rilevati_total', 'Volti rilevati nei ritagli'),
+    ('embedding_estratti', 'embedding_estratti_total', 'Embeddings estratti dai ritagli'),
+    ('identificazioni_riuscite', 'identificazioni_riuscite_total', 'Identificazioni riuscite'),
+    ('tentativi_falliti', 'tentativi_falliti_total', 'Tentativi di identificazione falliti'),
+)
+
+
+class EsportatoreMetriche:
+    """
+    Endpoint HTTP /metrics in formato testo Prometheus.
+
+    Le metriche sono lette dalle statistiche a ogni richiesta, quindi sono
+    visibili mentre l'analisi è in corso: contatori di frame e
+    identificazioni, istogrammi di latenza per fase, profondità delle code,
+    metriche della sorgente in lettura e tempi di caricamento dei modelli.
+    Il server gira su un thread daemon e non rallenta la pipeline: l'unico
+    costo per la pipeline è la registrazione già fatta nelle statistiche.
+
+    Le analisi in background girano in processi worker con statistiche
+    proprie: l'esportatore va avviato nel processo che esegue l'analisi
+    (vedi avvia_esportatore_metriche).
+    """
+
+    def __init__(self, stats, indirizzo=None, porta=None):
+        """
+        Args:
+            stats: StatisticheRiconoscimento da esportare
+            indirizzo: Indirizzo di ascolto (default: INDIRIZZO_METRICHE)
+            porta: Porta di ascolto (default: PORTA_METRICHE; 0 = porta libera qualsiasi)
+        """
+        self.stats = stats
+        self.indirizzo = indirizzo or configurazione.INDIRIZZO_METRICHE
+        self.porta = configurazione.PORTA_METRICHE if porta is None else porta
+        self._server = None
+        self._thread = None
+
+    def avvia(self):
+        """Avvia il server; solleva OSError se la porta è occupata."""
+        esportatore = self
+
+        class Gestore(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                corpo = esportatore.testo().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', TIPO_CONTENUTO)
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.indirizzo, self.porta), Gestore)
+        self._server.daemon_threads = True
+        self.porta = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="esportatore-metriche", daemon=True)
+        self._thread.start()
+        return self
+
+    def chiudi(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
+
+    def testo(self):
+        """Metriche correnti in formato di esposizione testuale Prometheus."""
+        righe = []
+
+        def metrica(nome, tipo, descrizione, campioni):
+            righe.append(f'# HELP {PREFISSO}_{nome} {descrizione}')
+            righe.append(f'# TYPE {PREFISSO}_{nome} {tipo}')
+            for suffisso, etichette, valore in campioni:
+                righe.append(f'{PREFISSO}_{nome}{suffisso}{_etichette(etichette)} {_valore(valore)}')
+
+        stats = self.stats
+        for attributo, nome, descrizione in CONTATORI:
+            metrica(nome, 'counter', descrizione, [('', {}, getattr(stats, attributo))])
+
+        metrica('confidenza_media', 'gauge', 'Confidenza media delle identificazioni riuscite',
+                [('', {}, stats.confidenza.media)])
+
+        campioni = []
+        for stadio, istogramma in list(stats.tempi_stadi.items()):
+            cumulati, conteggio, totale = istogramma.conteggi_cumulati([int(limite * 1e9) for limite in LIMITI_LATENZA])
+            for limite, cumulato in zip(LIMITI_LATENZA, cumulati):
+                campioni.append(('_bucket', {'stadio': stadio, 'le': limite}, cumulato))
+            campioni.append(('_bucket', {'stadio': stadio, 'le': '+Inf'}, conteggio))
+            campioni.append(('_sum', {'stadio': stadio}, totale / 1e9))
+            campioni.append(('_count', {'stadio': stadio}, conteggio))
+        metrica('durata_stadio_secondi', 'histogram', 'Durata delle fasi della pipeline', campioni)
+
+        profondita = dict(stats.profondita_code)
+        sorgente = stats.sorgente_attiva
+        if sorgente is not None:
+            profondita['sorgente'] = sorgente.in_attesa
+        metrica('profondita_coda', 'gauge', 'Elementi in attesa nelle code della pipeline',
+                [('', {'coda': coda}, valore) for coda, valore in profondita.items()])
+
+        if sorgente is not None:
+            dati = sorgente.metriche()
+            etichette = {'tipo': dati['tipo']}
+            metrica('sorgente_frame_scartati_total', 'counter', 'Frame scartati dalla sorgente live perché in ritardo',
+                    [('', etichette, dati['frame_scartati'])])
+            metrica('sorgente_fps', 'gauge', 'FPS medi di acquisizione e di consegna della sorgente',
+                    [('', dict(etichette, fase='acquisizione'), dati['fps_acquisizione']),
+                     ('', dict(etichette, fase='consegna'), dati['fps_consegna'])])
+            metrica('sorgente_latenza_media_secondi', 'gauge', 'Latenza media tra acquisizione e consegna dei frame',
+                    [('', etichette, dati['latenza_media_ms'] / 1000)])
+
+        metrica('caricamento_modello_secondi', 'gauge', 'Tempo di caricamento dei modelli in memoria',
+                [('', {'tipo': tipo, 'modello': str(percorso)}, secondi)
+                 for (tipo, percorso), secondi in tempi_caricamento().items()])
+
+        return '\n'.join(righe) + '\n'
+
+
+def _etichette(etichette):
+    if not etichette:
+        return ''
+    coppie = []
+    for chiave, valore in etichette.items():
+        valore = str(valore).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        coppie.append(f'{chiave}="{valore}"')
+    return '{' + ','.join(coppie) + '}'
+
+
+def _valore(valore):
+    return repr(float(valore)) if isinstance(valore, float) else str(valore)
+
+
+_esportatore = None
+
+
+def avvia_esportatore_metriche(stats):
+    """
+    Avvia (una sola volta per processo) l'esportatore se PORTA_METRICHE è impostata.
+
+    Con più processi di analisi ognuno prova le porte successive a
+    PORTA_METRICHE, fino a NUMERO_PROCESSI_ANALISI porte.
+
+    Returns:
+        EsportatoreMetriche: L'esportatore attivo, o None se disattivato o
+            se nessuna porta è libera
+    """
+    global _esportatore
+
+    if _esportatore is not None or configurazione.PORTA_METRICHE is None:
+        return _esportatore
+
+    for scostamento in range(max(1, configurazione.NUMERO_PROCESSI_ANALISI)):
+        porta = configurazione.PORTA_METRICHE + scostamento
+        try:
+            _esportatore = EsportatoreMetriche(stats, porta=porta).avvia()
+        except OSError:
+            continue
+        print(f"Metriche Prometheus su http://{_esportatore.indirizzo}:{_esportatore.porta}/metrics")
+        return _esportatore
+
+    print(f"Nessuna porta libera per le metriche a partire da {configurazione.PORTA_METRICHE}")
+    return None
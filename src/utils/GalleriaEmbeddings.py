@@ -0,0 +1,251 @@
+import numpy as np
+
+
+MODALITA_PUNTEGGIO = ('max', 'centroide', 'topk')
+
+
+class GalleriaEmbeddings:
+    """
+    Galleria dei volti noti memorizzata come matrice float32 contigua.
+
+    Gli embeddings vengono normalizzati all'inserimento, quindi la similarità
+    coseno si riduce a un prodotto matrice-vettore. La matrice cresce per
+    blocchi (raddoppiando la capacità) per ammortizzare il costo delle aggiunte.
+
+    Una persona può avere più righe (più immagini di riferimento): caricate
+    in ordine di nome formano un blocco contiguo, e cerca_identita calcola il
+    punteggio per identità con una sola passata sulla matrice. Le immagini
+    aggiunte singolarmente a una persona nota vengono inserite in fondo al
+    suo blocco, così il blocco resta contiguo.
+    """
+
+    def __init__(self, capacita_iniziale=64):
+        self.capacita_iniziale = capacita_iniziale
+        self._matrice = None
+        self._numero = 0
+        self._identita = None
+        self.nomi = []
+
+    def __len__(self):
+        return self._numero
+
+    @property
+    def dimensione(self):
+        """Dimensione degli embeddings (0 se la galleria è vuota)."""
+        return 0 if self._matrice is None else self._matrice.shape[1]
+
+    @property
+    def matrice(self):
+        """Vista (senza copia) delle righe occupate della matrice."""
+        if self._matrice is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._matrice[:self._numero]
+
+    def svuota(self):
+        """Rimuove tutti gli embeddings dalla galleria."""
+        self._matrice = None
+        self._numero = 0
+        self._identita = None
+        self.nomi = []
+
+    def imposta(self, embeddings, nomi):
+        """Sostituisce il contenuto della galleria."""
+        self.svuota()
+        self.aggiungi_molti(embeddings, nomi)
+
+    def imposta_mappata(self, matrice, nomi):
+        """
+        Usa come galleria una matrice già normalizzata senza copiarla
+        (ad esempio un np.memmap in sola lettura).
+
+        La capacità coincide con le righe presenti, quindi la prima aggiunta
+        successiva copia la matrice in memoria invece di scrivere sul file.
+        """
+        self._matrice = matrice
+        self._numero = len(matrice)
+        self._identita = None
+        self.nomi = list(nomi)
+
+    def aggiungi(self, embedding, nome):
+        """
+        Aggiunge un singolo embedding alla galleria.
+
+        Se la persona ha già delle righe, il nuovo embedding viene inserito
+        dopo l'ultima e le righe successive scendono di una posizione;
+        altrimenti viene aggiunto in coda.
+
+        Returns:
+            int: Riga dell'embedding aggiunto
+        """
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        riga = self._fine_blocco(nome)
+        if riga is None or riga == self._numero:
+            self.aggiungi_molti(embedding, [nome])
+            return self._numero - 1
+
+        self._garantisci_capacita(self._numero + 1, embedding.shape[1])
+        # numpy gestisce la sovrapposizione tra sorgente e destinazione
+        self._matrice[riga + 1:self._numero + 1] = self._matrice[riga:self._numero]
+        self._matrice[riga] = normalizza_righe(embedding)[0]
+        self._numero += 1
+        self._identita = None
+        self.nomi.insert(riga, nome)
+        return riga
+
+    def _fine_blocco(self, nome):
+        """Riga successiva all'ultima della persona, o None se la persona non è nella galleria."""
+        for riga in range(len(self.nomi) - 1, -1, -1):
+            if self.nomi[riga] == nome:
+                return riga + 1
+        return None
+
+    def aggiungi_molti(self, embeddings, nomi):
+        """
+        Aggiunge più embeddings alla galleria in un'unica copia.
+
+        Args:
+            embeddings: Array (N, D) o lista di vettori
+            nomi: Lista di N nomi associati
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.size == 0:
+            return
+        embeddings = embeddings.reshape(len(nomi), -1)
+
+        self._garantisci_capacita(self._numero + len(embeddings), embeddings.shape[1])
+
+        fine = self._numero + len(embeddings)
+        self._matrice[self._numero:fine] = normalizza_righe(embeddings)
+        self._numero = fine
+        self._identita = None
+        self.nomi.extend(nomi)
+
+    def _garantisci_capacita(self, richiesta, dimensione):
+        """Rialloca la matrice se la capacità non basta per `richiesta` righe."""
+        if self._matrice is None:
+            capacita = max(self.capacita_iniziale, richiesta)
+            self._matrice = np.empty((capacita, dimensione), dtype=np.float32)
+            return
+
+        if dimensione != self._matrice.shape[1]:
+            raise ValueError(f"Dimensione embedding {dimensione} diversa da quella della galleria {self._matrice.shape[1]}")
+
+        if richiesta <= self._matrice.shape[0]:
+            return
+
+        capacita = max(richiesta, 2 * self._matrice.shape[0])
+        nuova_matrice = np.empty((capacita, dimensione), dtype=np.float32)
+        nuova_matrice[:self._numero] = self._matrice[:self._numero]
+        self._matrice = nuova_matrice
+
+    def cerca(self, query):
+        """
+        Trova il volto noto più simile per uno o più embeddings.
+
+        Args:
+            query: Embedding (D,) o batch di embeddings (Q, D)
+
+        Returns:
+            tuple: (indici, similarita) array di lunghezza Q
+        """
+        query = normalizza_righe(np.atleast_2d(np.asarray(query, dtype=np.float32)))
+        similarita = query @ self.matrice.T
+
+        indici = np.argmax(similarita, axis=1)
+        return indici, similarita[np.arange(len(indici)), indici]
+
+    def _struttura_identita(self):
+        """
+        Raggruppa le righe per identità; ricalcolata solo dopo una modifica della galleria.
+
+        Returns:
+            dict: nomi delle identità, ordine delle righe (None se già
+                raggruppate), inizio e numero di righe di ogni blocco, norma
+                dei centroidi e scostamento per riga che tiene separati i
+                blocchi quando le similarità vengono ordinate (vedi cerca_identita)
+        """
+        if self._identita is not None:
+            return self._identita
+
+        nomi_identita, inverso = np.unique(np.asarray(self.nomi), return_inverse=True)
+        ordine = np.argsort(inverso, kind='stable')
+        conteggi = np.bincount(inverso, minlength=len(nomi_identita))
+        inizi = np.concatenate(([0], np.cumsum(conteggi)[:-1]))
+
+        matrice = self.matrice
+        if np.array_equal(ordine, np.arange(len(ordine))):
+            ordine = None
+        else:
+            matrice = matrice[ordine]
+
+        norme_centroidi = np.linalg.norm(np.add.reduceat(matrice, inizi, axis=0), axis=1) / conteggi
+        norme_centroidi[norme_centroidi == 0] = 1.0
+
+        # Le similarità sono in [-1, 1]: con un passo di 3 per identità i blocchi non si sovrappongono
+        scostamenti = np.repeat(np.arange(len(conteggi), dtype=np.float64) * 3.0, conteggi)
+
+        self._identita = {
+            'nomi': [str(nome) for nome in nomi_identita],
+            'ordine': ordine,
+            'inizi': inizi,
+            'conteggi': conteggi,
+            'norme_centroidi': norme_centroidi.astype(np.float32),
+            'scostamenti': scostamenti,
+        }
+        return self._identita
+
+    def cerca_identita(self, query, modalita='max', k=3):
+        """
+        Trova l'identità più simile confrontando la query con tutte le sue immagini di riferimento.
+
+        Args:
+            query: Embedding (D,) o batch di embeddings (Q, D)
+            modalita: 'max' (immagine più simile), 'centroide' (similarità con
+                la media normalizzata delle immagini) o 'topk' (media delle k
+                similarità migliori)
+            k: Immagini considerate dalla modalità 'topk'
+
+        Returns:
+            tuple: (nomi delle identità, punteggi) di lunghezza Q
+        """
+        if modalita not in MODALITA_PUNTEGGIO:
+            raise ValueError(f"Modalità di punteggio non supportata: {modalita} (attese: {', '.join(MODALITA_PUNTEGGIO)})")
+
+        struttura = self._struttura_identita()
+        query = normalizza_righe(np.atleast_2d(np.asarray(query, dtype=np.float32)))
+
+        # Unica passata sulla matrice della galleria
+        similarita = query @ self.matrice.T
+        if struttura['ordine'] is not None:
+            similarita = similarita[:, struttura['ordine']]
+
+        if modalita == 'max' or (modalita == 'topk' and k <= 1):
+            punteggi = np.maximum.reduceat(similarita, struttura['inizi'], axis=1)
+        elif modalita == 'centroide':
+            # q·media/|media| = somma delle similarità / (n * |media|)
+            punteggi = np.add.reduceat(similarita, struttura['inizi'], axis=1)
+            punteggi /= struttura['conteggi'] * struttura['norme_centroidi']
+        else:
+            # Ordinando per (identità, similarità) i blocchi restano contigui e le k similarità
+            # migliori di ogni identità sono in coda al suo blocco: la memoria resta (Q, N)
+            # anche se un'identità ha molte più immagini delle altre
+            ordinate = similarita + struttura['scostamenti']
+            ordinate.sort(axis=1)
+            ordinate -= struttura['scostamenti']
+
+            cumulate = np.zeros((len(ordinate), ordinate.shape[1] + 1))
+            np.cumsum(ordinate, axis=1, out=cumulate[:, 1:])
+
+            migliori_k = np.minimum(k, struttura['conteggi'])
+            fini = struttura['inizi'] + struttura['conteggi']
+            punteggi = ((cumulate[:, fini] - cumulate[:, fini - migliori_k]) / migliori_k).astype(np.float32)
+
+        migliori = np.argmax(punteggi, axis=1)
+        return [struttura['nomi'][indice] for indice in migliori], punteggi[np.arange(len(migliori)), migliori]
+
+
+def normalizza_righe(embeddings):
+    """Normalizza L2 le righe di una matrice di embeddings."""
+    norme = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norme[norme == 0] = 1.0
+    return embeddings / norme
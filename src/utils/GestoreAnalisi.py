@@ -0,0 +1,229 @@
+import multiprocessing
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from src.config.configurazione_attuale import configurazione
+
+IN_CODA = 'in_coda'
+IN_CORSO = 'in_corso'
+COMPLETATA = 'completata'
+FALLITA = 'fallita'
+
+
+class GestoreAnalisi:
+    """
+    Esecuzione delle analisi video come job in background.
+
+    Ogni analisi riceve un ID e viene eseguita in un processo worker
+    separato: statistiche, persone e ID conosciuti (globali dei moduli di
+    analisi) appartengono al processo, quindi due analisi concorrenti non si
+    sovrascrivono a vicenda. I worker restano attivi tra un job e l'altro e
+    conservano i modelli già caricati nel proprio registro.
+
+    Il gestore non importa i moduli di analisi: chi interroga lo stato dei
+    job (ad esempio la pagina dei risultati) non paga l'import di YOLO,
+    onnxruntime e delle altre dipendenze pesanti.
+    """
+
+    def __init__(self, numero_processi=None, job_massimi=None):
+        """
+        Args:
+            numero_processi: Analisi eseguibili in parallelo
+            job_massimi: Job conclusi conservati in memoria (i più vecchi vengono dimenticati)
+        """
+        self.numero_processi = numero_processi or configurazione.NUMERO_PROCESSI_ANALISI
+        self.job_massimi = job_massimi or configurazione.ANALISI_MASSIME_MEMORIZZATE
+        self._pool = None
+        self._job = {}
+        self._blocco = threading.Lock()
+
+    def _ottieni_pool(self):
+        """Crea il pool di processi al primo job."""
+        if self._pool is None:
+            # 'spawn' evita di duplicare nei figli lo stato dei thread di onnxruntime/torch
+            contesto = multiprocessing.get_context('spawn')
+            self._pool = ProcessPoolExecutor(max_workers=self.numero_processi, mp_context=contesto)
+        return self._pool
+
+    def avvia(self, percorso_video=None, segmentata=False, scarica_dati=False, modello=None):
+        """
+        Accoda una nuova analisi.
+
+        Args:
+            percorso_video: Video, URL di un flusso, webcam o cartella di immagini da analizzare
+                (vedi crea_sorgente; default: SORGENTE_VIDEO o PATHVIDEOTAGLIATO)
+            segmentata: Usa l'elaborazione a segmenti paralleli (video lunghi)
+            scarica_dati: Scarica volti e video di esempio prima dell'analisi
+            modello: Modello di riconoscimento scelto nell'interfaccia
+                (vedi ConfrontoModelli.percorso_modello; default: AuraFace)
+
+        Returns:
+            str: ID dell'analisi
+        """
+        parametri = {'percorso_video': percorso_video, 'segmentata': segmentata, 'scarica_dati': scarica_dati,
+                     'modello': modello}
+        return self._accoda(esegui_analisi, parametri)
+
+    def avvia_confronto(self, modelli, percorso_video=None, scarica_dati=False):
+        """
+        Accoda il confronto di due modelli di riconoscimento sullo stesso video.
+
+        Args:
+            modelli: Nomi dei due modelli (vedi ConfrontoModelli.MODELLI_CONFRONTABILI)
+            percorso_video: Sorgente da analizzare (vedi avvia)
+            scarica_dati: Scarica volti e video di esempio prima del confronto
+
+        Returns:
+            str: ID del job, interrogabile con stato e risultato come un'analisi
+        """
+        parametri = {'modelli': list(modelli), 'percorso_video': percorso_video, 'scarica_dati': scarica_dati}
+        return self._accoda(esegui_confronto, parametri)
+
+    def _accoda(self, funzione, parametri):
+        """Sottomette un job al pool e ne restituisce l'ID."""
+        id_analisi = uuid.uuid4().hex[:12]
+
+        with self._blocco:
+            futuro = self._ottieni_pool().submit(funzione, **parametri)
+            self._job[id_analisi] = {'futuro': futuro, 'parametri': parametri, 'accodata': time.time()}
+            self._dimentica_vecchi()
+
+        return id_analisi
+
+    def stato(self, id_analisi):
+        """
+        Restituisce lo stato di un'analisi.
+
+        Returns:
+            dict: id, stato (in_coda, in_corso, completata, fallita), parametri,
+                secondi trascorsi dall'accodamento ed eventuale errore; None se
+                l'ID non è noto
+        """
+        job = self._job.get(id_analisi)
+        if job is None:
+            return None
+
+        futuro = job['futuro']
+        stato = {
+            'id': id_analisi,
+            'parametri': job['parametri'],
+            'secondi': time.time() - job['accodata'],
+            'errore': None,
+        }
+
+        if not futuro.done():
+            stato['stato'] = IN_CORSO if futuro.running() else IN_CODA
+        elif futuro.exception() is not None:
+            stato['stato'] = FALLITA
+            stato['errore'] = str(futuro.exception())
+        else:
+            stato['stato'] = FALLITA if futuro.result().get('errore') else COMPLETATA
+            stato['errore'] = futuro.result().get('errore')
+            stato['secondi'] = futuro.result()['durata']
+
+        return stato
+
+    def risultato(self, id_analisi):
+        """
+        Restituisce il risultato di un'analisi conclusa con successo.
+
+        Returns:
+            dict: 'statistiche' (come calcola_statistiche), 'stats'
+                (StatisticheRiconoscimento della sola analisi), 'persone'
+                (nome -> Persona) e 'durata'; per un confronto 'confronto'
+                (vedi ConfrontoModelli.riepilogo) e 'durata'. None se il job
+                non è completato
+        """
+        stato = self.stato(id_analisi)
+        if stato is None or stato['stato'] != COMPLETATA:
+            return None
+        return self._job[id_analisi]['futuro'].result()
+
+    def elenco(self):
+        """Stato di tutte le analisi in memoria, dalla più recente."""
+        with self._blocco:
+            id_analisi = sorted(self._job, key=lambda chiave: self._job[chiave]['accodata'], reverse=True)
+        return [self.stato(chiave) for chiave in id_analisi]
+
+    def _dimentica_vecchi(self):
+        """Rimuove i job conclusi più vecchi oltre il limite (da chiamare con il blocco)."""
+        conclusi = sorted((chiave for chiave, job in self._job.items() if job['futuro'].done()),
+                          key=lambda chiave: self._job[chiave]['accodata'])
+        for chiave in conclusi[:max(0, len(self._job) - self.job_massimi)]:
+            del self._job[chiave]
+
+    def chiudi(self):
+        """Termina i processi worker al termine dei job in corso."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+def esegui_analisi(percorso_video=None, segmentata=False, scarica_dati=False, modello=None):
+    """
+    Esegue un'analisi completa (eseguita in un processo worker).
+
+    Returns:
+        dict: Statistiche, persone identificate e durata, o l'errore con il traceback
+    """
+    start_time = time.time()
+
+    try:
+        # Import nel worker: il processo che accoda i job non carica le dipendenze di analisi
+        from src.utils import utils
+        from src.utils.statistiche_attuali import stats
+
+        if scarica_dati:
+            utils.crea_cartelle_necessarie()
+            utils.dowload_immagini()
+            utils.dowload_e_taglia_video()
+
+        if segmentata:
+            from src.utils.elaborazione_segmenti import inizializza_tutto_segmentato
+            statistiche = inizializza_tutto_segmentato(percorso_video, modello=modello)
+        else:
+            statistiche = utils.inizializza_tutto(percorso_video, modello)
+
+        return {
+            'statistiche': statistiche,
+            'stats': stats,
+            'persone': utils.dizionario,
+            'durata': time.time() - start_time,
+            'errore': None,
+        }
+
+    except Exception as e:
+        traceback.print_exc()
+        return {'errore': f"{type(e).__name__}: {e}", 'durata': time.time() - start_time}
+
+
+def esegui_confronto(modelli, percorso_video=None, scarica_dati=False):
+    """
+    Esegue il confronto di due modelli (eseguito in un processo worker).
+
+    Returns:
+        dict: Riepilogo del confronto e durata, o l'errore con il traceback
+    """
+    start_time = time.time()
+
+    try:
+        from src.utils import utils
+        from src.utils.ConfrontoModelli import confronta_modelli
+
+        if scarica_dati:
+            utils.crea_cartelle_necessarie()
+            utils.dowload_immagini()
+            utils.dowload_e_taglia_video()
+
+        return {
+            'confronto': confronta_modelli(modelli, percorso_video),
+            'durata': time.time() - start_time,
+            'errore': None,
+        }
+
+    except Exception as e:
+        traceback.print_exc()
+        return {'errore': f"{type(e).__name__}: {e}", 'durata': time.time() - start_time}
@@ -0,0 +1,251 @@
+import os
+
+import numpy as np
+
+from src.utils.GalleriaEmbeddings import normalizza_righe
+
+
+class IndiceFlat:
+    """Indice esatto: confronta la query con tutte le righe della galleria."""
+
+    tipo = 'flat'
+
+    def __init__(self, galleria):
+        self.galleria = galleria
+
+    def ricostruisci(self):
+        """Nessuna struttura da costruire per la ricerca esatta."""
+
+    def aggiungi(self, indice_riga):
+        """Nessuna struttura da aggiornare per la ricerca esatta."""
+
+    def cerca(self, query):
+        """
+        Restituisce il volto noto più simile per ogni query.
+
+        Returns:
+            tuple: (indici, similarita) array di lunghezza Q
+        """
+        return self.galleria.cerca(query)
+
+    def salva(self, percorso):
+        """L'indice esatto non ha stato da salvare."""
+
+    def carica(self, percorso):
+        """L'indice esatto è sempre valido."""
+        return True
+
+
+class IndiceIVF:
+    """
+    Indice approssimato a liste invertite (IVF) implementato in numpy.
+
+    Le righe della galleria vengono assegnate al centroide più vicino di un
+    k-means sferico; la ricerca confronta la query solo con le righe delle
+    `nprobe` liste più vicine. Sotto `minimo_addestramento` volti la ricerca
+    resta esatta.
+    """
+
+    tipo = 'ivf'
+
+    def __init__(self, galleria, numero_liste=None, nprobe=8, minimo_addestramento=1024):
+        self.galleria = galleria
+        self.numero_liste_richiesto = numero_liste
+        self.nprobe = nprobe
+        self.minimo_addestramento = minimo_addestramento
+
+        self.centroidi = None
+        self.numero_addestramento = 0
+        self._liste = []
+        self._cache_liste = []
+
+    @property
+    def addestrato(self):
+        return self.centroidi is not None
+
+    def ricostruisci(self):
+        """Addestra i centroidi e riassegna tutte le righe della galleria."""
+        numero_righe = len(self.galleria)
+        self.centroidi = None
+        self._liste = []
+        self._cache_liste = []
+
+        if numero_righe < self.minimo_addestramento:
+            return
+
+        numero_liste = self.numero_liste_richiesto or max(1, int(2 * np.sqrt(numero_righe)))
+        numero_liste = min(numero_liste, numero_righe)
+
+        self.centroidi = _kmeans_sferico(self.galleria.matrice, numero_liste)
+        self.numero_addestramento = numero_righe
+        self._imposta_assegnazioni(self._assegna(self.galleria.matrice))
+
+    def aggiungi(self, indice_riga):
+        """
+        Inserisce una nuova riga della galleria nella lista del centroide più vicino.
+
+        La riga può essere stata inserita in mezzo alla galleria (vedi
+        GalleriaEmbeddings.aggiungi): le righe successive, già nelle liste,
+        scendono di una posizione.
+        """
+        if not self.addestrato:
+            if len(self.galleria) >= self.minimo_addestramento:
+                self.ricostruisci()
+            return
+
+        # Riaddestra quando la galleria è cresciuta molto rispetto all'ultimo addestramento
+        if len(self.galleria) >= 4 * self.numero_addestramento:
+            self.ricostruisci()
+            return
+
+        if indice_riga < len(self.galleria) - 1:
+            self._liste = [[riga + (riga >= indice_riga) for riga in righe] for righe in self._liste]
+            self._cache_liste = [None] * len(self._liste)
+
+        lista = int(self._assegna(self.galleria.matrice[indice_riga:indice_riga + 1])[0])
+        self._liste[lista].append(indice_riga)
+        self._cache_liste[lista] = None
+
+    def cerca(self, query):
+        """
+        Restituisce il volto noto (approssimativamente) più simile per ogni query.
+
+        Returns:
+            tuple: (indici, similarita) array di lunghezza Q
+        """
+        if not self.addestrato:
+            return self.galleria.cerca(query)
+
+        query = normalizza_righe(np.atleast_2d(np.asarray(query, dtype=np.float32)))
+        matrice = self.galleria.matrice
+        nprobe = min(self.nprobe, len(self.centroidi))
+
+        # Liste più vicine per ogni query
+        similarita_centroidi = query @ self.centroidi.T
+        liste_vicine = np.argpartition(-similarita_centroidi, nprobe - 1, axis=1)[:, :nprobe]
+
+        indici = np.zeros(len(query), dtype=np.int64)
+        similarita = np.full(len(query), -1.0, dtype=np.float32)
+
+        for posizione, liste in enumerate(liste_vicine):
+            candidati = np.concatenate([self._righe_lista(lista) for lista in liste])
+            if candidati.size == 0:
+                continue
+
+            punteggi = matrice[candidati] @ query[posizione]
+            migliore = int(np.argmax(punteggi))
+            indici[posizione] = candidati[migliore]
+            similarita[posizione] = punteggi[migliore]
+
+        return indici, similarita
+
+    def salva(self, percorso):
+        """Salva centroidi e assegnazioni in un file .npz."""
+        if not self.addestrato:
+            if os.path.exists(percorso):
+                os.remove(percorso)
+            return
+
+        assegnazioni = np.empty(len(self.galleria), dtype=np.int32)
+        for lista, righe in enumerate(self._liste):
+            assegnazioni[righe] = lista
+
+        np.savez(percorso, centroidi=self.centroidi, assegnazioni=assegnazioni,
+                 numero_addestramento=self.numero_addestramento)
+
+    def carica(self, percorso):
+        """
+        Carica l'indice salvato se coerente con la galleria corrente.
+
+        Returns:
+            bool: True se l'indice è stato caricato
+        """
+        if not os.path.exists(percorso):
+            return False
+
+        try:
+            with np.load(percorso) as dati:
+                assegnazioni = dati['assegnazioni']
+                if len(assegnazioni) != len(self.galleria):
+                    return False
+
+                self.centroidi = dati['centroidi']
+                self.numero_addestramento = int(dati['numero_addestramento'])
+                self._imposta_assegnazioni(assegnazioni)
+            return True
+
+        except Exception as e:
+            print(f"Errore caricamento indice: {e}")
+            return False
+
+    def _assegna(self, righe, dimensione_blocco=8192):
+        """Restituisce il centroide più vicino per ogni riga, elaborando a blocchi."""
+        assegnazioni = np.empty(len(righe), dtype=np.int32)
+        for inizio in range(0, len(righe), dimensione_blocco):
+            blocco = righe[inizio:inizio + dimensione_blocco]
+            assegnazioni[inizio:inizio + len(blocco)] = np.argmax(blocco @ self.centroidi.T, axis=1)
+        return assegnazioni
+
+    def _imposta_assegnazioni(self, assegnazioni):
+        """Costruisce le liste invertite a partire dall'assegnazione di ogni riga."""
+        ordine = np.argsort(assegnazioni, kind='stable')
+        confini = np.searchsorted(assegnazioni[ordine], np.arange(len(self.centroidi) + 1))
+
+        self._liste = [ordine[confini[i]:confini[i + 1]].tolist() for i in range(len(self.centroidi))]
+        self._cache_liste = [None] * len(self.centroidi)
+
+    def _righe_lista(self, lista):
+        """Restituisce le righe di una lista come array, con cache."""
+        righe = self._cache_liste[lista]
+        if righe is None:
+            righe = np.asarray(self._liste[lista], dtype=np.int64)
+            self._cache_liste[lista] = righe
+        return righe
+
+
+def _kmeans_sferico(dati, numero_centroidi, iterazioni=10, massimo_campioni=64, seed=0):
+    """
+    K-means su vettori normalizzati (similarità coseno).
+
+    L'addestramento usa al più `massimo_campioni` punti per centroide.
+    """
+    rng = np.random.default_rng(seed)
+
+    numero_campioni = min(len(dati), numero_centroidi * massimo_campioni)
+    campioni = dati[rng.choice(len(dati), numero_campioni, replace=False)]
+
+    centroidi = campioni[rng.choice(len(campioni), numero_centroidi, replace=False)].copy()
+
+    for _ in range(iterazioni):
+        assegnazioni = np.argmax(campioni @ centroidi.T, axis=1)
+
+        # Somma i punti di ogni cluster
+        ordine = np.argsort(assegnazioni, kind='stable')
+        cluster_presenti, inizi = np.unique(assegnazioni[ordine], return_index=True)
+        somme = np.add.reduceat(campioni[ordine], inizi, axis=0)
+
+        nuovi_centroidi = campioni[rng.choice(len(campioni), numero_centroidi)].copy()
+        nuovi_centroidi[cluster_presenti] = somme
+        centroidi = normalizza_righe(nuovi_centroidi).astype(np.float32)
+
+    return centroidi
+
+
+def crea_indice(tipo, galleria, **parametri):
+    """
+    Crea l'indice della galleria richiesto.
+
+    Args:
+        tipo: 'flat' (esatto) o 'ivf' (approssimato)
+        galleria: GalleriaEmbeddings da indicizzare
+        parametri: Parametri specifici dell'indice
+
+    Returns:
+        IndiceFlat o IndiceIVF
+    """
+    if tipo == 'flat':
+        return IndiceFlat(galleria)
+    if tipo == 'ivf':
+        return IndiceIVF(galleria, **parametri)
+
+    raise ValueError(f"Tipo di indice non supportato: {tipo}")
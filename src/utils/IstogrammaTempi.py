@@ -0,0 +1,149 @@
+import threading
+
+# Sotto-intervalli per ogni potenza di 2: errore relativo dei quantili entro 1/16 (~6%)
+BIT_SOTTOINTERVALLI = 3
+_SOTTOINTERVALLI = 1 << BIT_SOTTOINTERVALLI
+_LINEARI = _SOTTOINTERVALLI * 2
+
+
+class IstogrammaTempi:
+    """
+    Istogramma a intervalli logaritmici fissi per durate in nanosecondi.
+
+    Ogni potenza di 2 è divisa in 8 intervalli uguali, quindi la memoria è
+    costante (qualche centinaio di contatori fino a durate di ore) e
+    l'inserimento costa un bit_length e un incremento. I quantili sono
+    stimati al centro dell'intervallo, con errore relativo entro il 6%;
+    conteggio, somma, minimo e massimo sono esatti.
+
+    Gli inserimenti sono protetti da un lock: più thread della pipeline
+    possono registrare la stessa fase contemporaneamente.
+    """
+
+    def __init__(self):
+        self.conteggi = []
+        self.conteggio = 0
+        self.totale = 0
+        self.minimo = None
+        self.massimo = 0
+        self._blocco = threading.Lock()
+
+    def __getstate__(self):
+        # Il lock non è serializzabile: le statistiche tornano dai processi worker via pickle
+        stato = self.__dict__.copy()
+        del stato['_blocco']
+        return stato
+
+    def __setstate__(self, stato):
+        self.__dict__.update(stato)
+        self._blocco = threading.Lock()
+
+    def __len__(self):
+        return self.conteggio
+
+    def aggiungi(self, durata_ns):
+        """Registra una durata in nanosecondi."""
+        durata_ns = max(0, int(durata_ns))
+        indice = _indice(durata_ns)
+
+        with self._blocco:
+            if indice >= len(self.conteggi):
+                self.conteggi.extend([0] * (indice + 1 - len(self.conteggi)))
+            self.conteggi[indice] += 1
+            self.conteggio += 1
+            self.totale += durata_ns
+            if self.minimo is None or durata_ns < self.minimo:
+                self.minimo = durata_ns
+            if durata_ns > self.massimo:
+                self.massimo = durata_ns
+
+    def unisci(self, altro):
+        """Somma all'istogramma corrente i conteggi di un altro."""
+        with self._blocco:
+            if len(altro.conteggi) > len(self.conteggi):
+                self.conteggi.extend([0] * (len(altro.conteggi) - len(self.conteggi)))
+            for indice, conteggio in enumerate(altro.conteggi):
+                self.conteggi[indice] += conteggio
+
+            self.conteggio += altro.conteggio
+            self.totale += altro.totale
+            if altro.minimo is not None and (self.minimo is None or altro.minimo < self.minimo):
+                self.minimo = altro.minimo
+            self.massimo = max(self.massimo, altro.massimo)
+
+    def quantile(self, q):
+        """
+        Stima il quantile q (tra 0 e 1) in nanosecondi.
+
+        Returns:
+            float: Centro dell'intervallo che contiene il quantile, limitato a
+                minimo e massimo osservati; 0 se l'istogramma è vuoto
+        """
+        if self.conteggio == 0:
+            return 0.0
+
+        obiettivo = max(1, int(q * self.conteggio + 0.5))
+        cumulato = 0
+        for indice, conteggio in enumerate(self.conteggi):
+            cumulato += conteggio
+            if cumulato >= obiettivo:
+                inferiore, superiore = _limiti(indice)
+                return float(min(max((inferiore + superiore) / 2, self.minimo), self.massimo))
+        return float(self.massimo)
+
+    def conteggi_cumulati(self, limiti_ns):
+        """
+        Istantanea coerente per l'esportazione come istogramma Prometheus.
+
+        Args:
+            limiti_ns: Limiti superiori crescenti in nanosecondi
+
+        Returns:
+            tuple: (per ogni limite il numero di durate che cadono in intervalli
+                interamente sotto il limite, conteggio totale, somma in ns)
+        """
+        with self._blocco:
+            conteggi = list(self.conteggi)
+            conteggio, totale = self.conteggio, self.totale
+
+        cumulati = []
+        cumulato = 0
+        indice = 0
+        for limite in limiti_ns:
+            while indice < len(conteggi) and _limiti(indice)[1] <= limite + 1:
+                cumulato += conteggi[indice]
+                indice += 1
+            cumulati.append(cumulato)
+        return cumulati, conteggio, totale
+
+    def riepilogo(self):
+        """
+        Returns:
+            dict: conteggio, totale, media, p50, p95, p99 e massimo in millisecondi
+        """
+        return {
+            'conteggio': self.conteggio,
+            'totale_ms': self.totale / 1e6,
+            'media_ms': self.totale / self.conteggio / 1e6 if self.conteggio else 0.0,
+            'p50_ms': self.quantile(0.50) / 1e6,
+            'p95_ms': self.quantile(0.95) / 1e6,
+            'p99_ms': self.quantile(0.99) / 1e6,
+            'massimo_ms': self.massimo / 1e6,
+        }
+
+
+def _indice(valore):
+    """Intervallo di un valore: lineare sotto 16, poi 8 intervalli per potenza di 2."""
+    if valore < _LINEARI:
+        return valore
+    spostamento = valore.bit_length() - BIT_SOTTOINTERVALLI - 1
+    return spostamento * _SOTTOINTERVALLI + (valore >> spostamento)
+
+
+def _limiti(indice):
+    """Estremi [inferiore, superiore) dei valori che cadono nell'intervallo."""
+    if indice < _LINEARI:
+        return indice, indice + 1
+    spostamento = indice // _SOTTOINTERVALLI - 1
+    mantissa = indice % _SOTTOINTERVALLI + _SOTTOINTERVALLI
+    return mantissa << spostamento, (mantissa + 1) << spostamento
@@ -1,35 +1,79 @@
+from collections import deque
+
+from src.config.configurazione_attuale import configurazione
+from src.utils.StatisticaFlusso import StatisticaFlusso
+
+
 class Persona:
-    def __init__(self, nome, path_immagine):
+    """
+    Persona nota e storico delle sue identificazioni.
+
+    Lo storico occupa memoria costante anche su flussi senza fine: degli ID
+    di tracciamento si conservano il primo e gli ultimi STORICO_ID_PERSONA,
+    delle confidenze solo le statistiche (media, varianza, minimo, massimo).
+    """
+
+    __slots__ = ('nome', 'pathImmagine', 'immagini_riferimento', 'id', 'primo_id', 'list_ID', 'confidenza',
+                 'identification_count')
+
+    def __init__(self, nome, path_immagine, immagini_riferimento=None):
         self.nome = nome
         self.pathImmagine = path_immagine
+        # Tutte le immagini di riferimento della persona (la prima è pathImmagine)
+        self.immagini_riferimento = list(immagini_riferimento) if immagini_riferimento else [path_immagine]
         self.id = None
-        self.list_ID = []
-        self.confidence_scores = []
+        self.primo_id = None
+        self.list_ID = deque(maxlen=configurazione.STORICO_ID_PERSONA)
+        self.confidenza = StatisticaFlusso()
         self.identification_count = 0
 
+    def aggiungi_riferimento(self, path_immagine):
+        """Aggiunge un'immagine di riferimento della persona."""
+        if path_immagine not in self.immagini_riferimento:
+            self.immagini_riferimento.append(path_immagine)
+
     def update(self, new_ID, confidence=None):
+        if self.identification_count == 0:
+            self.primo_id = new_ID
         self.list_ID.append(new_ID)
         self.id = new_ID
         self.identification_count += 1
 
         if confidence is not None:
-            self.confidence_scores.append(confidence)
+            self.confidenza.aggiungi(confidence)
+
+    def unisci(self, altra, mappa_id):
+        """
+        Aggiunge lo storico di un'altra istanza della stessa persona
+        (ad esempio da un altro segmento video), rimappando gli ID di tracciamento.
+
+        Args:
+            altra: Persona con lo stesso nome
+            mappa_id: Dizionario ID locale -> ID globale
+        """
+        if self.identification_count == 0 and altra.identification_count:
+            self.primo_id = mappa_id.get(altra.primo_id, altra.primo_id)
+        self.list_ID.extend(mappa_id.get(id_locale, id_locale) for id_locale in altra.list_ID)
+        self.confidenza.unisci(altra.confidenza)
+        self.identification_count += altra.identification_count
+
+        if altra.id is not None:
+            self.id = mappa_id.get(altra.id, altra.id)
 
     def get_statistics(self):
-        avg_confidence = sum(self.confidence_scores) / len(self.confidence_scores) if self.confidence_scores else 0
         return {
             'name': self.nome,
             'current_id': self.id,
-            'total_ids': len(self.list_ID),
+            'total_ids': self.identification_count,
             'identification_count': self.identification_count,
-            'average_confidence': avg_confidence,
-            'all_ids': self.list_ID.copy()
+            'average_confidence': self.confidenza.media,
+            'first_id': self.primo_id,
+            'all_ids': list(self.list_ID)
         }
 
     def __str__(self) -> str:
-        id_history = f"[{', '.join(map(str, self.list_ID[-3:]))}]" if len(self.list_ID) > 0 else "[]"
-        avg_conf = sum(self.confidence_scores) / len(self.confidence_scores) if self.confidence_scores else 0
-        return f'{self.nome} | Current ID: {self.id} | IDs: {id_history} | Identifications: {self.identification_count} | Avg Conf: {avg_conf:.3f}'
+        id_history = f"[{', '.join(map(str, list(self.list_ID)[-3:]))}]" if len(self.list_ID) > 0 else "[]"
+        return f'{self.nome} | Current ID: {self.id} | IDs: {id_history} | Identifications: {self.identification_count} | Avg Conf: {self.confidenza.media:.3f}'
 
     def __repr__(self) -> str:
-        return self.__str__()
\ No newline at end of file
+        return self.__str__()
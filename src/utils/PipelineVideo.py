@@ -0,0 +1,153 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+_FINE = object()
+
+# Secondi di attesa di nuovi ritagli prima di applicare gli esiti già pronti
+ATTESA_ESITI = 0.005
+
+
+class PipelineVideo:
+    """
+    Pipeline a stadi per l'analisi video.
+
+    - Produttore (thread dedicato): consuma il generatore YOLO (decodifica e
+      rilevamento persone) ed estrae i ritagli di ogni frame.
+    - Worker (pool di thread): rilevamento volti, embedding ONNX e matching.
+      onnxruntime e OpenCV rilasciano il GIL, quindi i thread lavorano in
+      parallelo. I ritagli di un frame vengono divisi in un lavoro per
+      worker (al più `dimensione_lavoro` ritagli ciascuno): le tracce di uno
+      stesso frame sono elaborate su worker diversi.
+    - Applicazione (thread chiamante): gli esiti vengono applicati nello
+      stesso ordine dei frame e dei ritagli, così l'aggiornamento del
+      tracciamento resta deterministico.
+
+    Code limitate tra gli stadi e un numero massimo di frame in volo
+    garantiscono la contropressione: se i worker rallentano, il produttore
+    si ferma e la memoria resta costante anche su video lunghi.
+    """
+
+    def __init__(self, estrai_ritagli, identifica, applica, numero_worker=4, dimensione_coda=8, dimensione_lavoro=32):
+        """
+        Args:
+            estrai_ritagli: funzione (indice, risultato) -> lista di ritagli, o None per saltare il frame
+            identifica: funzione (ritagli) -> esito, eseguita sui worker su una parte dei ritagli di un frame
+            applica: funzione (ritagli, esito, errore) eseguita in ordine di frame
+            numero_worker: Thread del pool di embedding/matching
+            dimensione_coda: Frame massimi in attesa tra uno stadio e il successivo
+            dimensione_lavoro: Ritagli massimi per lavoro (una sola inferenza a batch)
+        """
+        self.estrai_ritagli = estrai_ritagli
+        self.identifica = identifica
+        self.applica = applica
+        self.numero_worker = max(1, numero_worker)
+        self.dimensione_coda = max(1, dimensione_coda)
+        self.dimensione_lavoro = max(1, dimensione_lavoro)
+        # Lavori in volo: almeno uno per worker, anche se i frame hanno un solo ritaglio
+        self.lavori_massimi = max(self.dimensione_coda, 2 * self.numero_worker)
+
+        self._coda_ritagli = queue.Queue(maxsize=self.dimensione_coda)
+        self._errore_produttore = None
+        self._interrompi = threading.Event()
+
+    def esegui(self, risultati):
+        """Elabora tutti i risultati YOLO e attende il completamento della pipeline."""
+        produttore = threading.Thread(target=self._produci, args=(risultati,), name="pipeline-produttore", daemon=True)
+        produttore.start()
+
+        in_volo = deque()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.numero_worker, thread_name_prefix="pipeline-worker") as pool:
+                while True:
+                    try:
+                        # Con lavori in volo l'attesa è breve: i loro esiti vanno applicati anche
+                        # se il produttore non accoda nulla (le tracce che hanno esaurito le
+                        # prenotazioni vengono saltate finché i loro esiti non sono applicati)
+                        elemento = self._coda_ritagli.get(timeout=ATTESA_ESITI if in_volo else None)
+                    except queue.Empty:
+                        while in_volo and in_volo[0][1].done():
+                            self._applica_prossimo(in_volo)
+                        continue
+
+                    if elemento is _FINE:
+                        break
+
+                    for lavoro in self._dividi(elemento):
+                        in_volo.append((lavoro, pool.submit(self.identifica, lavoro)))
+
+                    # Applica gli esiti già pronti in testa, o attende se ci sono troppi lavori in volo
+                    while in_volo and (in_volo[0][1].done() or len(in_volo) >= self.lavori_massimi):
+                        self._applica_prossimo(in_volo)
+
+                while in_volo:
+                    self._applica_prossimo(in_volo)
+        finally:
+            self._interrompi.set()
+            self._svuota_coda()
+            produttore.join()
+
+        if self._errore_produttore is not None:
+            raise self._errore_produttore
+
+    def _dividi(self, ritagli):
+        """Divide i ritagli di un frame in lavori di dimensione simile, uno per worker se possibile."""
+        numero_lavori = max(min(self.numero_worker, len(ritagli)), -(-len(ritagli) // self.dimensione_lavoro))
+        base, resto = divmod(len(ritagli), numero_lavori)
+
+        lavori = []
+        inizio = 0
+        for numero in range(numero_lavori):
+            fine = inizio + base + (numero < resto)
+            lavori.append(ritagli[inizio:fine])
+            inizio = fine
+        return lavori
+
+    @property
+    def profondita_coda(self):
+        """Numero di frame in attesa di essere inviati ai worker."""
+        return self._coda_ritagli.qsize()
+
+    def _produci(self, risultati):
+        """Stadio di decodifica/rilevamento: accoda i ritagli di ogni frame."""
+        try:
+            for indice, risultato in enumerate(risultati):
+                if self._interrompi.is_set():
+                    break
+
+                ritagli = self.estrai_ritagli(indice, risultato)
+                if ritagli:
+                    self._metti(ritagli)
+        except Exception as e:
+            self._errore_produttore = e
+        finally:
+            self._metti(_FINE)
+
+    def _metti(self, elemento):
+        """Accoda un elemento rispettando la contropressione, salvo interruzione."""
+        while not self._interrompi.is_set():
+            try:
+                self._coda_ritagli.put(elemento, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _svuota_coda(self):
+        """Libera la coda per sbloccare un produttore in attesa."""
+        while True:
+            try:
+                self._coda_ritagli.get_nowait()
+            except queue.Empty:
+                return
+
+    def _applica_prossimo(self, in_volo):
+        """Attende l'esito del frame più vecchio e lo applica."""
+        ritagli, futuro = in_volo.popleft()
+        try:
+            esito = futuro.result()
+        except Exception as e:
+            self.applica(ritagli, None, e)
+            return
+        self.applica(ritagli, esito, None)
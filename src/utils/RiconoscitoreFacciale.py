@@ -1,12 +1,19 @@
+import hashlib
 import os
-import pickle
 import time
 import cv2
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
+from src.config.configurazione_attuale import configurazione
+from src.utils.CacheEmbeddings import CacheEmbeddings
+from src.utils.GalleriaEmbeddings import GalleriaEmbeddings
+from src.utils.IndiceGalleria import crea_indice
+from src.utils.AccumulatoreTracce import qualita_volto
+from src.utils.allineamento_volti import allinea_volti
+from src.utils.registrazione_volti import registra_cartella
+from src.utils.istantanea_galleria import leggi_istantanea, scrivi_istantanea, stato_cartella
+from src.utils.registro_modelli import ottieni_rilevatore, ottieni_sessione_onnx
 from src.utils.statistiche_attuali import stats
-from src.utils.utils import *
 
 class RiconoscitoreFacciale:
     """
@@ -14,30 +21,86 @@ class RiconoscitoreFacciale:
     Rimossa dipendenza da InsightFace.
     """
 
-    def __init__(self, nome_modello=None, percorso_modello=None):
+    def __init__(self, nome_modello=None, percorso_modello=None, dimensione_batch=None, tipo_indice=None,
+                 allineamento=None, modalita_punteggio=None, statistiche=None, ripiego_auraface=True):
         """
         Inizializza il riconoscitore facciale.
 
         Args:
             nome_modello: Nome specifico del modello da usare
             percorso_modello: Percorso personalizzato del modello
+            dimensione_batch: Numero massimo di volti per singola inferenza ONNX
+            tipo_indice: Indice della galleria ('flat' o 'ivf'), default da configurazione
+            allineamento: Allinea i volti sui landmark prima dell'embedding, default da configurazione
+            modalita_punteggio: Punteggio delle identità con più immagini ('max', 'centroide' o 'topk'),
+                default da configurazione
+            statistiche: StatisticheRiconoscimento su cui registrare i tempi delle fasi,
+                default le statistiche dell'analisi del processo
+            ripiego_auraface: Se False e il modello richiesto non si carica solleva un'eccezione
+                invece di usare (ed eventualmente scaricare) AuraFace
         """
         self.nome_modello_richiesto = nome_modello
         self.percorso_modello = percorso_modello
+        self.dimensione_batch = dimensione_batch or configurazione.DIMENSIONE_BATCH_EMBEDDING
+        self.allineamento = configurazione.ALLINEAMENTO_VOLTI if allineamento is None else allineamento
+        self.modalita_punteggio = modalita_punteggio or configurazione.MODALITA_PUNTEGGIO_IDENTITA
+        self.stats = statistiche if statistiche is not None else stats
+        self.ripiego_auraface = ripiego_auraface
 
         # Stato interno
         self.modello_attivo = "unknown"
+        self.percorso_onnx = None
         self.session = None
         self.input_name = None
         self.output_names = None
-        self.embeddings_noti = []
-        self.nomi_noti = []
+        self.batch_fisso = None
+        self.rilevatore = None
+        self.galleria = GalleriaEmbeddings()
+        self.indice = self._crea_indice(tipo_indice or configurazione.TIPO_INDICE_GALLERIA)
 
         # Inizializza il modello migliore disponibile
         self._inizializza_modello()
 
-        # File cache specifico per modello
-        self.file_cache = f'cache_embeddings_{self.modello_attivo.lower()}.pkl'
+        # Il rilevatore di volti viene creato una sola volta e riutilizzato
+        self.rilevatore = self._crea_rilevatore(configurazione.RILEVATORE_VOLTI)
+
+        # Cache degli embeddings specifica per file del modello e preprocessing
+        self.cache = CacheEmbeddings(self.percorso_onnx, self._versione_preprocessing())
+        self.file_indice = None
+
+    def _versione_preprocessing(self):
+        """Identifica tutto ciò che, oltre al modello, determina l'embedding di un'immagine."""
+        allineato = self.allineamento and self.rilevatore.fornisce_punti
+        return f'v{configurazione.VERSIONE_PREPROCESSING}-{self.rilevatore.nome}-{"allineato" if allineato else "roi"}'
+
+    def _crea_rilevatore(self, tipo):
+        """Recupera dal registro il rilevatore di volti configurato, ripiegando su Haar in caso di errore."""
+        try:
+            return ottieni_rilevatore(tipo)
+        except Exception as e:
+            print(f"Errore caricamento rilevatore '{tipo}': {e}")
+            if tipo == 'haar':
+                raise
+            return ottieni_rilevatore('haar')
+
+    def _crea_indice(self, tipo):
+        """Crea l'indice di ricerca sulla galleria."""
+        if tipo == 'ivf':
+            return crea_indice(tipo, self.galleria,
+                               numero_liste=configurazione.IVF_NUMERO_LISTE,
+                               nprobe=configurazione.IVF_NPROBE,
+                               minimo_addestramento=configurazione.IVF_MINIMO_ADDESTRAMENTO)
+        return crea_indice(tipo, self.galleria)
+
+    @property
+    def embeddings_noti(self):
+        """Matrice (N, D) degli embeddings noti, normalizzati."""
+        return self.galleria.matrice
+
+    @property
+    def nomi_noti(self):
+        """Nomi associati alle righe della galleria."""
+        return self.galleria.nomi
 
     def _inizializza_modello(self):
         """Prova a inizializzare i modelli in ordine di priorità."""
@@ -50,8 +113,9 @@ class RiconoscitoreFacciale:
         if self.percorso_modello:
             modelli.append(('onnx_custom', self.percorso_modello))
 
-        # AuraFace come fallback
-        modelli.append(('auraface', None))
+        # AuraFace come fallback, o come modello predefinito se non ne è stato richiesto uno
+        if self.ripiego_auraface or not modelli:
+            modelli.append(('auraface', None))
 
         # Prova ogni modello fino a trovarne uno funzionante
         for tipo, nome in modelli:
@@ -82,17 +146,17 @@ class RiconoscitoreFacciale:
 
     def _carica_auraface_onnx(self):
         """Carica AuraFace come modello ONNX diretto."""
-        from huggingface_hub import snapshot_download
-
         # Scarica modello se necessario
         auraface_dir = "models/auraface"
         os.makedirs(auraface_dir, exist_ok=True)
 
         try:
-            snapshot_download("fal/AuraFace-v1", local_dir=auraface_dir)
-
-            # Cerca file ONNX nella cartella
+            # Scarica solo se il modello non è già presente
             onnx_files = [f for f in os.listdir(auraface_dir) if f.endswith('.onnx')]
+            if not onnx_files:
+                from huggingface_hub import snapshot_download
+                snapshot_download("fal/AuraFace-v1", local_dir=auraface_dir)
+                onnx_files = [f for f in os.listdir(auraface_dir) if f.endswith('.onnx')]
 
             if not onnx_files:
                 print("Nessun file ONNX trovato in AuraFace")
@@ -109,22 +173,26 @@ class RiconoscitoreFacciale:
 
     def _carica_modello_onnx_diretto(self, percorso_onnx, nome_modello=None):
         """Carica direttamente un file .onnx."""
-        import onnxruntime as ort
-
         if not os.path.exists(percorso_onnx):
             print(f"File ONNX non trovato: {percorso_onnx}")
             return False
 
-        # Configura i provider
-        providers = ["CUDAExecutionProvider", "CPUExecutionProvider"]
-
-        # Carica il modello
-        self.session = ort.InferenceSession(percorso_onnx, providers=providers)
+        # Sessione condivisa nel processo: il modello viene caricato una sola volta
+        self.session = ottieni_sessione_onnx(percorso_onnx)
+        self.percorso_onnx = percorso_onnx
 
         # Ottieni informazioni su input/output
         self.input_name = self.session.get_inputs()[0].name
         self.output_names = [output.name for output in self.session.get_outputs()]
 
+        # Alcuni modelli sono esportati con dimensione di batch fissa (tipicamente 1)
+        dimensione_batch_input = self.session.get_inputs()[0].shape[0]
+        if isinstance(dimensione_batch_input, int) and dimensione_batch_input > 0:
+            self.batch_fisso = dimensione_batch_input
+        else:
+            self.batch_fisso = None
+        self.rilevatore = None
+
         # Imposta il nome del modello
         if nome_modello:
             self.modello_attivo = nome_modello
@@ -135,6 +203,8 @@ class RiconoscitoreFacciale:
         print(f"Modello ONNX caricato: {self.modello_attivo}")
         print(f"Input: {self.input_name}")
         print(f"Output: {self.output_names}")
+        if self.batch_fisso:
+            print(f"Batch fisso del modello: {self.batch_fisso}")
 
         return True
 
@@ -152,18 +222,29 @@ class RiconoscitoreFacciale:
 
         return img_batch
 
-    def _rileva_volti_semplice(self, immagine):
-        """Rilevamento volti semplice usando OpenCV per modelli ONNX diretti."""
-        # Carica il classificatore Haar per volti
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    def _preprocessa_batch_onnx(self, volti):
+        """
+        Preprocessa una lista di volti in un unico tensore NCHW.
 
-        # Converti in scala di grigi
-        gray = cv2.cvtColor(immagine, cv2.COLOR_BGR2GRAY)
+        Args:
+            volti: Lista di array BGR dei volti ritagliati
 
-        # Rileva volti
-        faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+        Returns:
+            numpy.array: Tensore float32 di forma (N, 3, 112, 112)
+        """
+        inizio = time.perf_counter_ns()
+        img_resized = np.stack([cv2.resize(volto, (112, 112)) for volto in volti])
 
-        return faces
+        # Normalizza e converte da NHWC a NCHW in un'unica operazione
+        img_normalized = (img_resized.astype(np.float32) - 127.5) / 127.5
+        input_data = np.ascontiguousarray(np.transpose(img_normalized, (0, 3, 1, 2)))
+
+        self.stats.registra_tempo_stadio('preprocessing', time.perf_counter_ns() - inizio)
+        return input_data
+
+    def _rileva_volti_semplice(self, immagine):
+        """Rilevamento volti con il rilevatore caricato all'avvio."""
+        return self.rilevatore.rileva(immagine)
 
     def estrai_embedding(self, percorso_immagine):
         """
@@ -179,6 +260,27 @@ class RiconoscitoreFacciale:
                 print(f"Impossibile caricare l'immagine: {percorso_immagine}")
                 return None
 
+            return self.estrai_embedding_array(immagine)
+
+        except Exception as e:
+            print(f"Errore estrazione embedding: {e}")
+            return None
+
+    def estrai_embedding_array(self, immagine):
+        """
+        Estrae l'embedding facciale da un'immagine già in memoria (array BGR),
+        senza passare dal disco.
+
+        Args:
+            immagine: Array numpy BGR (ad esempio il ritaglio di una persona)
+
+        Returns:
+            numpy.array: Embedding del volto o None se nessun volto trovato
+        """
+        if immagine is None or immagine.size == 0:
+            return None
+
+        try:
             return self._estrai_embedding_onnx(immagine)
 
         except Exception as e:
@@ -187,101 +289,256 @@ class RiconoscitoreFacciale:
 
     def _estrai_embedding_onnx(self, immagine):
         """Estrae embedding usando modello ONNX diretto."""
-        # Rileva volti con OpenCV
-        faces = self._rileva_volti_semplice(immagine)
+        return self.estrai_embeddings_batch([immagine])[0]
+
+    def _estrai_roi_volto(self, immagine):
+        """
+        Rileva i volti nell'immagine e restituisce quello più grande.
+
+        Returns:
+            tuple: (ROI del volto, landmark (5, 2) o None, punteggio del rilevatore),
+                oppure None se nessun volto trovato
+        """
+        # Rileva volti (e, se il rilevatore li fornisce, i landmark)
+        faces, punteggi, punti = self.rilevatore.rileva_con_punti(immagine)
 
         if len(faces) == 0:
             return None
 
         # Prendi il volto più grande
-        face = max(faces, key=lambda x: x[2] * x[3])
-        x, y, w, h = face
+        migliore = int(np.argmax(faces[:, 2] * faces[:, 3]))
+        x, y, w, h = faces[migliore]
 
         # Estrai ROI del volto
-        face_roi = immagine[y:y+h, x:x+w]
+        return immagine[y:y+h, x:x+w], (punti[migliore] if punti is not None else None), float(punteggi[migliore])
 
-        # Preprocessa per il modello
-        input_data = self._preprocessa_immagine_onnx(face_roi)
+    def prepara_volti(self, immagini, statistiche=None):
+        """
+        Rileva e, se possibile, allinea i volti di più immagini.
 
-        # Esegui inferenza
-        outputs = self.session.run(self.output_names, {self.input_name: input_data})
+        I volti con landmark vengono allineati in blocco sul template ArcFace;
+        gli altri vengono usati come ROI del riquadro rilevato. Come
+        prepara_volto non modifica lo stato del riconoscitore.
 
-        # Restituisci il primo output (embedding)
-        embedding = outputs[0][0]
+        Args:
+            immagini: Lista di array BGR
+            statistiche: StatisticheRiconoscimento su cui registrare il tempo di rilevamento,
+                default quelle del riconoscitore (il confronto dei modelli usa quelle condivise)
 
-        # Normalizza l'embedding
-        embedding = embedding / np.linalg.norm(embedding)
+        Returns:
+            tuple: (lista dei volti pronti per il preprocessing, indici delle immagini
+                di provenienza, qualità di ciascun volto)
+        """
+        inizio = time.perf_counter_ns()
+        volti = {}
+        qualita = {}
+        da_allineare = []
+
+        for indice, immagine in enumerate(immagini):
+            if immagine is None or immagine.size == 0:
+                continue
+
+            rilevamento = self._estrai_roi_volto(immagine)
+            if rilevamento is None:
+                continue
+
+            face_roi, punti, punteggio = rilevamento
+            qualita[indice] = qualita_volto(face_roi, punteggio)
+
+            if self.allineamento and punti is not None:
+                da_allineare.append((indice, punti))
+            elif face_roi.size > 0:
+                volti[indice] = face_roi
+
+        # Allinea tutti i volti con landmark in un'unica passata
+        if da_allineare:
+            indici_allineati = [indice for indice, _ in da_allineare]
+            allineati = allinea_volti([immagini[indice] for indice in indici_allineati],
+                                      np.stack([punti for _, punti in da_allineare]),
+                                      configurazione.FACE_SIZE_STANDARD)
+            volti.update(zip(indici_allineati, allineati))
+
+        indici_volti = sorted(volti)
+        statistiche = statistiche if statistiche is not None else self.stats
+        statistiche.registra_tempo_stadio('rilevamento_volti', time.perf_counter_ns() - inizio)
+        return [volti[indice] for indice in indici_volti], indici_volti, [qualita[indice] for indice in indici_volti]
+
+    def prepara_volto(self, immagine):
+        """
+        Rileva (e, se possibile, allinea) il volto principale di un'immagine.
 
-        return embedding
+        Non modifica lo stato del riconoscitore: può essere chiamata da più
+        thread in parallelo.
 
-    def carica_volti_noti(self, cartella_volti):
-        """Carica gli embeddings dei volti noti dalla cartella o dalla cache."""
-        # Prova a caricare dalla cache
-        if self._carica_cache():
-            return
+        Returns:
+            numpy.array: Volto pronto per embeddings_volti, o None se nessun volto trovato
+        """
+        volti, _, _ = self.prepara_volti([immagine])
+        return volti[0] if volti else None
+
+    def embeddings_volti(self, volti):
+        """
+        Calcola in batch gli embeddings di volti già preparati con prepara_volto.
+
+        Returns:
+            numpy.array: Matrice (N, D) di embeddings normalizzati
+        """
+        return self._esegui_inferenza_batch(self._preprocessa_batch_onnx(volti))
+
+    def _esegui_inferenza_batch(self, input_data):
+        """
+        Esegue l'inferenza ONNX su un tensore NCHW suddividendolo in blocchi.
+
+        Rispetta sia la dimensione di batch configurata sia un eventuale batch
+        fisso del modello; l'ultimo blocco viene completato con zeri se il
+        modello non accetta batch più piccoli.
+
+        Returns:
+            numpy.array: Embeddings normalizzati di forma (N, D)
+        """
+        inizio_inferenza = time.perf_counter_ns()
+        numero_volti = input_data.shape[0]
+        passo = self.batch_fisso or self.dimensione_batch
+        blocchi = []
+
+        for inizio in range(0, numero_volti, passo):
+            blocco = input_data[inizio:inizio + passo]
+            numero_validi = blocco.shape[0]
+
+            if self.batch_fisso and numero_validi < self.batch_fisso:
+                riempimento = np.zeros((self.batch_fisso - numero_validi,) + blocco.shape[1:], dtype=blocco.dtype)
+                blocco = np.concatenate([blocco, riempimento])
+
+            outputs = self.session.run(self.output_names, {self.input_name: blocco})
+            blocchi.append(outputs[0][:numero_validi])
+
+        embeddings = np.concatenate(blocchi).astype(np.float32, copy=False)
+
+        # Normalizza gli embeddings
+        embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
 
-        # Elabora le immagini della cartella
+        self.stats.registra_tempo_stadio('inferenza_onnx', time.perf_counter_ns() - inizio_inferenza)
+        return embeddings
+
+    def estrai_embeddings_batch(self, immagini):
+        """
+        Estrae gli embeddings di più immagini con una sola inferenza ONNX.
+
+        Args:
+            immagini: Lista di array BGR (ad esempio i ritagli di tutte le
+                persone di uno o più frame)
+
+        Returns:
+            list: Un embedding per immagine, None dove non è stato trovato un volto
+        """
+        return self.estrai_embeddings_con_qualita(immagini)[0]
+
+    def estrai_embeddings_con_qualita(self, immagini):
+        """
+        Come estrai_embeddings_batch, restituendo anche la qualità di ogni volto.
+
+        Returns:
+            tuple: (lista di embeddings o None, lista di qualità in [0, 1])
+        """
+        risultati = [None] * len(immagini)
+        qualita_risultati = [0.0] * len(immagini)
+
+        # Rilevamento e allineamento, poi embedding
+        volti, indici_volti, qualita = self.prepara_volti(immagini)
+
+        if not volti:
+            return risultati, qualita_risultati
+
+        # Preprocessa tutti i volti ed esegue l'inferenza in blocco
+        input_data = self._preprocessa_batch_onnx(volti)
+        embeddings = self._esegui_inferenza_batch(input_data)
+
+        for indice, embedding, qualita_volto_corrente in zip(indici_volti, embeddings, qualita):
+            risultati[indice] = embedding
+            qualita_risultati[indice] = qualita_volto_corrente
+
+        return risultati, qualita_risultati
+
+    def carica_volti_noti(self, cartella_volti):
+        """
+        Carica gli embeddings dei volti noti dalla cartella (un file per
+        persona o una sottocartella per persona con più immagini).
+
+        Se la cartella non è cambiata dall'ultimo caricamento la galleria
+        viene mappata in memoria dall'istantanea su disco, senza copie e con
+        un tempo indipendente dal numero di volti. Altrimenti gli embeddings
+        già presenti in cache (stesso contenuto dell'immagine, stesso modello
+        e preprocessing) vengono letti dal disco e solo le immagini nuove o
+        modificate vengono elaborate.
+        """
         if not os.path.exists(cartella_volti):
             print(f"Cartella non trovata: {cartella_volti}")
             return
 
-        # Trova tutti i file immagine
-        estensioni_valide = ('.png', '.jpg', '.jpeg', '.bmp')
-        file_immagini = [f for f in os.listdir(cartella_volti) if f.lower().endswith(estensioni_valide)]
-
-        print(f"Elaborazione {len(file_immagini)} immagini...")
-
-        # Processa ogni immagine
-        for file_img in file_immagini:
-            percorso_completo = os.path.join(cartella_volti, file_img)
-            embedding = self.estrai_embedding(percorso_completo)
-            if embedding is not None:
-                start_time = time.time()
-                nome_persona = os.path.splitext(file_img)[0]
-                self.embeddings_noti.append(embedding)
-                self.nomi_noti.append(nome_persona)
-                end_time = time.time()
-                stats.aggiungi_tempistiche_embeddings(nome_persona, (end_time - start_time))
-                print(f"{nome_persona}")
-
-        # Salva cache se ci sono embeddings
-        if self.embeddings_noti:
-            self._salva_cache()
-            print(f"Cache salvata: {len(self.embeddings_noti)} volti")
-
-    def _carica_cache(self):
-        """Carica embeddings dalla cache se compatibile."""
-        if not os.path.exists(self.file_cache):
-            return False
+        istantanea = None
+        if configurazione.ISTANTANEA_GALLERIA:
+            istantanea = leggi_istantanea(self.cache.directory, cartella_volti)
 
-        try:
-            with open(self.file_cache, 'rb') as f:
-                dati = pickle.load(f)
+        if istantanea is not None:
+            matrice, nomi, composizione = istantanea
+            self.galleria.imposta_mappata(matrice, nomi)
+            print(f"Galleria mappata: {len(self.galleria)} volti")
+        else:
+            composizione = self._elabora_cartella_volti(cartella_volti)
 
-            # Verifica compatibilità modello
-            if dati.get('modello') == self.modello_attivo:
-                self.embeddings_noti = dati['embeddings']
-                self.nomi_noti = dati['nomi']
-                print(f"Cache caricata ({len(self.embeddings_noti)} volti)")
-                return True
+        # L'indice salvato vale solo per questa esatta composizione della galleria
+        self.file_indice = os.path.join(self.cache.directory, f'indice_{self.indice.tipo}_{composizione}.npz')
 
-        except Exception as e:
-            print(f"Errore caricamento cache: {e}")
+        if not self.indice.carica(self.file_indice):
+            self._aggiorna_indice()
 
-        return False
+    def _elabora_cartella_volti(self, cartella_volti):
+        """
+        Costruisce la galleria dalle immagini della cartella usando la cache
+        degli embeddings (vedi registra_cartella) e ne salva l'istantanea.
 
-    def _salva_cache(self):
-        """Salva embeddings nella cache."""
+        Returns:
+            str: Impronta della composizione della galleria
+        """
+        stato = stato_cartella(cartella_volti)
+
+        # Solo le immagini nuove o modificate vengono elaborate, in parallelo e a batch
+        registrazione = registra_cartella(self, cartella_volti)
+        nomi = [nome for nome, _ in registrazione['volti']]
+        impronte = [impronta for _, impronta in registrazione['volti']]
+
+        for voce in registrazione['fallite']:
+            print(f"{voce['file']}: {voce['motivo']}")
+
+        composizione = hashlib.sha256('\n'.join(impronte).encode()).hexdigest()[:16]
+        self.galleria.imposta(self.cache.leggi(impronte), nomi)
+
+        # Salva la galleria normalizzata e la riapre mappata, condivisa tra processi
+        if len(self.galleria) > 0:
+            try:
+                matrice = scrivi_istantanea(self.cache.directory, cartella_volti, stato,
+                                            self.galleria.matrice, nomi, composizione)
+                self.galleria.imposta_mappata(matrice, nomi)
+            except Exception as e:
+                print(f"Errore salvataggio istantanea galleria: {e}")
+
+        print(f"Galleria caricata: {len(self.galleria)} volti ({registrazione['elaborate']} immagini elaborate, "
+              f"{registrazione['dalla_cache']} dalla cache)")
+        return composizione
+
+    def _aggiorna_indice(self):
+        """Ricostruisce l'indice della galleria e lo salva accanto alla cache."""
+        self.indice.ricostruisci()
+        self._salva_indice()
+
+    def _salva_indice(self):
+        """Salva l'indice della galleria, se ha un file associato."""
+        if self.file_indice is None:
+            return
         try:
-            dati_cache = {
-                'embeddings': self.embeddings_noti,
-                'nomi': self.nomi_noti,
-                'modello': self.modello_attivo
-            }
-            with open(self.file_cache, 'wb') as f:
-                pickle.dump(dati_cache, f)
+            self.indice.salva(self.file_indice)
         except Exception as e:
-            print(f"Errore salvataggio cache: {e}")
+            print(f"Errore salvataggio indice: {e}")
 
     def identifica_volto(self, percorso_immagine, soglia=0.4):
         """
@@ -290,47 +547,134 @@ class RiconoscitoreFacciale:
         Returns:
             tuple: (nome_persona, confidenza) o ('-1', confidenza) se non riconosciuto
         """
-        if not self.embeddings_noti:
+        if len(self.galleria) == 0:
             return '-1', 0.0
 
         # Estrai embedding dall'immagine
         embedding = self.estrai_embedding(percorso_immagine)
+        return self._confronta_embedding(embedding, soglia)
+
+    def identifica_volto_array(self, immagine, soglia=0.4):
+        """
+        Identifica un volto a partire da un'immagine già in memoria.
+
+        Args:
+            immagine: Array numpy BGR del ritaglio da identificare
+            soglia: Soglia minima di confidenza
+
+        Returns:
+            tuple: (nome_persona, confidenza) o ('-1', confidenza) se non riconosciuto
+        """
+        if len(self.galleria) == 0:
+            return '-1', 0.0
+
+        embedding = self.estrai_embedding_array(immagine)
+        return self._confronta_embedding(embedding, soglia)
+
+    def identifica_volti_batch(self, immagini, soglia=0.4):
+        """
+        Identifica più volti con una sola inferenza ONNX.
+
+        Args:
+            immagini: Lista di array BGR dei ritagli da identificare
+            soglia: Soglia minima di confidenza
+
+        Returns:
+            list: Una tupla (nome_persona, confidenza) per immagine
+        """
+        if len(self.galleria) == 0:
+            return [('-1', 0.0)] * len(immagini)
+
+        embeddings = self.estrai_embeddings_batch(immagini)
+        risultati = [('-1', 0.0)] * len(immagini)
+
+        # Confronta tutti gli embeddings validi con un'unica moltiplicazione matriciale
+        indici_validi = [indice for indice, embedding in enumerate(embeddings) if embedding is not None]
+        if indici_validi:
+            esiti = self.identifica_embeddings(np.stack([embeddings[i] for i in indici_validi]), soglia)
+            for indice, esito in zip(indici_validi, esiti):
+                risultati[indice] = esito
+
+        return risultati
+
+    def _confronta_embedding(self, embedding, soglia):
+        """Confronta un embedding con i volti noti e restituisce il match migliore."""
         if embedding is None:
             return '-1', 0.0
 
-        # Calcola similarità con tutti i volti noti
-        embedding = embedding.reshape(1, -1)
-        embeddings_db = np.array(self.embeddings_noti)
-        similarita = cosine_similarity(embedding, embeddings_db)[0]
+        return self.identifica_embeddings(embedding, soglia)[0]
+
+    def identifica_embeddings(self, embeddings, soglia=0.4):
+        """
+        Confronta uno o più embeddings già estratti con la galleria.
+
+        Args:
+            embeddings: Embedding (D,) o batch di embeddings (Q, D)
+            soglia: Soglia minima di confidenza
+
+        Returns:
+            list: Una tupla (nome_persona, confidenza) per embedding
+        """
+        inizio = time.perf_counter_ns()
+        embeddings = np.atleast_2d(embeddings)
+        if len(self.galleria) == 0:
+            return [('-1', 0.0)] * len(embeddings)
+
+        if self.modalita_punteggio == 'max':
+            # Il massimo sulle immagini di riferimento è il vicino più prossimo: usa l'indice (anche IVF)
+            indici, confidenze = self.indice.cerca(embeddings)
+            nomi = [self.nomi_noti[indice] for indice in indici]
+        else:
+            # Centroide e top-k richiedono le similarità con tutte le immagini di ogni identità
+            nomi, confidenze = self.galleria.cerca_identita(embeddings, self.modalita_punteggio,
+                                                            configurazione.TOPK_PUNTEGGIO_IDENTITA)
 
-        # Trova il match migliore
-        indice_migliore = np.argmax(similarita)
-        confidenza_migliore = similarita[indice_migliore]
+        risultati = []
+        for nome_migliore, confidenza_migliore in zip(nomi, confidenze):
+            confidenza_migliore = float(confidenza_migliore)
 
-        # Verifica se supera la soglia
-        if confidenza_migliore >= soglia:
-            return self.nomi_noti[indice_migliore], confidenza_migliore
+            # Verifica se supera la soglia
+            if confidenza_migliore >= soglia:
+                risultati.append((nome_migliore, confidenza_migliore))
+            else:
+                risultati.append(('-1', confidenza_migliore))
 
-        return '-1', confidenza_migliore
+        self.stats.registra_tempo_stadio('matching', time.perf_counter_ns() - inizio)
+        return risultati
 
     def aggiungi_volto(self, percorso_immagine, nome_persona):
-        """Aggiunge un nuovo volto al database."""
+        """
+        Aggiunge un nuovo volto al database.
 
+        L'embedding viene aggiunto in coda alla cache (senza riscriverla):
+        se l'immagine viene poi salvata nella cartella dei volti, al
+        prossimo avvio non verrà ricalcolato.
+        """
         start_time = time.time()
-        embedding = self.estrai_embedding(percorso_immagine)
+        try:
+            impronta = self.cache.impronta_file(percorso_immagine)
+        except OSError as e:
+            print(f"Impossibile leggere {percorso_immagine}: {e}")
+            return False
+
+        if impronta in self.cache:
+            embedding = self.cache.leggi([impronta])[0] if self.cache.contiene_volto(impronta) else None
+        else:
+            embedding = self.estrai_embedding(percorso_immagine)
+            self.cache.aggiungi(impronta, embedding)
         end_time = time.time()
-        stats.aggiungi_tempistiche_embeddings(nome_persona, (end_time - start_time))
+        self.stats.aggiungi_tempistiche_embeddings(nome_persona, (end_time - start_time))
 
         if embedding is None:
             print(f"Impossibile estrarre volto da {percorso_immagine}")
             return False
 
         # Aggiungi al database
-        self.embeddings_noti.append(embedding)
-        self.nomi_noti.append(nome_persona)
+        # Inserito in fondo alle immagini della stessa persona: le identità restano contigue
+        self.indice.aggiungi(self.galleria.aggiungi(embedding, nome_persona))
 
-        # Aggiorna cache
-        self._salva_cache()
+        # L'indice salvato non corrisponde più alla galleria
+        self.file_indice = None
         print(f"{nome_persona} aggiunto al database")
         return True
 
@@ -339,6 +683,11 @@ class RiconoscitoreFacciale:
         return {
             'modello_attivo': self.modello_attivo,
             'tipo_modello': 'onnx_diretto',
+            'tipo_indice': self.indice.tipo,
+            'modalita_punteggio': self.modalita_punteggio,
+            'cache_embeddings': self.cache.directory,
+            'rilevatore_volti': self.rilevatore.nome,
+            'allineamento_volti': self.allineamento and self.rilevatore.fornisce_punti,
             'modello_richiesto': self.nome_modello_richiesto,
-            'volti_nel_database': len(self.embeddings_noti)
+            'volti_nel_database': len(self.galleria)
         }
\ No newline at end of file
@@ -0,0 +1,233 @@
+import threading
+
+import cv2
+import numpy as np
+
+from src.config.configurazione_attuale import configurazione
+from src.utils.registro_modelli import ottieni_sessione_onnx
+
+
+class RilevatoreHaar:
+    """
+    Rilevatore di volti basato sulla cascata di Haar di OpenCV.
+
+    La cascata viene letta dal file XML una sola volta per thread:
+    `cv2.CascadeClassifier` non è thread-safe, quindi ogni thread che usa il
+    rilevatore ne riceve una propria istanza, creata al primo utilizzo e poi
+    riutilizzata per tutta la vita del rilevatore.
+    """
+
+    nome = 'haar'
+    fornisce_punti = False
+
+    def __init__(self, percorso_cascata=None, fattore_scala=1.1, vicini_minimi=4, dimensione_minima=None):
+        """
+        Args:
+            percorso_cascata: File XML della cascata (default: volto frontale di OpenCV)
+            fattore_scala: Parametro scaleFactor di detectMultiScale
+            vicini_minimi: Parametro minNeighbors di detectMultiScale
+            dimensione_minima: Lato minimo in pixel di un volto rilevabile
+        """
+        self.percorso_cascata = percorso_cascata or cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self.fattore_scala = fattore_scala
+        self.vicini_minimi = vicini_minimi
+        self.dimensione_minima = dimensione_minima or configurazione.DIMENSIONE_MINIMA_VOLTO
+        self._locale = threading.local()
+
+        # Carica subito la cascata per segnalare errori già all'avvio
+        self._cascata()
+
+    def _cascata(self):
+        """Restituisce la cascata del thread corrente, caricandola se necessario."""
+        cascata = getattr(self._locale, 'cascata', None)
+        if cascata is None:
+            cascata = cv2.CascadeClassifier(self.percorso_cascata)
+            if cascata.empty():
+                raise RuntimeError(f"Impossibile caricare la cascata Haar: {self.percorso_cascata}")
+            self._locale.cascata = cascata
+        return cascata
+
+    def rileva(self, immagine):
+        """
+        Rileva i volti in un'immagine BGR.
+
+        Returns:
+            Sequenza di riquadri (x, y, w, h)
+        """
+        # Converti in scala di grigi
+        gray = cv2.cvtColor(immagine, cv2.COLOR_BGR2GRAY)
+
+        dimensione_minima = (self.dimensione_minima, self.dimensione_minima)
+        return self._cascata().detectMultiScale(gray, self.fattore_scala, self.vicini_minimi, minSize=dimensione_minima)
+
+    def rileva_con_punti(self, immagine):
+        """
+        Rileva i volti restituendo anche punteggi e landmark.
+
+        La cascata di Haar non fornisce né un punteggio calibrato né i punti
+        del volto: i punteggi sono 1 e i landmark None.
+
+        Returns:
+            tuple: (riquadri (N, 4) xywh, punteggi (N,), punti None)
+        """
+        riquadri = np.asarray(self.rileva(immagine), dtype=np.int32).reshape(-1, 4)
+        return riquadri, np.ones(len(riquadri), dtype=np.float32), None
+
+
+class RilevatoreONNX:
+    """
+    Rilevatore di volti ONNX in formato SCRFD (famiglia RetinaFace).
+
+    Restituisce riquadri, punteggi e i 5 landmark del volto (occhi, naso,
+    angoli della bocca). La sessione onnxruntime è condivisa tra i thread:
+    `InferenceSession.run` è thread-safe.
+    """
+
+    nome = 'onnx'
+
+    def __init__(self, percorso_onnx=None, dimensione_input=None, soglia=None, soglia_nms=None, dimensione_minima=None):
+        """
+        Args:
+            percorso_onnx: File .onnx del rilevatore
+            dimensione_input: (larghezza, altezza) usata se il modello ha input dinamico
+            soglia: Punteggio minimo di un volto
+            soglia_nms: Soglia IoU della non-maximum suppression
+            dimensione_minima: Lato minimo in pixel di un volto rilevabile
+        """
+        self.percorso_onnx = percorso_onnx or configurazione.RILEVATORE_ONNX_PATH
+        self.soglia = soglia or configurazione.RILEVATORE_ONNX_SOGLIA
+        self.soglia_nms = soglia_nms or configurazione.RILEVATORE_ONNX_SOGLIA_NMS
+        self.dimensione_minima = dimensione_minima or configurazione.DIMENSIONE_MINIMA_VOLTO
+
+        self.session = ottieni_sessione_onnx(self.percorso_onnx)
+        input_modello = self.session.get_inputs()[0]
+        self.input_name = input_modello.name
+        self.output_names = [output.name for output in self.session.get_outputs()]
+
+        # Usa la dimensione del modello se fissa, altrimenti quella configurata
+        altezza, larghezza = input_modello.shape[2:4]
+        if isinstance(altezza, int) and isinstance(larghezza, int):
+            self.dimensione_input = (larghezza, altezza)
+        else:
+            self.dimensione_input = tuple(dimensione_input or configurazione.RILEVATORE_ONNX_DIMENSIONE_INPUT)
+
+        # Struttura delle uscite SCRFD: (punteggi, riquadri[, punti]) per ogni stride
+        numero_output = len(self.output_names)
+        if numero_output in (6, 9):
+            self.strides = (8, 16, 32)
+        elif numero_output in (10, 15):
+            self.strides = (8, 16, 32, 64, 128)
+        else:
+            raise ValueError(f"Formato di uscita del rilevatore non riconosciuto ({numero_output} output)")
+        self.fornisce_punti = numero_output in (9, 15)
+        self.numero_ancore = 1 if numero_output in (10, 15) else 2
+        self._centri_ancore = {}
+
+    def rileva(self, immagine):
+        """
+        Rileva i volti in un'immagine BGR.
+
+        Returns:
+            Array di riquadri (x, y, w, h)
+        """
+        return self.rileva_con_punti(immagine)[0]
+
+    def rileva_con_punti(self, immagine):
+        """
+        Rileva i volti restituendo anche punteggi e landmark.
+
+        Returns:
+            tuple: (riquadri (N, 4) xywh, punteggi (N,), punti (N, 5, 2) o None)
+        """
+        larghezza_input, altezza_input = self.dimensione_input
+        altezza, larghezza = immagine.shape[:2]
+
+        # Ridimensiona mantenendo le proporzioni e completa con zeri (letterbox)
+        scala = min(larghezza_input / larghezza, altezza_input / altezza)
+        nuova_larghezza, nuova_altezza = max(1, int(larghezza * scala)), max(1, int(altezza * scala))
+        immagine_input = np.zeros((altezza_input, larghezza_input, 3), dtype=np.uint8)
+        immagine_input[:nuova_altezza, :nuova_larghezza] = cv2.resize(immagine, (nuova_larghezza, nuova_altezza))
+
+        blob = cv2.dnn.blobFromImage(immagine_input, 1.0 / 128, (larghezza_input, altezza_input),
+                                     (127.5, 127.5, 127.5), swapRB=True)
+        outputs = self.session.run(self.output_names, {self.input_name: blob})
+
+        riquadri, punteggi, punti = self._decodifica(outputs, altezza_input, larghezza_input)
+        if len(punteggi) == 0:
+            return np.empty((0, 4), dtype=np.int32), punteggi, None
+
+        # Non-maximum suppression e riporto alle coordinate originali
+        riquadri_xywh = np.concatenate([riquadri[:, :2], riquadri[:, 2:] - riquadri[:, :2]], axis=1) / scala
+        tenuti = cv2.dnn.NMSBoxes(riquadri_xywh.tolist(), punteggi.tolist(), self.soglia, self.soglia_nms)
+        tenuti = np.asarray(tenuti, dtype=np.int64).reshape(-1)
+
+        riquadri_xywh = riquadri_xywh[tenuti]
+        punteggi = punteggi[tenuti]
+        punti = punti[tenuti] / scala if punti is not None else None
+
+        # Scarta i volti troppo piccoli
+        validi = np.minimum(riquadri_xywh[:, 2], riquadri_xywh[:, 3]) >= self.dimensione_minima
+        riquadri_xywh = np.clip(np.round(riquadri_xywh[validi]), 0, None).astype(np.int32)
+        punti = punti[validi].astype(np.float32) if punti is not None else None
+
+        return riquadri_xywh, punteggi[validi], punti
+
+    def _decodifica(self, outputs, altezza_input, larghezza_input):
+        """Decodifica le uscite SCRFD in riquadri xyxy, punteggi e landmark."""
+        numero_livelli = len(self.strides)
+        lista_riquadri, lista_punteggi, lista_punti = [], [], []
+
+        for livello, stride in enumerate(self.strides):
+            punteggi = outputs[livello].reshape(-1)
+            distanze = outputs[livello + numero_livelli].reshape(-1, 4) * stride
+            centri = self._centri(altezza_input // stride, larghezza_input // stride, stride)
+
+            positivi = np.where(punteggi >= self.soglia)[0]
+            if positivi.size == 0:
+                continue
+
+            centri = centri[positivi]
+            distanze = distanze[positivi]
+            lista_punteggi.append(punteggi[positivi])
+            lista_riquadri.append(np.concatenate([centri - distanze[:, :2], centri + distanze[:, 2:]], axis=1))
+
+            if self.fornisce_punti:
+                distanze_punti = outputs[livello + 2 * numero_livelli].reshape(-1, 10)[positivi] * stride
+                lista_punti.append(centri[:, None, :] + distanze_punti.reshape(-1, 5, 2))
+
+        if not lista_punteggi:
+            return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), None
+
+        punti = np.concatenate(lista_punti) if self.fornisce_punti else None
+        return np.concatenate(lista_riquadri), np.concatenate(lista_punteggi).astype(np.float32), punti
+
+    def _centri(self, altezza_griglia, larghezza_griglia, stride):
+        """Restituisce (con cache) i centri delle ancore di un livello."""
+        chiave = (altezza_griglia, larghezza_griglia, stride)
+        centri = self._centri_ancore.get(chiave)
+        if centri is None:
+            griglia = np.stack(np.mgrid[:altezza_griglia, :larghezza_griglia][::-1], axis=-1)
+            centri = (griglia.astype(np.float32) * stride).reshape(-1, 2)
+            if self.numero_ancore > 1:
+                centri = np.repeat(centri, self.numero_ancore, axis=0)
+            self._centri_ancore[chiave] = centri
+        return centri
+
+
+def crea_rilevatore(tipo='haar', **parametri):
+    """
+    Crea il rilevatore di volti richiesto.
+
+    Args:
+        tipo: Nome del rilevatore ('haar' o 'onnx')
+        parametri: Parametri specifici del rilevatore
+
+    Returns:
+        Istanza del rilevatore
+    """
+    if tipo == 'haar':
+        return RilevatoreHaar(**parametri)
+    if tipo == 'onnx':
+        return RilevatoreONNX(**parametri)
+
+    raise ValueError(f"Rilevatore di volti non supportato: {tipo}")
@@ -0,0 +1,332 @@
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from src.config.configurazione_attuale import configurazione
+from src.utils.registrazione_volti import e_immagine
+
+PROTOCOLLI_STREAM = ('rtsp://', 'rtsps://', 'rtmp://', 'http://', 'https://', 'udp://', 'tcp://', 'srt://')
+
+
+class SorgenteFrame:
+    """
+    Sorgente di frame con timestamp per la pipeline di riconoscimento.
+
+    Il consumatore chiama `avanza()` per passare al frame successivo e
+    `frame()` solo se gli serve l'immagine: le sorgenti che lo permettono
+    (file video, cartelle di immagini) non decodificano i frame scartati dal
+    campionamento. Dopo `avanza()`, `timestamp` contiene l'istante del frame
+    in secondi (posizione nel video, data di modifica dell'immagine o ora di
+    acquisizione per le sorgenti live).
+
+    Ogni sorgente misura frame letti e scartati, FPS di acquisizione e di
+    consegna e la latenza tra l'acquisizione di un frame e la sua consegna
+    al consumatore (vedi `metriche`).
+    """
+
+    tipo = None
+    live = False
+
+    def __init__(self, sorgente):
+        self.sorgente = sorgente
+        self.timestamp = None
+        self.frame_letti = 0
+        self.frame_consegnati = 0
+        self.frame_scartati = 0
+        self._latenza_totale = 0.0
+        self._latenza_massima = 0.0
+        self._prima_lettura = None
+        self._ultima_lettura = None
+        self._prima_consegna = None
+        self._ultima_consegna = None
+
+    def __enter__(self):
+        self.apri()
+        return self
+
+    def __exit__(self, *eccezione):
+        self.chiudi()
+
+    def apri(self):
+        """Apre la sorgente; solleva IOError se non è raggiungibile."""
+
+    def chiudi(self):
+        """Rilascia la sorgente."""
+
+    def avanza(self):
+        """Passa al frame successivo. Restituisce False a fine sorgente."""
+        raise NotImplementedError
+
+    def frame(self):
+        """Immagine BGR del frame corrente (None se non decodificabile)."""
+        raise NotImplementedError
+
+    @property
+    def in_attesa(self):
+        """Frame acquisiti e non ancora consegnati (solo le sorgenti live hanno un buffer)."""
+        return 0
+
+    def _registra_lettura(self, istante):
+        """Conta un frame acquisito dalla sorgente (istante da time.perf_counter)."""
+        self.frame_letti += 1
+        if self._prima_lettura is None:
+            self._prima_lettura = istante
+        self._ultima_lettura = istante
+
+    def _registra_consegna(self, istante_lettura):
+        """Conta un frame consegnato al consumatore e la sua latenza."""
+        adesso = time.perf_counter()
+        latenza = adesso - istante_lettura
+
+        self.frame_consegnati += 1
+        self._latenza_totale += latenza
+        self._latenza_massima = max(self._latenza_massima, latenza)
+        if self._prima_consegna is None:
+            self._prima_consegna = adesso
+        self._ultima_consegna = adesso
+
+    def metriche(self):
+        """
+        Returns:
+            dict: tipo, sorgente, frame letti/consegnati/scartati, FPS di
+                acquisizione e di consegna, latenza media e massima in ms
+        """
+        def fps(numero, primo, ultimo):
+            return (numero - 1) / (ultimo - primo) if numero > 1 and ultimo > primo else 0.0
+
+        return {
+            'tipo': self.tipo,
+            'sorgente': str(self.sorgente),
+            'frame_letti': self.frame_letti,
+            'frame_consegnati': self.frame_consegnati,
+            'frame_scartati': self.frame_scartati,
+            'fps_acquisizione': fps(self.frame_letti, self._prima_lettura, self._ultima_lettura),
+            'fps_consegna': fps(self.frame_consegnati, self._prima_consegna, self._ultima_consegna),
+            'latenza_media_ms': self._latenza_totale / self.frame_consegnati * 1000 if self.frame_consegnati else 0.0,
+            'latenza_massima_ms': self._latenza_massima * 1000,
+        }
+
+
+class SorgenteFile(SorgenteFrame):
+    """
+    File video locale letto al ritmo del consumatore: nessun frame viene
+    scartato, `avanza` esegue solo `grab` e il frame viene decodificato
+    (`retrieve`) solo se richiesto.
+    """
+
+    tipo = 'file'
+
+    def __init__(self, percorso):
+        super().__init__(percorso)
+        self._cattura = None
+        self._frame = None
+        self._decodificato = False
+
+    def apri(self):
+        self._cattura = cv2.VideoCapture(self.sorgente)
+        if not self._cattura.isOpened():
+            raise IOError(f"Impossibile aprire la sorgente video: {self.sorgente}")
+
+    def chiudi(self):
+        if self._cattura is not None:
+            self._cattura.release()
+            self._cattura = None
+
+    def avanza(self):
+        istante = time.perf_counter()
+        if not self._cattura.grab():
+            return False
+
+        self._registra_lettura(istante)
+        self._frame, self._decodificato = None, False
+        self.timestamp = self._cattura.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        self._registra_consegna(istante)
+        return True
+
+    def frame(self):
+        if not self._decodificato:
+            self._frame = self._cattura.retrieve()[1]
+            self._decodificato = True
+        return self._frame
+
+
+class SorgenteLive(SorgenteFrame):
+    """
+    Flusso live (RTSP/HTTP, webcam V4L2) letto da un thread dedicato.
+
+    Il thread legge e decodifica i frame al ritmo della sorgente e li mette
+    in un buffer limitato: se l'elaborazione resta indietro i frame più
+    vecchi vengono scartati, così la pipeline lavora sempre sui frame più
+    recenti e la latenza non cresce nel tempo.
+    """
+
+    tipo = 'live'
+    live = True
+
+    def __init__(self, sorgente, backend=cv2.CAP_ANY, dimensione_buffer=None, durata_massima=None):
+        """
+        Args:
+            sorgente: URL del flusso, indice o percorso del dispositivo della webcam
+            backend: Backend di cv2.VideoCapture (ad esempio cv2.CAP_FFMPEG o cv2.CAP_V4L2)
+            dimensione_buffer: Frame massimi in attesa (default: DIMENSIONE_BUFFER_SORGENTE_LIVE)
+            durata_massima: Secondi dopo cui la lettura si interrompe (default: DURATA_MASSIMA_SORGENTE_LIVE)
+        """
+        super().__init__(sorgente)
+        self.backend = backend
+        self.dimensione_buffer = max(1, dimensione_buffer or configurazione.DIMENSIONE_BUFFER_SORGENTE_LIVE)
+        self.durata_massima = durata_massima if durata_massima is not None else configurazione.DURATA_MASSIMA_SORGENTE_LIVE
+
+        self._cattura = None
+        self._buffer = deque()
+        self._condizione = threading.Condition()
+        self._interrompi = threading.Event()
+        self._lettore = None
+        self._finito = False
+        self._frame = None
+
+    def apri(self):
+        self._cattura = cv2.VideoCapture(self.sorgente, self.backend)
+        if not self._cattura.isOpened():
+            raise IOError(f"Impossibile aprire la sorgente video: {self.sorgente}")
+
+        self._interrompi.clear()
+        self._finito = False
+        self._lettore = threading.Thread(target=self._leggi, name="sorgente-live", daemon=True)
+        self._lettore.start()
+
+    def chiudi(self):
+        """Interrompe il thread di lettura e rilascia il dispositivo."""
+        self._interrompi.set()
+        if self._lettore is not None:
+            self._lettore.join()
+            self._lettore = None
+        if self._cattura is not None:
+            self._cattura.release()
+            self._cattura = None
+
+    @property
+    def in_attesa(self):
+        return len(self._buffer)
+
+    def interrompi(self):
+        """Chiede la fine della lettura: i frame già nel buffer vengono ancora consegnati."""
+        self._interrompi.set()
+
+    def _leggi(self):
+        """Thread di lettura: riempie il buffer scartando i frame più vecchi."""
+        inizio = time.perf_counter()
+        try:
+            while not self._interrompi.is_set():
+                if self.durata_massima is not None and time.perf_counter() - inizio >= self.durata_massima:
+                    break
+
+                letto, frame = self._cattura.read()
+                if not letto:
+                    break
+
+                istante = time.perf_counter()
+                with self._condizione:
+                    self._registra_lettura(istante)
+                    if len(self._buffer) >= self.dimensione_buffer:
+                        self._buffer.popleft()
+                        self.frame_scartati += 1
+                    self._buffer.append((time.time(), istante, frame))
+                    self._condizione.notify()
+        finally:
+            with self._condizione:
+                self._finito = True
+                self._condizione.notify_all()
+
+    def avanza(self):
+        with self._condizione:
+            while not self._buffer and not self._finito:
+                self._condizione.wait()
+            if not self._buffer:
+                return False
+            self.timestamp, istante, self._frame = self._buffer.popleft()
+            self._registra_consegna(istante)
+        return True
+
+    def frame(self):
+        return self._frame
+
+
+class SorgenteCartella(SorgenteFrame):
+    """
+    Cartella di immagini fisse, consegnate in ordine di nome. Il timestamp
+    è la data di modifica del file; l'immagine viene letta solo se richiesta.
+    """
+
+    tipo = 'cartella'
+
+    def __init__(self, cartella):
+        super().__init__(cartella)
+        self._file = deque()
+        self._percorso = None
+        self._frame = None
+        self._decodificato = False
+
+    def apri(self):
+        if not os.path.isdir(self.sorgente):
+            raise IOError(f"Impossibile aprire la sorgente video: {self.sorgente}")
+        self._file = deque(sorted(os.path.join(self.sorgente, nome) for nome in os.listdir(self.sorgente)
+                                  if e_immagine(nome)))
+
+    def avanza(self):
+        while self._file:
+            percorso = self._file.popleft()
+            istante = time.perf_counter()
+            try:
+                self.timestamp = os.path.getmtime(percorso)
+            except OSError:
+                continue  # file rimosso nel frattempo
+
+            self._registra_lettura(istante)
+            self._percorso, self._frame, self._decodificato = percorso, None, False
+            self._registra_consegna(istante)
+            return True
+        return False
+
+    def frame(self):
+        if not self._decodificato:
+            self._frame = cv2.imread(self._percorso)
+            self._decodificato = True
+        return self._frame
+
+
+def crea_sorgente(sorgente=None):
+    """
+    Crea la sorgente di frame adatta all'indirizzo indicato.
+
+    Args:
+        sorgente: Una SorgenteFrame già pronta, un URL di flusso (rtsp://,
+            http://, ...), l'indice o il percorso /dev/videoN di una webcam,
+            una cartella di immagini o un file video
+            (default: SORGENTE_VIDEO, altrimenti PATHVIDEOTAGLIATO)
+
+    Returns:
+        SorgenteFrame: Sorgente da aprire con `with` o `apri()`
+    """
+    if isinstance(sorgente, SorgenteFrame):
+        return sorgente
+
+    if sorgente is None:
+        # 0 è la prima webcam: solo None indica che la sorgente non è configurata
+        sorgente = configurazione.SORGENTE_VIDEO
+        if sorgente is None:
+            sorgente = configurazione.PATHVIDEOTAGLIATO
+
+    if isinstance(sorgente, int) or (isinstance(sorgente, str) and sorgente.isdigit()):
+        return SorgenteLive(int(sorgente))
+
+    sorgente = str(sorgente)
+    if sorgente.lower().startswith(PROTOCOLLI_STREAM):
+        return SorgenteLive(sorgente, cv2.CAP_FFMPEG)
+    if sorgente.startswith('/dev/video'):
+        return SorgenteLive(sorgente, cv2.CAP_V4L2)
+    if os.path.isdir(sorgente):
+        return SorgenteCartella(sorgente)
+    return SorgenteFile(sorgente)
@@ -0,0 +1,122 @@
+import math
+from array import array
+
+
+class StatisticaFlusso:
+    """
+    Statistiche di un flusso di valori in memoria costante.
+
+    Media e varianza sono aggiornate con l'algoritmo di Welford (stabile
+    numericamente, senza conservare i valori); minimo e massimo sono esatti.
+    Se viene indicato un numero di intervalli, i valori compresi tra
+    `minimo` e `massimo` (ad esempio le confidenze tra 0 e 1) vengono contati
+    in un istogramma a intervalli uguali da cui si stimano i quantili, con
+    errore al più di mezzo intervallo.
+    """
+
+    __slots__ = ('conteggio', 'media', '_m2', 'minimo', 'massimo', 'limite_inferiore', 'limite_superiore', 'conteggi')
+
+    def __init__(self, minimo=0.0, massimo=1.0, intervalli=None):
+        """
+        Args:
+            minimo, massimo: Intervallo coperto dall'istogramma (i valori esterni
+                finiscono nel primo o nell'ultimo intervallo)
+            intervalli: Intervalli dell'istogramma dei quantili (None = solo media e varianza)
+        """
+        self.conteggio = 0
+        self.media = 0.0
+        self._m2 = 0.0
+        self.minimo = None
+        self.massimo = None
+        self.limite_inferiore = minimo
+        self.limite_superiore = massimo
+        self.conteggi = array('q', [0]) * intervalli if intervalli else None
+
+    def __len__(self):
+        return self.conteggio
+
+    def aggiungi(self, valore):
+        """Aggiunge un valore al flusso."""
+        valore = float(valore)
+        self.conteggio += 1
+        delta = valore - self.media
+        self.media += delta / self.conteggio
+        self._m2 += delta * (valore - self.media)
+
+        if self.minimo is None or valore < self.minimo:
+            self.minimo = valore
+        if self.massimo is None or valore > self.massimo:
+            self.massimo = valore
+
+        if self.conteggi is not None:
+            self.conteggi[self._intervallo(valore)] += 1
+
+    def unisci(self, altra):
+        """Combina le statistiche di un altro flusso (stessi limiti e intervalli)."""
+        if altra.conteggio == 0:
+            return
+
+        totale = self.conteggio + altra.conteggio
+        delta = altra.media - self.media
+        self._m2 += altra._m2 + delta * delta * self.conteggio * altra.conteggio / totale
+        self.media += delta * altra.conteggio / totale
+        self.conteggio = totale
+
+        self.minimo = altra.minimo if self.minimo is None else min(self.minimo, altra.minimo)
+        self.massimo = altra.massimo if self.massimo is None else max(self.massimo, altra.massimo)
+
+        if self.conteggi is not None and altra.conteggi is not None:
+            for indice, conteggio in enumerate(altra.conteggi):
+                self.conteggi[indice] += conteggio
+
+    @property
+    def varianza(self):
+        """Varianza campionaria (0 con meno di due valori)."""
+        return self._m2 / (self.conteggio - 1) if self.conteggio > 1 else 0.0
+
+    @property
+    def deviazione_standard(self):
+        return math.sqrt(self.varianza)
+
+    def quantile(self, q):
+        """
+        Stima il quantile q (tra 0 e 1) dall'istogramma.
+
+        Returns:
+            float: Centro dell'intervallo che contiene il quantile, limitato a
+                minimo e massimo osservati; None senza istogramma o senza valori
+        """
+        if self.conteggi is None or self.conteggio == 0:
+            return None
+
+        obiettivo = max(1, int(q * self.conteggio + 0.5))
+        ampiezza = (self.limite_superiore - self.limite_inferiore) / len(self.conteggi)
+        cumulato = 0
+        for indice, conteggio in enumerate(self.conteggi):
+            cumulato += conteggio
+            if cumulato >= obiettivo:
+                centro = self.limite_inferiore + (indice + 0.5) * ampiezza
+                return min(max(centro, self.minimo), self.massimo)
+        return self.massimo
+
+    def riepilogo(self):
+        """
+        Returns:
+            dict: conteggio, media, deviazione standard, minimo, massimo e,
+                con l'istogramma, p50/p95/p99
+        """
+        riepilogo = {
+            'conteggio': self.conteggio,
+            'media': self.media,
+            'deviazione_standard': self.deviazione_standard,
+            'minimo': self.minimo,
+            'massimo': self.massimo,
+        }
+        if self.conteggi is not None:
+            riepilogo.update({'p50': self.quantile(0.50), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99)})
+        return riepilogo
+
+    def _intervallo(self, valore):
+        """Indice dell'intervallo dell'istogramma in cui cade il valore."""
+        relativo = (valore - self.limite_inferiore) / (self.limite_superiore - self.limite_inferiore)
+        return min(len(self.conteggi) - 1, max(0, int(relativo * len(self.conteggi))))
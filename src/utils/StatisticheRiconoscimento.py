@@ -1,14 +1,75 @@
+from collections import deque
+
+from src.config.configurazione_attuale import configurazione
+from src.utils.IstogrammaTempi import IstogrammaTempi
+from src.utils.StatisticaFlusso import StatisticaFlusso
+
+# Fasi della pipeline video strumentate con registra_tempo_stadio, nell'ordine di esecuzione
+STADI = ('decodifica', 'yolo', 'ritaglio', 'rilevamento_volti', 'preprocessing', 'inferenza_onnx',
+         'matching', 'aggiornamento_tracciamento')
+
+
 class StatisticheRiconoscimento:
+    """
+    Statistiche di un'analisi in memoria costante: confidenze e tempi sono
+    accumulati in forma riassuntiva (media, varianza, istogrammi per i
+    quantili) e solo gli ultimi punteggi, usati dal grafico dei risultati,
+    vengono conservati singolarmente. Anche su flussi live senza fine la
+    memoria non cresce con la durata dell'analisi.
+    """
+
     def __init__(self):
         self.identificazioni_riuscite = 0
         self.tentativi_falliti = 0
-        self.punteggi_confidenza = []
+        # Ultimi punteggi (per il grafico) e statistiche su tutti i punteggi
+        self.punteggi_confidenza = deque(maxlen=configurazione.STORICO_PUNTEGGI_CONFIDENZA)
+        self.confidenza = StatisticaFlusso(0.0, 1.0, intervalli=100)
         self.frame_processati = 0
+        self.frame_letti = 0
+        self.embedding_estratti = 0
+        self.volti_rilevati = 0
         self.tempistiche_embeddings = {}
         self.avg_tempistiche_embeddings = -1
         self.tempo_elaborazione_video = None 
         self.tempo_matching_volti_best = {}
         self.tempo_matching_volti_all = {}
+        self.metriche_sorgenti = []
+        self.tempi_stadi = {stadio: IstogrammaTempi() for stadio in STADI}
+        # Stato istantaneo letto dall'esportatore delle metriche durante l'analisi
+        self.profondita_code = {}
+        self.sorgente_attiva = None
+
+    def __getstate__(self):
+        # La sorgente in lettura (thread, dispositivi) non si serializza con le statistiche
+        stato = self.__dict__.copy()
+        stato['sorgente_attiva'] = None
+        return stato
+
+    def azzera(self):
+        """Riporta tutte le statistiche allo stato iniziale."""
+        self.__init__()
+
+    def unisci(self, altra):
+        """
+        Somma alle statistiche correnti quelle di un'altra esecuzione
+        (ad esempio di un altro segmento dello stesso video).
+        """
+        self.identificazioni_riuscite += altra.identificazioni_riuscite
+        self.tentativi_falliti += altra.tentativi_falliti
+        self.punteggi_confidenza.extend(altra.punteggi_confidenza)
+        self.confidenza.unisci(altra.confidenza)
+        self.frame_processati += altra.frame_processati
+        self.frame_letti += altra.frame_letti
+        self.embedding_estratti += altra.embedding_estratti
+        self.volti_rilevati += altra.volti_rilevati
+        self.tempistiche_embeddings.update(altra.tempistiche_embeddings)
+        self.metriche_sorgenti.extend(altra.metriche_sorgenti)
+
+        for stadio, istogramma in altra.tempi_stadi.items():
+            self.tempi_stadi.setdefault(stadio, IstogrammaTempi()).unisci(istogramma)
+
+        for nome, durate in altra.tempo_matching_volti_all.items():
+            self.tempo_matching_volti_all.setdefault(nome, IstogrammaTempi()).unisci(durate)
 
     def aggiungi_tempistiche_embeddings(self, nome, durata):
         """Aggiunge una tempistica per la generazione degli embeddings."""
@@ -19,11 +80,11 @@ class StatisticheRiconoscimento:
         self.tempo_elaborazione_video = durata
 
     def aggiungi_tempistiche_matching_volti_all(self, nome, durata):
-        """Aggiunge una tempistica di matching per un volto specifico."""
-        if nome in self.tempo_matching_volti_all:
-            self.tempo_matching_volti_all[nome].append(durata)
-        else:
-            self.tempo_matching_volti_all[nome] = [durata]
+        """Aggiunge una tempistica di matching (in secondi) per un volto specifico."""
+        istogramma = self.tempo_matching_volti_all.get(nome)
+        if istogramma is None:
+            istogramma = self.tempo_matching_volti_all.setdefault(nome, IstogrammaTempi())
+        istogramma.aggiungi(durata * 1e9)
 
     def calcola_avg_tempistiche_embeddings(self):
         """Calcola il tempo medio per la generazione degli embeddings."""
@@ -34,13 +95,15 @@ class StatisticheRiconoscimento:
 
     def calcola_volti_best(self):
         """Calcola i tempi migliori di matching per ogni volto."""
-        for key in self.tempo_matching_volti_all:
-            self.tempo_matching_volti_best.update({key: min(self.tempo_matching_volti_all[key])})
+        for key, istogramma in self.tempo_matching_volti_all.items():
+            if istogramma.conteggio:
+                self.tempo_matching_volti_best.update({key: istogramma.minimo / 1e9})
 
     def aggiungi_successo(self, confidenza):
         """Registra un'identificazione riuscita con il suo punteggio di confidenza."""
         self.identificazioni_riuscite += 1
         self.punteggi_confidenza.append(confidenza)
+        self.confidenza.aggiungi(confidenza)
 
     def aggiungi_fallimento(self):
         """Registra un tentativo di identificazione fallito."""
@@ -50,6 +113,43 @@ class StatisticheRiconoscimento:
         """Incrementa il contatore dei frame processati."""
         self.frame_processati += 1
 
+    def aggiungi_embedding_estratti(self, numero):
+        """Conta gli embeddings estratti dai ritagli della pipeline video."""
+        self.embedding_estratti += numero
+
+    def aggiungi_volti_rilevati(self, numero):
+        """Conta i volti rilevati nei ritagli della pipeline video."""
+        self.volti_rilevati += numero
+
+    def registra_tempo_stadio(self, stadio, durata_ns):
+        """
+        Registra la durata di una fase della pipeline.
+
+        Args:
+            stadio: Nome della fase (vedi STADI)
+            durata_ns: Durata in nanosecondi, misurata con time.perf_counter_ns
+        """
+        istogramma = self.tempi_stadi.get(stadio)
+        if istogramma is None:
+            istogramma = self.tempi_stadi.setdefault(stadio, IstogrammaTempi())
+        istogramma.aggiungi(durata_ns)
+
+    def riepilogo_tempi_stadi(self):
+        """Conteggio, media e percentili p50/p95/p99 (ms) delle fasi registrate."""
+        return {stadio: istogramma.riepilogo() for stadio, istogramma in self.tempi_stadi.items() if istogramma.conteggio}
+
+    def imposta_profondita_coda(self, coda, profondita):
+        """Aggiorna il numero di elementi in attesa in una coda della pipeline."""
+        self.profondita_code[coda] = profondita
+
+    def aggiungi_metriche_sorgente(self, metriche):
+        """Registra le metriche di una sorgente di frame al termine della lettura."""
+        self.metriche_sorgenti.append(metriche)
+
+    def incrementa_frame_letti(self):
+        """Incrementa il contatore dei frame letti (processati o saltati dal campionamento)."""
+        self.frame_letti += 1
+
     def calcola_statistiche(self):
         """
         Calcola e restituisce tutte le statistiche finali del sistema.
@@ -62,10 +162,15 @@ class StatisticheRiconoscimento:
         
         tentativi_totali = self.identificazioni_riuscite + self.tentativi_falliti
         tasso_successo = (self.identificazioni_riuscite / tentativi_totali * 100) if tentativi_totali > 0 else 0
-        confidenza_media = sum(self.punteggi_confidenza) / len(self.punteggi_confidenza) if self.punteggi_confidenza else 0
+        confidenza_media = self.confidenza.media
+        frame_saltati = max(0, self.frame_letti - self.frame_processati)
 
         return {
             'frame_processati': self.frame_processati,
+            'frame_letti': self.frame_letti,
+            'frame_saltati': frame_saltati,
+            'embedding_estratti': self.embedding_estratti,
+            'volti_rilevati': self.volti_rilevati,
             'identificazioni_riuscite': self.identificazioni_riuscite,
             'tentativi_falliti': self.tentativi_falliti,
             'tasso_successo': tasso_successo,
@@ -74,5 +179,9 @@ class StatisticheRiconoscimento:
             'tempistiche_embeddings':self.tempistiche_embeddings,
             'tempo_elaborazione_video': self.tempo_elaborazione_video,
             'tempo_matching_volti_best': self.tempo_matching_volti_best,
-            'tempo_matching_volti_all': self.tempo_matching_volti_all
+            'tempo_matching_volti_all': {nome: istogramma.riepilogo()
+                                         for nome, istogramma in self.tempo_matching_volti_all.items()},
+            'confidenza': self.confidenza.riepilogo(),
+            'metriche_sorgenti': self.metriche_sorgenti,
+            'tempi_stadi': self.riepilogo_tempi_stadi()
         }
@@ -0,0 +1,131 @@
+import time
+
+from src.config.configurazione_attuale import configurazione
+from src.utils.SorgentiFrame import crea_sorgente
+
+
+class TracciamentoCampionato:
+    """
+    Lettura del video e tracciamento YOLO limitati ai frame campionati.
+
+    I frame vengono letti da una sorgente (file, flusso live, webcam o
+    cartella di immagini, vedi SorgentiFrame) e solo quelli scelti dal
+    campionatore vengono passati a `model.track`; gli altri non pagano
+    l'inferenza YOLO. Con un campionatore che non usa il contenuto del frame
+    (passo fisso) i frame saltati di file e cartelle non vengono nemmeno
+    decodificati.
+
+    Sui frame saltati il tracker avanza solo con il proprio modello di moto
+    (predizione del filtro di Kalman), così le tracce restano coerenti con
+    il tempo reale e gli ID vengono mantenuti tra un frame elaborato e l'altro.
+
+    Iterando si ottengono i risultati YOLO dei soli frame campionati.
+    """
+
+    def __init__(self, model, sorgente, campionatore, id_conosciuti=(), stats=None):
+        """
+        Args:
+            model: Modello ultralytics YOLO
+            sorgente: Sorgente dei frame (vedi crea_sorgente: file, URL, webcam o cartella)
+            campionatore: Campionatore di frame (fisso o adattivo)
+            id_conosciuti: Insieme degli ID già identificati, letto a ogni frame
+            stats: Statistiche su cui contare i frame letti
+        """
+        self.model = model
+        self.sorgente = sorgente
+        self.campionatore = campionatore
+        self.id_conosciuti = id_conosciuti
+        self.stats = stats
+        self.misura_coda = None
+        self.sorgente_frame = None
+
+    def __iter__(self):
+        self.sorgente_frame = crea_sorgente(self.sorgente)
+        if self.stats is not None:
+            # Visibile all'esportatore delle metriche durante la lettura
+            self.stats.sorgente_attiva = self.sorgente_frame
+
+        try:
+            yield from self._tracciamento()
+        finally:
+            if self.stats is not None:
+                self.stats.sorgente_attiva = None
+
+        if self.stats is not None:
+            self.stats.aggiungi_metriche_sorgente(self.sorgente_frame.metriche())
+
+    def _tracciamento(self):
+        """Lettura, campionamento e tracciamento dei frame della sorgente già creata."""
+        usa_frame = getattr(self.campionatore, 'usa_frame', True)
+        id_attivi = []
+        primo_frame = True
+        indice = -1
+
+        with self.sorgente_frame as sorgente_frame:
+            while True:
+                # Decodifica: lettura (o attesa, per le sorgenti live) del frame, registrata una volta per frame
+                inizio = time.perf_counter_ns()
+                if not sorgente_frame.avanza():
+                    break
+
+                indice += 1
+                if self.stats is not None:
+                    self.stats.incrementa_frame_letti()
+
+                frame = sorgente_frame.frame() if usa_frame else None
+                durata_decodifica = time.perf_counter_ns() - inizio
+                if usa_frame and frame is None:
+                    self._registra_tempo('decodifica', durata_decodifica)
+                    continue  # immagine illeggibile
+
+                profondita_coda = self.misura_coda() if self.misura_coda else 0
+                if self.stats is not None:
+                    self.stats.imposta_profondita_coda('pipeline', profondita_coda)
+
+                if not self.campionatore.deve_processare(indice, frame, id_attivi, self.id_conosciuti, profondita_coda):
+                    self._registra_tempo('decodifica', durata_decodifica)
+                    if not primo_frame:
+                        self._avanza_tracker()
+                    continue
+
+                if frame is None:
+                    inizio = time.perf_counter_ns()
+                    frame = sorgente_frame.frame()
+                    durata_decodifica += time.perf_counter_ns() - inizio
+                self._registra_tempo('decodifica', durata_decodifica)
+                if frame is None:
+                    continue
+
+                # persist=False al primo frame azzera il tracker rimasto da esecuzioni precedenti
+                inizio = time.perf_counter_ns()
+                risultato = self.model.track(frame, persist=not primo_frame, conf=configurazione.YOLO_CONFIDENCE,
+                                             iou=configurazione.YOLO_IOU, verbose=False)[0]
+                self._registra_tempo('yolo', time.perf_counter_ns() - inizio)
+                primo_frame = False
+
+                id_attivi = id_persone_attive(risultato)
+                yield risultato
+
+    def _registra_tempo(self, stadio, durata_ns):
+        if self.stats is not None:
+            self.stats.registra_tempo_stadio(stadio, durata_ns)
+
+    def _avanza_tracker(self):
+        """Propaga di un frame le tracce attive e perse senza eseguire YOLO."""
+        predictor = getattr(self.model, 'predictor', None)
+        for tracker in getattr(predictor, 'trackers', None) or []:
+            try:
+                tracker.frame_id += 1
+                tracker.multi_predict(tracker.tracked_stracks + tracker.lost_stracks)
+            except AttributeError:
+                # Tracker senza predizione di moto: resta fermo fino al prossimo frame
+                pass
+
+
+def id_persone_attive(risultato):
+    """Restituisce gli ID di tracciamento delle persone rilevate nel frame."""
+    if risultato.boxes is None:
+        return []
+
+    return [box.id.item() for box in risultato.boxes
+            if box.id is not None and int(box.cls) == configurazione.CLASSE_PERSONA]
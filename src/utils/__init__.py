@@ -1 +1,23 @@
-from .utils import *
\ No newline at end of file
+"""
+I nomi di utils.py restano accessibili come `src.utils.<nome>`, ma il modulo
+(con YOLO, onnxruntime, ffmpeg e yt_dlp) viene importato solo al primo
+accesso: importare un sottomodulo leggero non carica le dipendenze pesanti.
+"""
+
+import importlib
+import importlib.util
+
+
+def __getattr__(nome):
+    if nome.startswith('__'):
+        raise AttributeError(nome)
+
+    # Sottomodulo del pacchetto (from src.utils import GestoreAnalisi)
+    if importlib.util.find_spec(f'{__name__}.{nome}') is not None:
+        return importlib.import_module(f'{__name__}.{nome}')
+
+    utils = importlib.import_module(f'{__name__}.utils')
+    try:
+        return getattr(utils, nome)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}") from None
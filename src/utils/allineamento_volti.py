@@ -0,0 +1,84 @@
+"""
+Allineamento dei volti al template ArcFace a 5 punti.
+
+Le trasformazioni di similitudine (rotazione, scala uniforme, traslazione)
+vengono stimate in blocco per tutti i volti con il metodo di Umeyama; ogni
+volto viene poi raddrizzato con `cv2.warpAffine` direttamente alla
+dimensione di ingresso del modello di embedding.
+"""
+
+import cv2
+import numpy as np
+
+# Posizione di occhi, naso e angoli della bocca in un volto ArcFace 112x112
+TEMPLATE_ARCFACE = np.array([
+    [38.2946, 51.6963],
+    [73.5318, 51.5014],
+    [56.0252, 71.7366],
+    [41.5493, 92.3655],
+    [70.7299, 92.2041],
+], dtype=np.float32)
+
+
+def stima_trasformazioni_similitudine(punti, template=TEMPLATE_ARCFACE):
+    """
+    Stima le trasformazioni di similitudine che portano i landmark sul template.
+
+    Args:
+        punti: Array (N, 5, 2) dei landmark rilevati
+        template: Array (5, 2) delle posizioni di destinazione
+
+    Returns:
+        numpy.array: Matrici affini (N, 2, 3)
+    """
+    punti = np.asarray(punti, dtype=np.float64).reshape(-1, len(template), 2)
+    template = np.asarray(template, dtype=np.float64)
+
+    media_sorgente = punti.mean(axis=1)
+    media_destinazione = template.mean(axis=0)
+    sorgente = punti - media_sorgente[:, None, :]
+    destinazione = template - media_destinazione
+
+    # Covarianza incrociata e decomposizione SVD per ogni volto
+    covarianza = np.einsum('ki,nkj->nij', destinazione, sorgente) / len(template)
+    U, S, Vt = np.linalg.svd(covarianza)
+
+    # Evita le riflessioni
+    segno = np.sign(np.linalg.det(U) * np.linalg.det(Vt))
+    segno[segno == 0] = 1
+    correzione = np.ones((len(punti), 2))
+    correzione[:, 1] = segno
+
+    rotazione = np.einsum('nij,nj,njk->nik', U, correzione, Vt)
+    varianza_sorgente = (sorgente ** 2).sum(axis=(1, 2)) / len(template)
+    varianza_sorgente[varianza_sorgente == 0] = 1
+    scala = (S * correzione).sum(axis=1) / varianza_sorgente
+
+    traslazione = media_destinazione - scala[:, None] * np.einsum('nij,nj->ni', rotazione, media_sorgente)
+
+    matrici = np.empty((len(punti), 2, 3), dtype=np.float64)
+    matrici[:, :, :2] = scala[:, None, None] * rotazione
+    matrici[:, :, 2] = traslazione
+    return matrici
+
+
+def allinea_volti(immagini, punti, dimensione=(112, 112)):
+    """
+    Raddrizza i volti sul template ArcFace.
+
+    Args:
+        immagini: Lista di N immagini BGR contenenti i volti
+        punti: Array (N, 5, 2) dei landmark nelle coordinate di ciascuna immagine
+        dimensione: (larghezza, altezza) dei volti allineati
+
+    Returns:
+        list: N volti allineati di dimensione `dimensione`
+    """
+    if len(immagini) == 0:
+        return []
+
+    template = TEMPLATE_ARCFACE * (np.asarray(dimensione, dtype=np.float32) / 112.0)
+    matrici = stima_trasformazioni_similitudine(punti, template)
+
+    return [cv2.warpAffine(immagine, matrice, dimensione, borderValue=0.0)
+            for immagine, matrice in zip(immagini, matrici)]
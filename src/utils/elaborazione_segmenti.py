@@ -0,0 +1,178 @@
+"""
+Elaborazione di video lunghi suddivisi in segmenti temporali.
+
+Ogni segmento viene ritagliato con ffmpeg ed elaborato in un processo
+separato, con il proprio RiconoscitoreFacciale e il proprio modello YOLO.
+Al termine le statistiche e le persone dei segmenti vengono unite in un
+unico resoconto, riconciliando gli ID di tracciamento tra i segmenti.
+"""
+
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.config.configurazione_attuale import configurazione
+from src.utils import utils
+from src.utils.EsportatoreMetriche import avvia_esportatore_metriche
+from src.utils.Persona import Persona
+from src.utils.statistiche_attuali import stats
+
+
+def calcola_segmenti(durata_totale, durata_segmento):
+    """
+    Suddivide la durata del video in intervalli consecutivi.
+
+    Returns:
+        list: Coppie (secondo_inizio, durata)
+    """
+    numero_segmenti = max(1, math.ceil(durata_totale / durata_segmento))
+    return [(indice * durata_segmento, min(durata_segmento, durata_totale - indice * durata_segmento))
+            for indice in range(numero_segmenti)]
+
+
+def elabora_segmento(indice, percorso_video, secondo_inizio, durata, cartella_segmenti, modello=None):
+    """
+    Elabora un singolo segmento del video (eseguita in un processo worker).
+
+    Args:
+        cartella_segmenti: Cartella temporanea dell'analisi in cui ritagliare il segmento
+        modello: Modello di riconoscimento scelto (vedi ConfrontoModelli.percorso_modello), default AuraFace
+
+    Returns:
+        dict: Indice del segmento, statistiche e persone identificate
+    """
+    # Ogni processo parte da uno stato pulito e usa la pipeline seriale
+    # per non competere con gli altri processi per i core
+    utils.azzera_stato_analisi()
+    configurazione.NUMERO_WORKER_PIPELINE = configurazione.NUMERO_WORKER_PIPELINE_SEGMENTI
+
+    percorso_segmento = os.path.join(cartella_segmenti, f'segmento_{indice:05d}.mp4')
+
+    try:
+        utils.ritaglia_video(percorso_video, percorso_segmento, secondo_inizio, durata)
+
+        riconoscitore_volti = utils.crea_riconoscitore(modello) if modello else utils.RiconoscitoreFacciale()
+        riconoscitore_volti.carica_volti_noti(configurazione.DIRVOLTI)
+
+        start_time = time.time()
+        utils.processa_rilevazioni(utils.creazione_e_tracciamento_video_con_YOLO(percorso_segmento), riconoscitore_volti)
+        stats.set_elaborazione_video(time.time() - start_time)
+    finally:
+        if os.path.exists(percorso_segmento):
+            os.remove(percorso_segmento)
+
+    return {
+        'indice': indice,
+        'stats': stats,
+        'persone': utils.dizionario,
+    }
+
+
+def riconcilia_persone(risultati_segmenti):
+    """
+    Unisce le persone dei segmenti assegnando ID di tracciamento globali.
+
+    Gli ID di YOLO ripartono da capo in ogni segmento, quindi ogni ID locale
+    riceve un nuovo ID globale. Fa eccezione il primo ID di una persona che
+    era stata identificata anche nel segmento precedente: si assume che sia
+    la stessa traccia a cavallo del confine e ne eredita l'ID globale.
+
+    Args:
+        risultati_segmenti: Risultati di elabora_segmento ordinati per indice
+
+    Returns:
+        dict: Nome -> Persona con lo storico complessivo
+    """
+    persone = {}
+    ultimo_id_globale = {}
+    prossimo_id = 1
+
+    for risultato in risultati_segmenti:
+        indice = risultato['indice']
+        mappa_id = {}
+
+        for nome, persona_segmento in risultato['persone'].items():
+            if not persona_segmento.identification_count:
+                continue
+
+            # Lo storico conserva solo gli ultimi ID: il primo è tenuto a parte
+            for id_locale in (persona_segmento.primo_id, *persona_segmento.list_ID):
+                if id_locale in mappa_id:
+                    continue
+
+                precedente = ultimo_id_globale.get(nome)
+                if (id_locale == persona_segmento.primo_id and precedente is not None
+                        and precedente[0] == indice - 1):
+                    mappa_id[id_locale] = precedente[1]
+                else:
+                    mappa_id[id_locale] = prossimo_id
+                    prossimo_id += 1
+
+        for nome, persona_segmento in risultato['persone'].items():
+            persona = persone.setdefault(nome, Persona(nome, persona_segmento.pathImmagine,
+                                                       persona_segmento.immagini_riferimento))
+            persona.unisci(persona_segmento, mappa_id)
+
+            if persona_segmento.list_ID:
+                ultimo_id_globale[nome] = (indice, mappa_id[persona_segmento.list_ID[-1]])
+
+    return persone
+
+
+def inizializza_tutto_segmentato(percorso_video=None, durata_segmento=None, numero_processi=None, modello=None):
+    """
+    Analizza un video lungo suddividendolo in segmenti elaborati in parallelo.
+
+    Al termine statistiche e persone globali (`stats`, `utils.dizionario`)
+    contengono il resoconto unito di tutti i segmenti.
+
+    Args:
+        percorso_video: Video da analizzare (default: PATHVIDEO)
+        durata_segmento: Durata in secondi di ogni segmento
+        numero_processi: Processi worker (default: numero di core)
+        modello: Modello di riconoscimento usato da ogni segmento (default: AuraFace)
+
+    Returns:
+        dict: Statistiche finali come inizializza_tutto
+    """
+    percorso_video = percorso_video or configurazione.PATHVIDEO
+    durata_segmento = durata_segmento or configurazione.DURATA_SEGMENTO_SECONDI
+    numero_processi = numero_processi or configurazione.NUMERO_PROCESSI_SEGMENTI or os.cpu_count()
+
+    segmenti = calcola_segmenti(utils.durata_video(percorso_video), durata_segmento)
+    print(f"Analisi di {len(segmenti)} segmenti con {numero_processi} processi")
+
+    start_time_video = time.time()
+
+    # I segmenti conclusi vengono sommati subito: l'esportatore delle metriche mostra l'avanzamento
+    stats.azzera()
+    avvia_esportatore_metriche(stats)
+
+    # Una cartella per analisi: più analisi segmentate in parallelo non condividono i file dei segmenti
+    os.makedirs(configurazione.DIR_SEGMENTI, exist_ok=True)
+    cartella_segmenti = tempfile.mkdtemp(prefix='analisi_', dir=configurazione.DIR_SEGMENTI)
+
+    try:
+        # 'spawn' evita di duplicare nei figli lo stato dei thread di onnxruntime/torch
+        contesto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=numero_processi, mp_context=contesto) as pool:
+            futuri = [pool.submit(elabora_segmento, indice, percorso_video, inizio, durata, cartella_segmenti, modello)
+                      for indice, (inizio, durata) in enumerate(segmenti)]
+            risultati_segmenti = []
+            for futuro in as_completed(futuri):
+                risultati_segmenti.append(futuro.result())
+                stats.unisci(risultati_segmenti[-1]['stats'])
+    finally:
+        shutil.rmtree(cartella_segmenti, ignore_errors=True)
+
+    # Le persone si riconciliano nell'ordine dei segmenti
+    risultati_segmenti.sort(key=lambda r: r['indice'])
+    utils.dizionario = riconcilia_persone(risultati_segmenti)
+    utils._id_conosciuti.clear()
+
+    stats.set_elaborazione_video(time.time() - start_time_video)
+    return stats.calcola_statistiche()
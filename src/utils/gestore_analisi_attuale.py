@@ -0,0 +1,3 @@
+from src.utils.GestoreAnalisi import GestoreAnalisi
+
+gestore_analisi = GestoreAnalisi()
@@ -0,0 +1,138 @@
+"""
+Istantanea su disco della galleria dei volti noti.
+
+La matrice degli embeddings normalizzati viene salvata in formato .npy e
+riaperta con np.load(mmap_mode='r'): il caricamento non copia i dati e i
+processi sullo stesso host condividono le stesse pagine della page cache.
+Un manifest JSON per cartella dei volti registra nomi, composizione della
+galleria e stato della cartella: date di modifica delle cartelle e
+(dimensione, data di modifica) di ogni immagine. Finché non cambiano,
+l'avvio richiede solo uno stat per file, senza leggere o fare l'hash delle
+immagini.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from src.utils.registrazione_volti import e_immagine
+
+
+def _percorso_manifest(directory, cartella):
+    """Manifest associato a una cartella dei volti."""
+    chiave = hashlib.sha256(os.path.abspath(cartella).encode()).hexdigest()[:16]
+    return os.path.join(directory, f'manifest_{chiave}.json')
+
+
+def _firma(info):
+    return [info.st_size, info.st_mtime_ns]
+
+
+def stato_cartella(cartella):
+    """
+    Stato della cartella dei volti e delle sottocartelle per identità.
+
+    Le date di modifica delle cartelle cambiano quando vengono aggiunti,
+    rimossi o rinominati file; (dimensione, data di modifica) delle
+    immagini cambiano quando un'immagine viene sovrascritta sul posto.
+
+    Returns:
+        dict: Percorso relativo ('.' per la cartella stessa) -> [dimensione, mtime in ns]
+    """
+    stato = {'.': _firma(os.stat(cartella))}
+    with os.scandir(cartella) as voci:
+        for voce in voci:
+            if voce.is_dir():
+                stato[voce.name] = _firma(voce.stat())
+                with os.scandir(voce.path) as immagini:
+                    for immagine in immagini:
+                        if immagine.is_file() and e_immagine(immagine.name):
+                            stato[f'{voce.name}/{immagine.name}'] = _firma(immagine.stat())
+            elif voce.is_file() and e_immagine(voce.name):
+                stato[voce.name] = _firma(voce.stat())
+    return stato
+
+
+def _stato_invariato(cartella, stato):
+    """
+    Confronta lo stato salvato con il disco. Basta controllare le voci
+    salvate: un file nuovo cambia la data di modifica della sua cartella.
+    """
+    try:
+        return all(_firma(os.stat(os.path.join(cartella, relativo))) == firma
+                   for relativo, firma in stato.items())
+    except OSError:
+        return False
+
+
+def leggi_istantanea(directory, cartella):
+    """
+    Apre l'istantanea della galleria se la cartella e le immagini non sono cambiate.
+
+    Args:
+        directory: Cartella della cache in cui sono salvate le istantanee
+        cartella: Cartella dei volti noti
+
+    Returns:
+        tuple: (matrice memmap (N, D) in sola lettura, nomi, composizione), o None se assente o non valida
+    """
+    percorso = _percorso_manifest(directory, cartella)
+    if not os.path.exists(percorso):
+        return None
+
+    try:
+        with open(percorso, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        if not _stato_invariato(cartella, manifest['stato_cartella']):
+            return None
+
+        matrice = np.load(os.path.join(directory, manifest['file_matrice']), mmap_mode='r')
+        if len(matrice) != len(manifest['nomi']):
+            return None
+
+        return matrice, manifest['nomi'], manifest['composizione']
+
+    except Exception as e:
+        print(f"Errore lettura istantanea galleria: {e}")
+        return None
+
+
+def scrivi_istantanea(directory, cartella, stato, matrice, nomi, composizione):
+    """
+    Salva la galleria e il manifest della cartella.
+
+    I file vengono scritti su un nome temporaneo e poi rinominati, così gli
+    altri processi vedono sempre un'istantanea completa.
+
+    Args:
+        stato: stato_cartella() letto prima di elencare le immagini, così una
+            modifica durante il caricamento invalida comunque l'istantanea
+
+    Returns:
+        numpy.memmap: La matrice salvata, riaperta in sola lettura
+    """
+    file_matrice = f'galleria_{composizione}.npy'
+    percorso_matrice = os.path.join(directory, file_matrice)
+
+    if not os.path.exists(percorso_matrice):
+        temporaneo = f'{percorso_matrice}.{os.getpid()}.tmp'
+        with open(temporaneo, 'wb') as f:
+            np.save(f, np.ascontiguousarray(matrice, dtype=np.float32))
+        os.replace(temporaneo, percorso_matrice)
+
+    percorso = _percorso_manifest(directory, cartella)
+    temporaneo = f'{percorso}.{os.getpid()}.tmp'
+    with open(temporaneo, 'w', encoding='utf-8') as f:
+        json.dump({
+            'cartella': os.path.abspath(cartella),
+            'stato_cartella': stato,
+            'composizione': composizione,
+            'file_matrice': file_matrice,
+            'nomi': list(nomi),
+        }, f)
+    os.replace(temporaneo, percorso)
+
+    return np.load(percorso_matrice, mmap_mode='r')
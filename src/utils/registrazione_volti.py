@@ -0,0 +1,235 @@
+"""
+Registrazione in blocco delle gallerie di volti.
+
+Le immagini di una cartella vengono lette, decodificate e passate al
+rilevatore di volti su un pool di thread (OpenCV e onnxruntime rilasciano
+il GIL); i volti trovati vengono poi accumulati ed elaborati dal modello
+di embedding a batch. Ogni batch viene scritto subito nella cache degli
+embeddings, quindi una registrazione interrotta riprende dalle immagini
+non ancora elaborate. Gli errori sulle singole immagini (file illeggibile,
+nessun volto) vengono riportati senza interrompere la registrazione.
+
+Uso da riga di comando:
+    python -m src.utils.registrazione_volti data/volti --thread 8 --rapporto fallimenti.jsonl
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from src.config.configurazione_attuale import configurazione
+from src.utils.statistiche_attuali import stats
+
+ILLEGGIBILE = 'file illeggibile'
+NESSUN_VOLTO = 'nessun volto trovato'
+ERRORE_RILEVAMENTO = 'errore rilevamento'
+ERRORE_EMBEDDING = 'errore embedding'
+
+
+def e_immagine(nome_file):
+    """True se il nome del file ha un'estensione immagine supportata."""
+    return nome_file.lower().endswith(configurazione.ESTENSIONI_IMMAGINI)
+
+
+def elenca_immagini(cartella):
+    """
+    Elenca le immagini dei volti noti con l'identità a cui appartengono.
+
+    Sono supportati due layout, anche insieme:
+    - un file per persona: <cartella>/<persona>.jpg
+    - una cartella per persona con più immagini di riferimento: <cartella>/<persona>/*.jpg
+
+    Returns:
+        list: Coppie (nome, percorso relativo) ordinate per nome e file, così
+            le immagini di una stessa identità sono consecutive
+    """
+    immagini = []
+    with os.scandir(cartella) as voci:
+        for voce in voci:
+            if voce.is_dir():
+                immagini.extend((voce.name, os.path.join(voce.name, nome_file))
+                                for nome_file in os.listdir(voce.path)
+                                if e_immagine(nome_file) and os.path.isfile(os.path.join(voce.path, nome_file)))
+            elif voce.is_file() and e_immagine(voce.name):
+                immagini.append((os.path.splitext(voce.name)[0], voce.name))
+    return sorted(immagini)
+
+
+def _leggi_e_rileva(riconoscitore_volti, percorso):
+    """
+    Eseguita sui thread: impronta, decodifica e rilevamento del volto.
+
+    Returns:
+        tuple: (impronta, volto, motivo del fallimento); volto e motivo sono
+            None se l'immagine è già in cache
+    """
+    try:
+        impronta = riconoscitore_volti.cache.impronta_file(percorso)
+    except OSError:
+        return None, None, ILLEGGIBILE
+
+    if impronta in riconoscitore_volti.cache:
+        return impronta, None, None
+
+    immagine = cv2.imread(percorso)
+    if immagine is None:
+        return impronta, None, ILLEGGIBILE
+
+    try:
+        volto = riconoscitore_volti.prepara_volto(immagine)
+    except Exception as e:
+        print(f"Errore rilevamento volto in {percorso}: {e}")
+        return impronta, None, ERRORE_RILEVAMENTO
+
+    if volto is None:
+        return impronta, None, NESSUN_VOLTO
+    return impronta, volto, None
+
+
+def _in_ordine(pool, funzione, elementi, massimo_in_volo):
+    """Come pool.map, ma con al più `massimo_in_volo` elementi in elaborazione."""
+    in_volo = deque()
+    for elemento in elementi:
+        in_volo.append((elemento, pool.submit(funzione, elemento)))
+        if len(in_volo) >= massimo_in_volo:
+            elemento_pronto, futuro = in_volo.popleft()
+            yield elemento_pronto, futuro.result()
+
+    while in_volo:
+        elemento_pronto, futuro = in_volo.popleft()
+        yield elemento_pronto, futuro.result()
+
+
+def registra_cartella(riconoscitore_volti, cartella, numero_thread=None, dimensione_batch=None, file_rapporto=None):
+    """
+    Garantisce che tutte le immagini della cartella siano nella cache degli embeddings.
+
+    Args:
+        riconoscitore_volti: RiconoscitoreFacciale di cui popolare la cache
+        cartella: Cartella dei volti noti (vedi elenca_immagini per il layout)
+        numero_thread: Thread per decodifica e rilevamento (default: NUMERO_THREAD_REGISTRAZIONE)
+        dimensione_batch: Volti per inferenza di embedding (default: quella del riconoscitore)
+        file_rapporto: File JSON Lines in cui scrivere i fallimenti man mano che avvengono
+
+    Returns:
+        dict: 'volti' (coppie (nome, impronta) delle immagini con un volto, nell'ordine
+            di elenca_immagini), 'elaborate', 'dalla_cache' e 'fallite' (lista di
+            {'file', 'motivo'}, con il percorso relativo alla cartella)
+    """
+    numero_thread = numero_thread or configurazione.NUMERO_THREAD_REGISTRAZIONE or os.cpu_count()
+    dimensione_batch = dimensione_batch or riconoscitore_volti.dimensione_batch
+    cache = riconoscitore_volti.cache
+
+    risultato = {'volti': [], 'elaborate': 0, 'dalla_cache': 0, 'fallite': []}
+    in_attesa = []
+    impronte_in_attesa = set()
+
+    rapporto = open(file_rapporto, 'a', encoding='utf-8') if file_rapporto else None
+
+    def fallimento(file_img, motivo):
+        voce = {'file': file_img, 'motivo': motivo}
+        risultato['fallite'].append(voce)
+        if rapporto is not None:
+            rapporto.write(json.dumps(voce) + '\n')
+            rapporto.flush()
+
+    def elabora_batch():
+        """Embedding dei volti in attesa e scrittura immediata nella cache."""
+        if not in_attesa:
+            return
+
+        start_time = time.time()
+        try:
+            embeddings = riconoscitore_volti.embeddings_volti([volto for _, _, _, volto in in_attesa])
+        except Exception as e:
+            print(f"Errore embedding batch: {e}")
+            for file_img, _, _, _ in in_attesa:
+                fallimento(file_img, ERRORE_EMBEDDING)
+            in_attesa.clear()
+            impronte_in_attesa.clear()
+            return
+
+        tempo_per_volto = (time.time() - start_time) / len(in_attesa)
+        for (_, nome_persona, impronta, _), embedding in zip(in_attesa, embeddings):
+            cache.aggiungi(impronta, embedding)
+            stats.aggiungi_tempistiche_embeddings(nome_persona, tempo_per_volto)
+            risultato['elaborate'] += 1
+        in_attesa.clear()
+        impronte_in_attesa.clear()
+
+    def lavoro(immagine):
+        _, file_img = immagine
+        return _leggi_e_rileva(riconoscitore_volti, os.path.join(cartella, file_img))
+
+    immagini = elenca_immagini(cartella)
+    impronte = {}
+
+    try:
+        with ThreadPoolExecutor(max_workers=numero_thread, thread_name_prefix="registrazione") as pool:
+            for (nome_persona, file_img), (impronta, volto, motivo) in _in_ordine(pool, lavoro, immagini,
+                                                                                   numero_thread * 4):
+                impronte[file_img] = impronta
+
+                # Immagini identiche già in coda o già elaborate in questa registrazione
+                if volto is not None and (impronta in cache or impronta in impronte_in_attesa):
+                    volto, motivo = None, None
+
+                if volto is not None:
+                    impronte_in_attesa.add(impronta)
+                    in_attesa.append((file_img, nome_persona, impronta, volto))
+                    if len(in_attesa) >= dimensione_batch:
+                        elabora_batch()
+                elif motivo == NESSUN_VOLTO:
+                    # Anche l'assenza di volto va in cache: alla ripresa l'immagine non viene riletta
+                    cache.aggiungi(impronta, None)
+                    fallimento(file_img, motivo)
+                elif motivo is not None:
+                    fallimento(file_img, motivo)
+                elif impronta in impronte_in_attesa:
+                    risultato['elaborate'] += 1
+                elif not cache.contiene_volto(impronta):
+                    risultato['dalla_cache'] += 1
+                    fallimento(file_img, NESSUN_VOLTO)
+                else:
+                    risultato['dalla_cache'] += 1
+
+            elabora_batch()
+    finally:
+        if rapporto is not None:
+            rapporto.close()
+
+    risultato['volti'] = [(nome_persona, impronte[file_img]) for nome_persona, file_img in immagini
+                          if impronte.get(file_img) is not None and cache.contiene_volto(impronte[file_img])]
+    return risultato
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registrazione in blocco di una cartella di volti nella cache degli embeddings")
+    parser.add_argument('cartella', nargs='?', default=configurazione.DIRVOLTI)
+    parser.add_argument('--modello', default=None, help="Percorso del modello ONNX (default: AuraFace)")
+    parser.add_argument('--thread', type=int, default=None, help="Thread per decodifica e rilevamento")
+    parser.add_argument('--batch', type=int, default=None, help="Volti per inferenza di embedding")
+    parser.add_argument('--rapporto', default=None, help="File JSON Lines per i fallimenti")
+    args = parser.parse_args()
+
+    from src.utils.RiconoscitoreFacciale import RiconoscitoreFacciale
+
+    riconoscitore_volti = RiconoscitoreFacciale(percorso_modello=args.modello, dimensione_batch=args.batch)
+
+    start_time = time.time()
+    risultato = registra_cartella(riconoscitore_volti, args.cartella, args.thread, args.batch, args.rapporto)
+    durata = time.time() - start_time
+
+    print(f"Volti registrati: {len(risultato['volti'])} "
+          f"({risultato['elaborate']} elaborati, {risultato['dalla_cache']} dalla cache) in {durata:.1f}s")
+    for voce in risultato['fallite']:
+        print(f"  {voce['file']}: {voce['motivo']}")
+
+
+if __name__ == '__main__':
+    main()
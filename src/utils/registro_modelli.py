@@ -0,0 +1,136 @@
+"""
+Registro dei modelli caricati, condiviso da tutto il processo.
+
+Streamlit riesegue gli script a ogni interazione, ma i moduli importati
+restano in memoria: il registro vive a livello di modulo ed è quindi
+condiviso tra esecuzioni, sessioni e pagine. Ogni modello viene caricato una
+sola volta per (tipo, percorso, impronta del file): se il file viene
+sostituito l'impronta cambia e il modello viene ricaricato. L'impronta è
+ricalcolata solo quando dimensione o data di modifica del file cambiano,
+quindi una richiesta al registro costa un os.stat.
+"""
+
+import os
+import threading
+import time
+
+from src.config.configurazione_attuale import configurazione
+from src.utils.CacheEmbeddings import hash_file
+
+_modelli = {}
+_impronte = {}
+_tempi_caricamento = {}
+# Rientrante: un modello può caricarne altri dal registro (il rilevatore ONNX la propria sessione)
+_blocco = threading.RLock()
+
+
+def impronta_modello(percorso):
+    """
+    Impronta SHA-256 del file del modello, memorizzata per (dimensione, data di modifica).
+
+    Returns:
+        str: Impronta, o None se il percorso non è un file (ad esempio un nome
+            di modello scaricato dalla libreria)
+    """
+    if not os.path.isfile(percorso):
+        return None
+
+    percorso = os.path.abspath(percorso)
+    info = os.stat(percorso)
+    memorizzata = _impronte.get(percorso)
+    if memorizzata is not None and memorizzata[:2] == (info.st_size, info.st_mtime_ns):
+        return memorizzata[2]
+
+    impronta = hash_file(percorso)
+    _impronte[percorso] = (info.st_size, info.st_mtime_ns, impronta)
+    return impronta
+
+
+def ottieni_modello(tipo, percorso, carica):
+    """
+    Restituisce il modello registrato, caricandolo con `carica(percorso)` la prima volta.
+
+    Args:
+        tipo: Categoria del modello (ad esempio 'onnx' o 'yolo'), parte della chiave
+        percorso: File del modello
+        carica: Funzione che carica il modello dal percorso
+
+    Returns:
+        Il modello condiviso
+    """
+    chiave = (tipo, os.path.abspath(percorso) if os.path.isfile(percorso) else percorso, impronta_modello(percorso))
+
+    with _blocco:
+        if chiave not in _modelli:
+            # Una versione precedente dello stesso file non serve più
+            _rimuovi_chiavi(lambda altra: altra[:2] == chiave[:2])
+            inizio = time.perf_counter()
+            _modelli[chiave] = carica(percorso)
+            _tempi_caricamento[chiave] = time.perf_counter() - inizio
+        return _modelli[chiave]
+
+
+def ottieni_sessione_onnx(percorso_onnx):
+    """Sessione onnxruntime condivisa per il file .onnx."""
+    from src.utils.sessioni_onnx import crea_sessione_onnx
+    return ottieni_modello('onnx', percorso_onnx, crea_sessione_onnx)
+
+
+def ottieni_modello_yolo(percorso_modello):
+    """
+    Modello YOLO condiviso.
+
+    Il modello conserva lo stato del tracker: due analisi non devono usarlo
+    contemporaneamente (il tracker viene azzerato all'inizio di ogni analisi).
+    """
+    from ultralytics import YOLO
+    return ottieni_modello('yolo', str(percorso_modello), YOLO)
+
+
+def ottieni_rilevatore(tipo):
+    """
+    Rilevatore di volti condiviso. I rilevatori non conservano stato tra
+    una chiamata e l'altra (la cascata Haar è già separata per thread).
+    """
+    from src.utils.RilevatoreVolti import crea_rilevatore
+    percorso = configurazione.RILEVATORE_ONNX_PATH if tipo == 'onnx' else tipo
+    return ottieni_modello('rilevatore', percorso, lambda _: crea_rilevatore(tipo))
+
+
+def rimuovi(percorso=None):
+    """
+    Rimuove dal registro i modelli di un file (tutti se percorso è None),
+    ad esempio quando viene caricato un nuovo modello custom.
+
+    Returns:
+        int: Numero di modelli rimossi
+    """
+    with _blocco:
+        if percorso is None:
+            _impronte.clear()
+            return _rimuovi_chiavi(lambda chiave: True)
+
+        assoluto = os.path.abspath(percorso)
+        _impronte.pop(assoluto, None)
+        return _rimuovi_chiavi(lambda chiave: chiave[1] in (assoluto, percorso))
+
+
+def _rimuovi_chiavi(condizione):
+    """Rimuove le voci del registro che soddisfano la condizione (da chiamare con il blocco)."""
+    chiavi = [chiave for chiave in _modelli if condizione(chiave)]
+    for chiave in chiavi:
+        del _modelli[chiave]
+        _tempi_caricamento.pop(chiave, None)
+    return len(chiavi)
+
+
+def modelli_caricati():
+    """Elenco (tipo, percorso, impronta) dei modelli in memoria."""
+    with _blocco:
+        return list(_modelli)
+
+
+def tempi_caricamento():
+    """Secondi impiegati a caricare ciascun modello in memoria, per (tipo, percorso)."""
+    with _blocco:
+        return {chiave[:2]: secondi for chiave, secondi in _tempi_caricamento.items()}
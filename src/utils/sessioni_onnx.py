@@ -0,0 +1,33 @@
+import os
+
+from src.config.configurazione_attuale import configurazione
+
+
+def crea_sessione_onnx(percorso_onnx, providers=None):
+    """
+    Crea una sessione onnxruntime con i provider configurati.
+
+    I provider non disponibili nell'installazione corrente vengono scartati,
+    così la stessa configurazione funziona sia con GPU sia solo con CPU.
+
+    Args:
+        percorso_onnx: Percorso del file .onnx
+        providers: Lista di provider in ordine di preferenza (default da configurazione)
+
+    Returns:
+        onnxruntime.InferenceSession
+    """
+    import onnxruntime as ort
+
+    if not os.path.exists(percorso_onnx):
+        raise FileNotFoundError(f"File ONNX non trovato: {percorso_onnx}")
+
+    disponibili = ort.get_available_providers()
+    providers = [p for p in (providers or configurazione.ONNX_PROVIDERS) if p in disponibili] or disponibili
+
+    # Con più worker in parallelo conviene limitare i thread interni di ogni inferenza
+    opzioni = ort.SessionOptions()
+    if configurazione.ONNX_THREAD_INTRA_OP:
+        opzioni.intra_op_num_threads = configurazione.ONNX_THREAD_INTRA_OP
+
+    return ort.InferenceSession(percorso_onnx, sess_options=opzioni, providers=providers)
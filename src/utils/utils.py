@@ -3,14 +3,18 @@ import os
 import shutil
 import time
 import cv2
-from ultralytics import YOLO 
-import ffmpeg
-import wget
-import yt_dlp
 
 from src.config.configurazione_attuale import configurazione  
 from src.utils.RiconoscitoreFacciale import RiconoscitoreFacciale
+from src.utils.AccumulatoreTracce import AccumulatoreTracce
+from src.utils.ConfrontoModelli import crea_riconoscitore
+from src.utils.registrazione_volti import elenca_immagini
+from src.utils.registro_modelli import ottieni_modello_yolo
+from src.utils.CampionatoreAdattivo import crea_campionatore
+from src.utils.EsportatoreMetriche import avvia_esportatore_metriche
 from src.utils.Persona import Persona
+from src.utils.PipelineVideo import PipelineVideo
+from src.utils.TracciamentoCampionato import TracciamentoCampionato
 from src.utils.statistiche_attuali import stats
 
 def crea_cartelle_necessarie():
@@ -18,10 +22,14 @@ def crea_cartelle_necessarie():
     os.makedirs(f'{configurazione.PROJECT_ROOT}data/temp_images', exist_ok=True)
 
 def dowload_immagini():    
+    import wget
+
     for chiave in configurazione.URLIMMAGINI:
         wget.download(configurazione.URLIMMAGINI[chiave], f'{configurazione.DIRVOLTI}/{chiave}.jpg')
 
 def dowload_YT_video():
+    import yt_dlp
+
     ydl_opts = {
         'format': 'best',
         'outtmpl': configurazione.PATHVIDEO,
@@ -32,29 +40,51 @@ def dowload_YT_video():
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         ydl.download([configurazione.URLVIDEO])
 
-def ritaglia_video():
-    ffmpeg.input(configurazione.PATHVIDEO, ss=configurazione.SECONDOINIZIO, t=configurazione.DURATAVIDEO).output(configurazione.PATHVIDEOTAGLIATO).run()
+def ritaglia_video(percorso_input=None, percorso_output=None, secondo_inizio=None, durata=None):
+    """Ritaglia un intervallo del video (default: quello configurato)."""
+    percorso_input = percorso_input or configurazione.PATHVIDEO
+    percorso_output = percorso_output or configurazione.PATHVIDEOTAGLIATO
+    secondo_inizio = configurazione.SECONDOINIZIO if secondo_inizio is None else secondo_inizio
+    durata = configurazione.DURATAVIDEO if durata is None else durata
+
+    import ffmpeg
+    ffmpeg.input(percorso_input, ss=secondo_inizio, t=durata).output(percorso_output).run(overwrite_output=True)
+
+def durata_video(percorso_video):
+    """Restituisce la durata del video in secondi."""
+    import ffmpeg
+    return float(ffmpeg.probe(percorso_video)['format']['duration'])
     
 def dowload_e_taglia_video():
     dowload_YT_video()
     ritaglia_video()
     
-def creazione_e_tracciamento_video_con_YOLO():    
-    model = YOLO(configurazione.YOLO_MODEL)
-    return model.track(source=configurazione.PATHVIDEOTAGLIATO, conf=0.3, iou=0.5, stream=True)
+def creazione_e_tracciamento_video_con_YOLO(sorgente=None, campionatore=None):
+    """
+    Recupera il modello YOLO dal registro (caricato una sola volta per processo)
+    e restituisce il tracciamento dei soli frame campionati.
+
+    Il campionamento avviene prima dell'inferenza: i frame scartati dal
+    campionatore non passano da YOLO.
+
+    Args:
+        sorgente: File video, URL di un flusso, webcam o cartella di immagini
+            (vedi crea_sorgente; default: SORGENTE_VIDEO o PATHVIDEOTAGLIATO)
+    """
+    model = ottieni_modello_yolo(configurazione.YOLO_MODEL)
+    return TracciamentoCampionato(model, sorgente, campionatore or crea_campionatore(), _accumulatore_tracce, stats)
 
 def creazione_dizionario_nome_Persona():
     dizionario = {}
-    face_files = [name for name in os.listdir(configurazione.DIRVOLTI) if name.lower().endswith(configurazione.ESTENSIONI_IMMAGINI)]
 
-    for name in face_files:
-        person_name = name.split('.')[0]
-        full_path = f'{configurazione.DIRVOLTI}/{name}'
+    # Un file per persona o una sottocartella per persona con più immagini di riferimento
+    for person_name, file_img in elenca_immagini(configurazione.DIRVOLTI):
+        full_path = f'{configurazione.DIRVOLTI}/{file_img}'
 
-        if os.path.exists(full_path):
-            dizionario[person_name] = Persona(person_name, full_path)
+        if person_name in dizionario:
+            dizionario[person_name].aggiungi_riferimento(full_path)
         else:
-            print(f"Error: File not found: {full_path}")
+            dizionario[person_name] = Persona(person_name, full_path)
     return dizionario
 
 def rimuovi_files_cache_e_contenuto_auraface_dir():
@@ -77,30 +107,14 @@ def _rimuovi_file_in_directory(directory):
             except Exception as e:
                 pass
 
-def identifica_persona(percorso_immagine, riconoscitore_volti, soglia_confidenza=0.55):
-    """
-    Identifica una persona dall'immagine ritagliata con tracciamento delle tempistiche.
-    """
-    if not os.path.exists(percorso_immagine):
-        return '-1', 0.0
-
-    try:
-        start_time = time.time()
-
-        nome, confidenza = riconoscitore_volti.identifica_volto(percorso_immagine, soglia_confidenza)
-
-        matching_time = time.time() - start_time
-        if nome != '-1':
-            stats.aggiungi_tempistiche_matching_volti_all(nome, matching_time)
-
-        return nome, confidenza
-    except Exception:
-        return '-1', 0.0
-
 def e_persona_conosciuta(id_tracciamento):
     """Verifica se la persona è già stata identificata."""
     return id_tracciamento is not None and id_tracciamento in _id_conosciuti
 
+def e_traccia_risolta(id_tracciamento):
+    """Verifica se la traccia è già identificata o ha esaurito i tentativi di embedding."""
+    return id_tracciamento is not None and id_tracciamento in _accumulatore_tracce
+
 def e_ritaglio_valido(immagine, dimensione_minima=40):
     """
     Verifica se l'immagine è adatta per il riconoscimento.
@@ -165,108 +179,284 @@ def processa_rilevazioni(results, riconoscitore_volti):
     """
     Processa i risultati delle rilevazioni YOLO per identificare le persone.
 
+    I risultati arrivano già campionati (vedi TracciamentoCampionato): ogni
+    risultato ricevuto viene elaborato.
+
+    I ritagli delle persone vengono accumulati su una finestra di
+    FINESTRA_FRAME_BATCH frame campionati (o fino a DIMENSIONE_BATCH_EMBEDDING
+    ritagli) e identificati con una sola inferenza a batch.
+
+    Con NUMERO_WORKER_PIPELINE > 1 l'elaborazione avviene sulla pipeline
+    parallela a stadi (vedi processa_rilevazioni_parallelo).
+
     Args:
         results: Risultati delle rilevazioni YOLO
     """
-    for indice, risultato in enumerate(results):
-        # Salta frame in base al tasso di campionamento
-        if indice % configurazione.FRAMEDASALTARE != 0:
-            continue
+    if configurazione.NUMERO_WORKER_PIPELINE > 1:
+        processa_rilevazioni_parallelo(results, riconoscitore_volti)
+        return
 
+    ritagli_in_attesa = []
+    frame_in_attesa = 0
+
+    for risultato in results:
         stats.incrementa_frame()
 
         # Verifica se ci sono rilevazioni nel frame
+        if risultato.boxes is not None:
+            ritagli_in_attesa.extend(raccogli_ritagli_frame(risultato, ritagli_in_attesa))
+
+        frame_in_attesa += 1
+
+        finestra_completa = frame_in_attesa >= configurazione.FINESTRA_FRAME_BATCH
+        batch_completo = len(ritagli_in_attesa) >= configurazione.DIMENSIONE_BATCH_EMBEDDING
+
+        if finestra_completa or batch_completo:
+            identifica_ritagli(ritagli_in_attesa, stats, riconoscitore_volti)
+            ritagli_in_attesa = []
+            frame_in_attesa = 0
+
+    # Identifica gli ultimi ritagli rimasti nella finestra
+    if ritagli_in_attesa:
+        identifica_ritagli(ritagli_in_attesa, stats, riconoscitore_volti)
+
+def processa_rilevazioni_parallelo(results, riconoscitore_volti):
+    """
+    Processa i risultati YOLO su una pipeline a stadi con pool di worker.
+
+    Decodifica, YOLO ed estrazione dei ritagli avvengono su un thread
+    produttore; rilevamento volti ed embedding su un pool di
+    NUMERO_WORKER_PIPELINE thread, tra cui vengono divisi i ritagli di ogni
+    frame; matching e aggiornamenti del tracciamento vengono applicati in
+    ordine di frame.
+
+    Args:
+        results: Risultati delle rilevazioni YOLO
+    """
+    def estrai(indice, risultato):
+        stats.incrementa_frame()
+
         if risultato.boxes is None:
-            continue
+            return None
+        return raccogli_ritagli_frame(risultato)
+
+    def identifica(ritagli):
+        return identifica_blocco_ritagli(ritagli, riconoscitore_volti)
+
+    def applica(ritagli, esito, errore):
+        if errore is not None:
+            registra_errore_ritagli(ritagli, stats)
+            return
+
+        estratti, tempo_embedding = esito
+        applica_esiti_ritagli(ritagli, estratti, tempo_embedding, stats, riconoscitore_volti)
+
+    pipeline = PipelineVideo(estrai, identifica, applica,
+                             numero_worker=configurazione.NUMERO_WORKER_PIPELINE,
+                             dimensione_coda=configurazione.DIMENSIONE_CODA_PIPELINE,
+                             dimensione_lavoro=configurazione.DIMENSIONE_BATCH_EMBEDDING)
 
-        altezza_frame, larghezza_frame = risultato.orig_img.shape[:2]
+    # Il campionamento tiene conto del ritardo dei worker
+    if isinstance(results, TracciamentoCampionato):
+        results.misura_coda = lambda: pipeline.profondita_coda
 
-        # Processa ogni rilevazione nel frame
-        for box in risultato.boxes:
-            processa_singola_rilevazione(box, risultato.orig_img, larghezza_frame, altezza_frame, stats, riconoscitore_volti)
+    pipeline.esegui(results)
 
-def processa_singola_rilevazione(box, immagine_frame, larghezza_frame, altezza_frame, stats, riconoscitore_volti):
+def raccogli_ritagli_frame(risultato, ritagli_in_attesa=()):
     """
-    Processa una singola rilevazione di persona.
+    Estrae i ritagli validi di tutte le persone non ancora identificate in un frame.
 
     Args:
-        box: Bounding box della rilevazione
-        immagine_frame: Immagine del frame corrente
-        larghezza_frame, altezza_frame: Dimensioni del frame
-        stats: Oggetto statistiche per il tracciamento
+        risultato: Risultato YOLO del frame
+        ritagli_in_attesa: Ritagli già raccolti nella finestra corrente, usati
+            per non accodare due volte lo stesso ID di tracciamento
+
+    Returns:
+        list: Coppie (id_tracciamento, immagine_ritagliata)
+    """
+    inizio = time.perf_counter_ns()
+    altezza_frame, larghezza_frame = risultato.orig_img.shape[:2]
+    id_in_attesa = {id_tracciamento for id_tracciamento, _ in ritagli_in_attesa if id_tracciamento is not None}
+    ritagli = []
+
+    for box in risultato.boxes:
+        ritaglio = estrai_ritaglio_persona(box, risultato.orig_img, larghezza_frame, altezza_frame)
+        if ritaglio is None:
+            continue
+
+        id_tracciamento = ritaglio[0]
+        if id_tracciamento is not None:
+            # Un ritaglio per traccia e per frame; la traccia viene saltata se ha già un
+            # ritaglio in elaborazione per worker o se quelli in elaborazione esauriscono il budget
+            if id_tracciamento in id_in_attesa or not _accumulatore_tracce.prenota(id_tracciamento):
+                continue
+            id_in_attesa.add(id_tracciamento)
+
+        ritagli.append(ritaglio)
+
+    stats.registra_tempo_stadio('ritaglio', time.perf_counter_ns() - inizio)
+    return ritagli
+
+def estrai_ritaglio_persona(box, immagine_frame, larghezza_frame, altezza_frame):
+    """
+    Estrae il ritaglio di una singola rilevazione di persona, se da identificare.
+
+    Returns:
+        tuple: (id_tracciamento, immagine_ritagliata) o None se la rilevazione va scartata
     """
     id_classe = int(box.cls)
     id_tracciamento = box.id.item() if box.id is not None else None
 
     # Processa solo rilevazioni di persone (classe 0)
     if id_classe != 0:
-        return
+        return None
 
-    # Salta persone già identificate
-    if e_persona_conosciuta(id_tracciamento):
-        return
+    # Salta persone già identificate e tracce che hanno esaurito i tentativi
+    if e_traccia_risolta(id_tracciamento):
+        return None
 
     # Estrae e valida l'immagine ritagliata
     x1, y1, x2, y2 = estrai_coordinate_box(box, larghezza_frame, altezza_frame)
     immagine_ritagliata = immagine_frame[y1:y2, x1:x2]
 
     if not e_ritaglio_valido(immagine_ritagliata):
-        return
+        return None
 
-    # Tenta l'identificazione della persona
-    tentativo_identificazione(immagine_ritagliata, id_tracciamento, stats, riconoscitore_volti)
+    return id_tracciamento, immagine_ritagliata
 
-def tentativo_identificazione(immagine_ritagliata, id_tracciamento, stats, riconoscitore_volti):
+def identifica_ritagli(ritagli, stats, riconoscitore_volti):
     """
-    Esegue il tentativo di identificazione di una persona.
+    Identifica in blocco i ritagli raccolti con una sola inferenza ONNX.
 
     Args:
-        immagine_ritagliata: Immagine della persona ritagliata
-        id_tracciamento: ID di tracciamento della persona
+        ritagli: Lista di coppie (id_tracciamento, immagine_ritagliata)
         stats: Oggetto statistiche
     """
-    file_salvato = False
+    if not ritagli:
+        return
 
     try:
-        # Salva temporaneamente l'immagine
-        cv2.imwrite(configurazione.TEMPIMG, immagine_ritagliata)
-        file_salvato = True
+        estratti, tempo_embedding = identifica_blocco_ritagli(ritagli, riconoscitore_volti)
+    except Exception:
+        registra_errore_ritagli(ritagli, stats)
+        return
 
-        # Esegue l'identificazione
-        nome_identificato, confidenza = identifica_persona(configurazione.TEMPIMG, riconoscitore_volti)
+    applica_esiti_ritagli(ritagli, estratti, tempo_embedding, stats, riconoscitore_volti)
 
-        if nome_identificato != '-1':
-            # Identificazione riuscita
-            stats.aggiungi_successo(confidenza)
-            aggiorna_tracciamento_persona(nome_identificato, id_tracciamento, confidenza)
+def identifica_blocco_ritagli(ritagli, riconoscitore_volti):
+    """
+    Esegue rilevamento volti ed embedding di un blocco di ritagli.
+
+    Returns:
+        tuple: ((embeddings, qualità), tempo medio di estrazione per ritaglio)
+    """
+    start_time = time.perf_counter()
+
+    immagini = [immagine for _, immagine in ritagli]
+    estratti = riconoscitore_volti.estrai_embeddings_con_qualita(immagini)
+
+    # Il tempo del batch viene ripartito equamente tra i ritagli
+    tempo_embedding = (time.perf_counter() - start_time) / len(ritagli)
+    return estratti, tempo_embedding
+
+def applica_esiti_ritagli(ritagli, estratti, tempo_embedding, stats, riconoscitore_volti):
+    """
+    Aggrega gli embeddings per traccia, identifica e registra gli esiti.
+
+    Ogni embedding viene aggiunto alla media pesata della propria traccia e
+    l'identificazione avviene sull'aggregato. Una traccia identificata o con
+    i tentativi esauriti non riceve più ritagli.
+
+    Args:
+        ritagli: Lista di coppie (id_tracciamento, immagine_ritagliata)
+        estratti: Coppia (embeddings, qualità) allineata ai ritagli
+        tempo_embedding: Tempo medio di estrazione per ritaglio
+    """
+    embeddings, qualita = estratti
+    # Con un solo modello ogni volto rilevato produce un embedding
+    volti = sum(embedding is not None for embedding in embeddings)
+    stats.aggiungi_volti_rilevati(volti)
+    stats.aggiungi_embedding_estratti(volti)
+
+    for (id_tracciamento, _), embedding, qualita_volto in zip(ritagli, embeddings, qualita):
+        # Le tracce risolte mentre questo blocco era in elaborazione vengono ignorate
+        if e_traccia_risolta(id_tracciamento):
+            _accumulatore_tracce.rilascia(id_tracciamento)
+            continue
+
+        start_time = time.perf_counter()
+        inizio = time.perf_counter_ns()
+
+        if id_tracciamento is None:
+            aggregato = embedding
         else:
-            # Identificazione fallita
-            stats.aggiungi_fallimento()
+            aggregato = _accumulatore_tracce.aggiungi(id_tracciamento, embedding, qualita_volto)
 
-    except Exception:
+        # Aggregazione e aggiornamento del tracciamento formano una sola fase; il matching è misurato a parte
+        durata_tracciamento = time.perf_counter_ns() - inizio
+
+        if aggregato is None:
+            nome_identificato, confidenza = '-1', 0.0
+        else:
+            nome_identificato, confidenza = riconoscitore_volti.identifica_embeddings(
+                aggregato, configurazione.SOGLIA_CONFIDENZA_DEFAULT)[0]
+
+        inizio = time.perf_counter_ns()
+        if nome_identificato != '-1':
+            matching_time = tempo_embedding + (time.perf_counter() - start_time)
+            stats.aggiungi_tempistiche_matching_volti_all(nome_identificato, matching_time)
+            if id_tracciamento is not None:
+                _accumulatore_tracce.concludi(id_tracciamento)
+
+        registra_esito_identificazione(nome_identificato, confidenza, id_tracciamento, stats)
+        stats.registra_tempo_stadio('aggiornamento_tracciamento', durata_tracciamento + time.perf_counter_ns() - inizio)
+
+def registra_errore_ritagli(ritagli, stats):
+    """Conta come falliti i ritagli di un blocco non elaborato e ne chiude le prenotazioni."""
+    for id_tracciamento, _ in ritagli:
+        stats.aggiungi_fallimento()
+        if id_tracciamento is not None:
+            _accumulatore_tracce.registra_tentativo(id_tracciamento)
+
+def registra_esito_identificazione(nome_identificato, confidenza, id_tracciamento, stats):
+    """Aggiorna statistiche e tracciamento in base all'esito di un'identificazione."""
+    if nome_identificato != '-1':
+        # Identificazione riuscita
+        stats.aggiungi_successo(confidenza)
+        aggiorna_tracciamento_persona(nome_identificato, id_tracciamento, confidenza)
+    else:
+        # Identificazione fallita
         stats.aggiungi_fallimento()
 
-    finally:
-        # Pulizia del file temporaneo
-        if file_salvato and os.path.exists(configurazione.TEMPIMG):
-            os.remove(configurazione.TEMPIMG)
-            
+def inizializza_tutto(percorso_video=None, modello=None):
+    # Ogni analisi parte da statistiche e persone azzerate
+    azzera_stato_analisi()
+    avvia_esportatore_metriche(stats)
 
-def inizializza_tutto():
-    riconoscitore_volti = RiconoscitoreFacciale()
+    # Il modello scelto nell'interfaccia (vedi ConfrontoModelli.percorso_modello), altrimenti AuraFace
+    riconoscitore_volti = crea_riconoscitore(modello) if modello else RiconoscitoreFacciale()
     riconoscitore_volti.carica_volti_noti(configurazione.DIRVOLTI)
 
-    start_time_video = time.time()
-    processa_rilevazioni(creazione_e_tracciamento_video_con_YOLO(), riconoscitore_volti)
-    start_time_video = time.time()
+    start_time_video = time.perf_counter()
+    processa_rilevazioni(creazione_e_tracciamento_video_con_YOLO(percorso_video), riconoscitore_volti)
+    end_time_video = time.perf_counter()
 
-    tempo_analisi_video = start_time_video - start_time_video
+    tempo_analisi_video = end_time_video - start_time_video
 
     stats.set_elaborazione_video(tempo_analisi_video)
 
     return stats.calcola_statistiche()
 
 
+def azzera_stato_analisi():
+    """Riporta statistiche, persone e ID conosciuti allo stato iniziale."""
+    global dizionario
+
+    stats.azzera()
+    dizionario = creazione_dizionario_nome_Persona()
+    _id_conosciuti.clear()
+    _accumulatore_tracce.svuota()
+
 def do_all():
     crea_cartelle_necessarie()
     dowload_immagini()
@@ -274,10 +464,9 @@ def do_all():
     rimuovi_files_cache_e_contenuto_auraface_dir()
     return inizializza_tutto()
             
-dizionario = creazione_dizionario_nome_Persona()
+# Stato dell'analisi in corso, popolato da azzera_stato_analisi all'avvio di ogni analisi
+dizionario = {}
+
+_id_conosciuti = id_conosciuti = set()
 
-_id_conosciuti = id_conosciuti = {
-    dizionario[chiave].id
-    for chiave in dizionario
-    if hasattr(dizionario[chiave], 'id') and dizionario[chiave].id is not None
-}
\ No newline at end of file
+_accumulatore_tracce = AccumulatoreTracce(_id_conosciuti)
\ No newline at end of file
@@ -0,0 +1,182 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.config.configurazione_attuale import configurazione
+from src.utils import utils
+from src.utils.AccumulatoreTracce import AccumulatoreTracce
+
+
+def test_prenotazioni_in_volo_limitate_dai_worker_e_dal_budget():
+    tracce = AccumulatoreTracce(set(), campioni_massimi=3, in_volo_massimi=2)
+
+    assert tracce.prenota(1) and tracce.prenota(1)
+    assert not tracce.prenota(1)
+    assert tracce.prenota(2)
+
+    tracce.aggiungi(1, np.ones(4, dtype=np.float32), 1.0)
+    assert tracce.tentativi(1) == 1
+    # Un tentativo completato e uno in volo: ne resta uno solo nel budget
+    assert tracce.prenota(1)
+    assert not tracce.prenota(1)
+
+    tracce.aggiungi(1, np.ones(4, dtype=np.float32), 1.0)
+    tracce.aggiungi(1, np.ones(4, dtype=np.float32), 1.0)
+    assert tracce.e_conclusa(1) and not tracce.prenota(1)
+
+
+def test_prenotazioni_in_volo_mai_oltre_il_budget():
+    tracce = AccumulatoreTracce(set(), campioni_massimi=2, in_volo_massimi=4)
+    assert [tracce.prenota(1) for _ in range(4)] == [True, True, False, False]
+
+
+def test_il_budget_conta_solo_i_tentativi_completati():
+    tracce = AccumulatoreTracce(set(), campioni_massimi=2)
+
+    assert tracce.prenota(1)
+    tracce.rilascia(1)
+    assert tracce.tentativi(1) == 0
+
+    for _ in range(2):
+        assert tracce.prenota(1)
+        tracce.registra_tentativo(1)
+    assert tracce.e_conclusa(1)
+    assert not tracce.prenota(1)
+
+
+def test_concludi_chiude_la_prenotazione():
+    tracce = AccumulatoreTracce(set(), campioni_massimi=5)
+    assert tracce.prenota(1)
+    tracce.concludi(1)
+
+    assert 1 in tracce
+    assert not tracce.prenota(1)
+
+
+def test_aggregato_pesato_sulla_qualita():
+    tracce = AccumulatoreTracce(set(), campioni_massimi=5)
+    tracce.aggiungi(1, np.array([1, 0], dtype=np.float32), 0.9)
+    aggregato = tracce.aggiungi(1, np.array([0, 1], dtype=np.float32), 0.1)
+
+    assert np.allclose(aggregato, np.array([0.9, 0.1]) / np.hypot(0.9, 0.1))
+    assert tracce.aggiungi(2, None, 0.0) is None
+
+
+def test_viene_dimenticata_la_traccia_usata_meno_di_recente():
+    tracce = AccumulatoreTracce(set(), campioni_massimi=5, tracce_massime=2)
+    tracce.registra_tentativo(1)
+    tracce.registra_tentativo(2)
+    tracce.prenota(1)
+    tracce.registra_tentativo(3)
+
+    assert len(tracce) == 2
+    assert tracce.tentativi(1) == 1
+    assert tracce.tentativi(2) == 0
+
+
+class _Coordinate:
+    def __init__(self, valori):
+        self.valori = np.array(valori, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.valori
+
+
+def frame_con_persone(numero_frame, persone=2):
+    """Frame con le tracce 1..persone, prodotti con il ritmo di un rilevatore reale."""
+    for _ in range(numero_frame):
+        time.sleep(0.005)
+        yield _frame(persone)
+
+
+def _frame(persone):
+    boxes = [SimpleNamespace(cls=np.array(0), id=np.array(float(id_tracciamento)),
+                             xyxy=[_Coordinate([20 + 180 * indice, 20, 100 + 180 * indice, 150])])
+             for indice, id_tracciamento in enumerate(range(1, persone + 1))]
+    return SimpleNamespace(orig_img=np.zeros((180, 180 * persone, 3), dtype=np.uint8), boxes=boxes)
+
+
+class RiconoscitoreSintetico:
+    """Embedding lento (i blocchi restano in volo sui worker) e identificazione fissa."""
+
+    def __init__(self, riconosce=True, errore=False):
+        self.riconosce = riconosce
+        self.errore = errore
+        self.ritagli = 0
+        self.in_corso = 0
+        self.massimo_in_corso = 0
+        self._lock = threading.Lock()
+
+    def estrai_embeddings_con_qualita(self, immagini):
+        with self._lock:
+            self.in_corso += 1
+            self.massimo_in_corso = max(self.massimo_in_corso, self.in_corso)
+        time.sleep(0.01)
+        with self._lock:
+            self.in_corso -= 1
+            self.ritagli += len(immagini)
+        if self.errore:
+            raise RuntimeError('inferenza fallita')
+        return [np.ones(4, dtype=np.float32)] * len(immagini), [1.0] * len(immagini)
+
+    def identifica_embeddings(self, embedding, soglia):
+        return [('Persona', 0.9)] if self.riconosce else [('-1', 0.0)]
+
+
+@pytest.fixture
+def pipeline_parallela(monkeypatch):
+    monkeypatch.setattr(configurazione, 'NUMERO_WORKER_PIPELINE', 4)
+    monkeypatch.setattr(configurazione, 'DIMENSIONE_CODA_PIPELINE', 8)
+    monkeypatch.setattr(utils, 'dizionario', {})
+    monkeypatch.setattr(utils._accumulatore_tracce, 'campioni_massimi', 5)
+    utils.stats.azzera()
+    utils._id_conosciuti.clear()
+    utils._accumulatore_tracce.svuota()
+    yield
+    utils._accumulatore_tracce.svuota()
+
+
+def test_pipeline_parallela_limita_gli_embedding_su_tracce_identificate(pipeline_parallela):
+    riconoscitore = RiconoscitoreSintetico()
+    utils.processa_rilevazioni(frame_con_persone(40), riconoscitore)
+
+    # Identificate al primo tentativo: al più un campione per worker già in volo viene scartato
+    assert 2 <= riconoscitore.ritagli <= 2 * 4
+    assert utils._accumulatore_tracce.e_conclusa(1.0) and utils._accumulatore_tracce.e_conclusa(2.0)
+
+
+def test_pipeline_parallela_rispetta_il_budget_per_traccia(pipeline_parallela):
+    riconoscitore = RiconoscitoreSintetico(riconosce=False)
+    utils.processa_rilevazioni(frame_con_persone(60), riconoscitore)
+
+    assert riconoscitore.ritagli == 2 * 5
+    assert utils._accumulatore_tracce.e_conclusa(1.0) and utils._accumulatore_tracce.e_conclusa(2.0)
+
+
+def test_gli_errori_dei_worker_consumano_il_budget(pipeline_parallela):
+    riconoscitore = RiconoscitoreSintetico(errore=True)
+    utils.processa_rilevazioni(frame_con_persone(60), riconoscitore)
+
+    assert riconoscitore.ritagli == 2 * 5
+
+
+def test_tracce_indipendenti_elaborate_su_worker_diversi(pipeline_parallela):
+    riconoscitore = RiconoscitoreSintetico(riconosce=False)
+    utils.processa_rilevazioni(frame_con_persone(60, persone=4), riconoscitore)
+
+    assert riconoscitore.ritagli == 4 * 5
+    assert riconoscitore.massimo_in_corso >= 3
+
+
+def test_campioni_della_stessa_traccia_elaborati_in_parallelo(pipeline_parallela):
+    riconoscitore = RiconoscitoreSintetico(riconosce=False)
+    utils.processa_rilevazioni(frame_con_persone(60, persone=1), riconoscitore)
+
+    assert riconoscitore.ritagli == 5
+    assert riconoscitore.massimo_in_corso >= 2
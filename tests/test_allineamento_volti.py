@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+
+from src.utils.allineamento_volti import TEMPLATE_ARCFACE, allinea_volti, stima_trasformazioni_similitudine
+
+
+def applica(matrice, punti):
+    return punti @ matrice[:, :2].T + matrice[:, 2]
+
+
+def similitudine(angolo, scala, traslazione):
+    coseno, seno = np.cos(angolo), np.sin(angolo)
+    return np.array([[scala * coseno, -scala * seno, traslazione[0]],
+                     [scala * seno, scala * coseno, traslazione[1]]])
+
+
+def test_inverte_una_similitudine_nota():
+    template = TEMPLATE_ARCFACE.astype(np.float64)
+    trasformazioni = [similitudine(0.3, 2.5, (40, -10)), similitudine(-1.2, 0.7, (5, 80)), similitudine(0, 1, (0, 0))]
+    # Landmark ottenuti deformando il template: l'allineamento deve riportarli esattamente sul template
+    punti = np.stack([applica(trasformazione, template) for trasformazione in trasformazioni])
+
+    matrici = stima_trasformazioni_similitudine(punti)
+
+    assert matrici.shape == (3, 2, 3)
+    for matrice, punti_volto in zip(matrici, punti):
+        np.testing.assert_allclose(applica(matrice, punti_volto), template, atol=1e-3)
+
+
+def test_nessuna_riflessione():
+    # Landmark specchiati orizzontalmente: la soluzione resta una rotazione (determinante positivo)
+    punti = TEMPLATE_ARCFACE.astype(np.float64).copy()
+    punti[:, 0] = 112 - punti[:, 0]
+
+    matrice = stima_trasformazioni_similitudine(punti[None])[0]
+
+    assert np.linalg.det(matrice[:, :2]) > 0
+
+
+def test_coincide_con_opencv_su_landmark_rumorosi():
+    rng = np.random.default_rng(0)
+    punti = applica(similitudine(0.5, 1.8, (30, 20)), TEMPLATE_ARCFACE.astype(np.float64))
+    punti += rng.normal(0, 1.5, punti.shape)
+
+    matrice = stima_trasformazioni_similitudine(punti[None])[0]
+    attesa, _ = cv2.estimateAffinePartial2D(punti.astype(np.float32), TEMPLATE_ARCFACE, method=cv2.LMEDS)
+
+    # Minimi quadrati (Umeyama) e LMEDS sui soli 5 punti differiscono poco
+    np.testing.assert_allclose(applica(matrice, punti), applica(attesa, punti), atol=2.0)
+
+
+def test_volti_allineati_alla_dimensione_richiesta():
+    immagine = np.zeros((200, 200, 3), dtype=np.uint8)
+    punti = applica(similitudine(0.2, 1.5, (20, 10)), TEMPLATE_ARCFACE.astype(np.float64))
+    for x, y in punti:
+        cv2.circle(immagine, (int(round(x)), int(round(y))), 3, (255, 255, 255), -1)
+
+    volto = allinea_volti([immagine], punti[None], (112, 112))[0]
+
+    assert volto.shape == (112, 112, 3)
+    for x, y in TEMPLATE_ARCFACE:
+        assert volto[int(round(y)), int(round(x))].max() > 0
+    assert allinea_volti([], np.empty((0, 5, 2))) == []
@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+
+from src.utils.CacheEmbeddings import CacheEmbeddings
+
+
+def crea_file(percorso, contenuto):
+    with open(percorso, 'wb') as f:
+        f.write(contenuto)
+    return str(percorso)
+
+
+def test_gli_embeddings_sopravvivono_alla_riapertura(tmp_path):
+    modello = crea_file(tmp_path / 'modello.onnx', b'modello')
+    cache = CacheEmbeddings(modello, 'v1', directory=str(tmp_path / 'cache'))
+    embeddings = np.random.default_rng(0).standard_normal((3, 8)).astype(np.float32)
+    for indice, embedding in enumerate(embeddings):
+        cache.aggiungi(f'h{indice}', embedding)
+    cache.aggiungi('senza_volto', None)
+
+    riaperta = CacheEmbeddings(modello, 'v1', directory=str(tmp_path / 'cache'))
+    assert len(riaperta) == 4
+    assert not riaperta.contiene_volto('senza_volto')
+    assert np.array_equal(riaperta.leggi(['h2', 'h0']), embeddings[[2, 0]])
+
+
+def test_riga_parziale_in_coda_viene_ignorata(tmp_path):
+    modello = crea_file(tmp_path / 'modello.onnx', b'modello')
+    cache = CacheEmbeddings(modello, 'v1', directory=str(tmp_path / 'cache'))
+    embeddings = np.arange(24, dtype=np.float32).reshape(3, 8)
+    for indice, embedding in enumerate(embeddings):
+        cache.aggiungi(f'h{indice}', embedding)
+
+    # Scrittura interrotta: dell'ultima riga restano 10 dei 32 byte
+    with open(cache.file_embeddings, 'r+b') as f:
+        f.truncate(2 * 8 * 4 + 10)
+
+    riaperta = CacheEmbeddings(modello, 'v1', directory=str(tmp_path / 'cache'))
+    assert 'h2' not in riaperta
+    assert np.array_equal(riaperta.leggi(['h0', 'h1']), embeddings[:2])
+
+    # La riga parziale viene sovrascritta dalla prossima aggiunta
+    riaperta.aggiungi('h3', embeddings[2] + 100)
+    assert os.path.getsize(riaperta.file_embeddings) == 3 * 8 * 4
+    assert np.array_equal(riaperta.leggi(['h3']), embeddings[[2]] + 100)
+
+
+def test_cambiare_modello_o_preprocessing_usa_una_cache_separata(tmp_path):
+    directory = str(tmp_path / 'cache')
+    modello = crea_file(tmp_path / 'modello.onnx', b'modello')
+    CacheEmbeddings(modello, 'v1', directory=directory).aggiungi('h', np.ones(4, dtype=np.float32))
+
+    assert 'h' not in CacheEmbeddings(modello, 'v2', directory=directory)
+    crea_file(tmp_path / 'modello.onnx', b'modello riaddestrato')
+    assert 'h' not in CacheEmbeddings(modello, 'v1', directory=directory)
+
+
+def test_impronta_ricalcolata_solo_se_il_file_cambia(tmp_path):
+    modello = crea_file(tmp_path / 'modello.onnx', b'modello')
+    immagine = crea_file(tmp_path / 'volto.jpg', b'prima')
+    cache = CacheEmbeddings(modello, 'v1', directory=str(tmp_path / 'cache'))
+
+    impronta = cache.impronta_file(immagine)
+    assert CacheEmbeddings(modello, 'v1', directory=str(tmp_path / 'cache')).impronta_file(immagine) == impronta
+
+    info = os.stat(immagine)
+    crea_file(immagine, b'dopo!')
+    os.utime(immagine, ns=(info.st_atime_ns, info.st_mtime_ns + 1_000_000))
+    assert CacheEmbeddings(modello, 'v1', directory=str(tmp_path / 'cache')).impronta_file(immagine) != impronta
+
+
+def test_impronte_compattate_quando_le_voci_superate_prevalgono(tmp_path):
+    modello = crea_file(tmp_path / 'modello.onnx', b'modello')
+    immagini = [crea_file(tmp_path / f'volto_{indice}.jpg', b'volto %d' % indice) for indice in range(3)]
+    cache = CacheEmbeddings(modello, 'v1', directory=str(tmp_path / 'cache'))
+
+    def righe():
+        with open(cache.file_impronte, encoding='utf-8') as f:
+            return len(f.readlines())
+
+    for versione in range(20):
+        for immagine in immagini:
+            info = os.stat(immagine)
+            crea_file(immagine, b'versione %d' % versione)
+            os.utime(immagine, ns=(info.st_atime_ns, info.st_mtime_ns + 1_000_000))
+            cache.impronta_file(immagine)
+        # Modello e 3 immagini: mai più del doppio delle voci valide (più quella appena aggiunta)
+        assert righe() <= 2 * 4 + 1
+
+    os.remove(immagini[0])
+    riaperta = CacheEmbeddings(modello, 'v1', directory=str(tmp_path / 'cache'))
+    riaperta._compatta_impronte()
+    assert righe() == 3
+    assert riaperta.impronta_file(immagini[1]) == cache.impronta_file(immagini[1])
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.utils.CampionatoreAdattivo import CampionatoreAdattivo, CampionatoreFisso
+from src.utils.SorgentiFrame import SorgenteFrame
+from src.utils.TracciamentoCampionato import TracciamentoCampionato
+
+PASSO_MASSIMO = 30
+
+
+class SorgenteSintetica(SorgenteFrame):
+    """Frame identici (scena ferma) o con rumore (scena in movimento)."""
+
+    tipo = 'sintetica'
+
+    def __init__(self, numero_frame, movimento=False):
+        super().__init__('sintetica')
+        self.numero_frame = numero_frame
+        self.movimento = movimento
+        self.indice = -1
+        self.rng = np.random.default_rng(0)
+
+    def avanza(self):
+        self.indice += 1
+        return self.indice < self.numero_frame
+
+    def frame(self):
+        if self.movimento:
+            # Differenza media tra frame sopra la soglia di movimento, sotto quella di cambio scena
+            return np.full((72, 128, 3), 100 + 10 * (self.indice % 2), dtype=np.uint8)
+        return np.full((72, 128, 3), 100, dtype=np.uint8)
+
+
+class ModelloSintetico:
+    """Finto YOLO: la traccia 1 è sempre visibile, la traccia 2 entra al frame `ingresso`."""
+
+    def __init__(self, sorgente, ingresso):
+        self.sorgente = sorgente
+        self.ingresso = ingresso
+        self.frame_elaborati = []
+
+    def track(self, frame, **parametri):
+        indice = self.sorgente.indice
+        self.frame_elaborati.append(indice)
+        id_visibili = [1] + ([2] if indice >= self.ingresso else [])
+        boxes = [SimpleNamespace(id=np.array(float(id_tracciamento)), cls=np.array(0))
+                 for id_tracciamento in id_visibili]
+        return [SimpleNamespace(boxes=boxes, indice=indice)]
+
+
+def traccia(numero_frame, ingresso, movimento=False):
+    sorgente = SorgenteSintetica(numero_frame, movimento)
+    modello = ModelloSintetico(sorgente, ingresso)
+    campionatore = CampionatoreAdattivo(passo_base=5, passo_minimo=1, passo_massimo=PASSO_MASSIMO,
+                                        soglia_movimento=2.0, soglia_cambio_scena=40.0, coda_massima=4)
+    tracciamento = TracciamentoCampionato(modello, sorgente, campionatore, id_conosciuti={1.0})
+    return [risultato for risultato in tracciamento], modello
+
+
+def prima_rilevazione(risultati, id_tracciamento):
+    return next(r.indice for r in risultati if any(box.id.item() == id_tracciamento for box in r.boxes))
+
+
+def test_nuova_persona_in_scena_ferma_con_tracce_note_viene_rilevata():
+    risultati, modello = traccia(200, ingresso=50)
+
+    assert prima_rilevazione(risultati, 2.0) - 50 < PASSO_MASSIMO
+    # Finché sono visibili solo tracce note, YOLO gira al più ogni passo massimo
+    assert all(b - a <= PASSO_MASSIMO for a, b in zip(modello.frame_elaborati, modello.frame_elaborati[1:]))
+    assert len(modello.frame_elaborati) < 200 // 2
+
+
+def test_con_movimento_le_tracce_note_sono_ricontrollate_al_passo_base():
+    risultati, _ = traccia(200, ingresso=50, movimento=True)
+
+    assert prima_rilevazione(risultati, 2.0) - 50 < 5
+
+
+def test_campionatore_fisso_ignora_le_tracce():
+    campionatore = CampionatoreFisso(passo=3)
+    assert [campionatore.deve_processare(indice, id_attivi=[1.0], id_conosciuti={1.0}) for indice in range(6)] == \
+        [True, False, False, True, False, False]
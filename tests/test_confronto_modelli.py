@@ -0,0 +1,71 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from src.config.configurazione_attuale import configurazione
+from src.utils import ConfrontoModelli
+from src.utils.AccumulatoreTracce import AccumulatoreTracce
+from src.utils.RiconoscitoreFacciale import RiconoscitoreFacciale
+from src.utils.StatisticheRiconoscimento import StatisticheRiconoscimento
+
+MODELLO_MINIMO = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'modelli', 'volto_minimo.onnx')
+
+
+@pytest.fixture
+def cartella_custom(monkeypatch, tmp_path):
+    monkeypatch.setattr(configurazione, 'MODELLO_CUSTOM_DIR', str(tmp_path / 'modello'))
+    monkeypatch.setattr(configurazione, 'DIR_CACHE_EMBEDDINGS', str(tmp_path / 'cache'))
+    monkeypatch.setattr(configurazione, 'RILEVATORE_VOLTI', 'haar')
+
+    def auraface_vietato(riconoscitore):
+        raise AssertionError("Il confronto non deve ripiegare su AuraFace")
+
+    monkeypatch.setattr(RiconoscitoreFacciale, '_carica_auraface_onnx', auraface_vietato)
+    os.makedirs(configurazione.MODELLO_CUSTOM_DIR)
+    return configurazione.MODELLO_CUSTOM_DIR
+
+
+def test_modello_custom_non_valido_non_ripiega_su_auraface(cartella_custom):
+    with open(os.path.join(cartella_custom, 'rotto.onnx'), 'wb') as f:
+        f.write(b'non un modello onnx')
+
+    with pytest.raises(Exception, match="Impossibile caricare il modello 'Custom \\(ONNX\\)'"):
+        ConfrontoModelli.crea_riconoscitore('Custom (ONNX)')
+
+
+def test_cartella_custom_vuota(cartella_custom):
+    with pytest.raises(Exception, match='Nessun modello ONNX custom'):
+        ConfrontoModelli.crea_riconoscitore('Custom (ONNX)')
+
+
+def test_modello_custom_valido(cartella_custom):
+    percorso = shutil.copy(MODELLO_MINIMO, os.path.join(cartella_custom, 'volto_minimo.onnx'))
+
+    riconoscitore = ConfrontoModelli.crea_riconoscitore('Custom (ONNX)')
+    assert riconoscitore.percorso_onnx == percorso
+    assert riconoscitore.modello_attivo == 'volto_minimo'
+
+
+def test_volti_rilevati_una_volta_e_contati_a_parte(cartella_custom, monkeypatch):
+    shutil.copy(MODELLO_MINIMO, os.path.join(cartella_custom, 'volto_minimo.onnx'))
+    riconoscitori = {nome: ConfrontoModelli.crea_riconoscitore('Custom (ONNX)') for nome in ('primo', 'secondo')}
+    # Ogni ritaglio contiene un volto che occupa l'intera immagine
+    monkeypatch.setattr(RiconoscitoreFacciale, '_estrai_roi_volto',
+                        lambda riconoscitore, immagine: (immagine, None, 1.0))
+
+    condivise = StatisticheRiconoscimento()
+    confronto = ConfrontoModelli.ConfrontoModelli(riconoscitori, condivise, AccumulatoreTracce(set()))
+    immagine = np.random.default_rng(0).integers(0, 255, (112, 112, 3), dtype=np.uint8)
+    confronto._confronta_ritagli([(1, immagine), (2, immagine), (None, immagine)])
+
+    assert confronto.volti == condivise.volti_rilevati == 3
+    # Gli embedding sono contati solo dai modelli che li hanno calcolati
+    assert condivise.embedding_estratti == 0
+    assert condivise.tempi_stadi['rilevamento_volti'].conteggio == 1
+    for modello in confronto.modelli:
+        assert modello.stats.embedding_estratti == 3
+        assert modello.stats.tempi_stadi['rilevamento_volti'].conteggio == 0
+        assert modello.stats.tempi_stadi['inferenza_onnx'].conteggio == 1
+        assert modello.riconoscitore.stats is modello.stats
@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.config.configurazione_attuale import configurazione
+from src.utils import elaborazione_segmenti
+from src.utils.StatisticheRiconoscimento import StatisticheRiconoscimento
+
+
+def test_calcola_segmenti_copre_tutta_la_durata():
+    assert elaborazione_segmenti.calcola_segmenti(25, 10) == [(0, 10), (10, 10), (20, 5)]
+    assert elaborazione_segmenti.calcola_segmenti(0, 10) == [(0, 0)]
+
+
+@pytest.fixture
+def analisi_senza_processi(monkeypatch, tmp_path):
+    """Sostituisce ffmpeg e il pool di processi: i segmenti girano in thread e annotano i percorsi."""
+    monkeypatch.setattr(configurazione, 'DIR_SEGMENTI', str(tmp_path / 'segmenti'))
+    monkeypatch.setattr(elaborazione_segmenti.utils, 'durata_video', lambda percorso: 30)
+    monkeypatch.setattr(elaborazione_segmenti, 'avvia_esportatore_metriche', lambda statistiche: None)
+    monkeypatch.setattr(elaborazione_segmenti, 'ProcessPoolExecutor',
+                        lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+
+    percorsi = []
+
+    def elabora_segmento(indice, percorso_video, secondo_inizio, durata, cartella_segmenti, modello=None):
+        percorso = os.path.join(cartella_segmenti, f'segmento_{indice:05d}.mp4')
+        open(percorso, 'wb').close()
+        percorsi.append(percorso)
+        return {'indice': indice, 'stats': StatisticheRiconoscimento(), 'persone': {}}
+
+    monkeypatch.setattr(elaborazione_segmenti, 'elabora_segmento', elabora_segmento)
+    return percorsi
+
+
+def test_ogni_analisi_usa_una_cartella_propria_rimossa_alla_fine(analisi_senza_processi):
+    elaborazione_segmenti.inizializza_tutto_segmentato('video.mp4', durata_segmento=10, numero_processi=2)
+    prima = set(map(os.path.dirname, analisi_senza_processi))
+    analisi_senza_processi.clear()
+    elaborazione_segmenti.inizializza_tutto_segmentato('video.mp4', durata_segmento=10, numero_processi=2)
+    seconda = set(map(os.path.dirname, analisi_senza_processi))
+
+    assert len(prima) == len(seconda) == 1
+    assert prima != seconda
+    assert os.listdir(configurazione.DIR_SEGMENTI) == []
+
+
+def test_la_cartella_viene_rimossa_anche_se_un_segmento_fallisce(analisi_senza_processi, monkeypatch):
+    def segmento_fallito(indice, percorso_video, secondo_inizio, durata, cartella_segmenti, modello=None):
+        open(os.path.join(cartella_segmenti, 'parziale.mp4'), 'wb').close()
+        raise RuntimeError('ffmpeg interrotto')
+
+    monkeypatch.setattr(elaborazione_segmenti, 'elabora_segmento', segmento_fallito)
+    with pytest.raises(RuntimeError):
+        elaborazione_segmenti.inizializza_tutto_segmentato('video.mp4', durata_segmento=10, numero_processi=2)
+    assert os.listdir(configurazione.DIR_SEGMENTI) == []
+
+
+def test_il_modello_scelto_arriva_a_ogni_segmento(analisi_senza_processi, monkeypatch):
+    modelli = []
+
+    def elabora_segmento(indice, percorso_video, secondo_inizio, durata, cartella_segmenti, modello=None):
+        modelli.append(modello)
+        return {'indice': indice, 'stats': StatisticheRiconoscimento(), 'persone': {}}
+
+    monkeypatch.setattr(elaborazione_segmenti, 'elabora_segmento', elabora_segmento)
+    elaborazione_segmenti.inizializza_tutto_segmentato('video.mp4', durata_segmento=10, numero_processi=2,
+                                                       modello='Buffalo_l')
+    assert modelli == ['Buffalo_l'] * 3
@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+
+from src.utils.GalleriaEmbeddings import GalleriaEmbeddings, normalizza_righe
+
+
+def embeddings_casuali(numero, dimensione=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((numero, dimensione)).astype(np.float32)
+
+
+def test_righe_normalizzate_e_capacita_crescente():
+    galleria = GalleriaEmbeddings(capacita_iniziale=2)
+    embeddings = embeddings_casuali(5)
+    for indice, embedding in enumerate(embeddings):
+        galleria.aggiungi(embedding * 3, f'persona_{indice}')
+
+    assert len(galleria) == 5
+    assert galleria.matrice.dtype == np.float32
+    assert galleria.matrice.flags['C_CONTIGUOUS']
+    np.testing.assert_allclose(np.linalg.norm(galleria.matrice, axis=1), 1.0, rtol=1e-6)
+    np.testing.assert_allclose(galleria.matrice, normalizza_righe(embeddings), rtol=1e-5)
+    assert galleria.nomi == [f'persona_{indice}' for indice in range(5)]
+
+
+def test_cerca_coincide_con_la_ricerca_esaustiva():
+    galleria = GalleriaEmbeddings()
+    embeddings = embeddings_casuali(50)
+    galleria.aggiungi_molti(embeddings, [str(indice) for indice in range(50)])
+
+    query = embeddings_casuali(8, seed=1)
+    indici, similarita = galleria.cerca(query)
+
+    attese = normalizza_righe(query) @ normalizza_righe(embeddings).T
+    np.testing.assert_array_equal(indici, attese.argmax(axis=1))
+    np.testing.assert_allclose(similarita, attese.max(axis=1), rtol=1e-5)
+
+
+def test_dimensione_diversa_rifiutata():
+    galleria = GalleriaEmbeddings()
+    galleria.aggiungi(embeddings_casuali(1)[0], 'a')
+    with pytest.raises(ValueError):
+        galleria.aggiungi(np.ones(8, dtype=np.float32), 'b')
+
+
+def test_matrice_mappata_copiata_alla_prima_aggiunta():
+    mappata = normalizza_righe(embeddings_casuali(3))
+    mappata.flags.writeable = False
+
+    galleria = GalleriaEmbeddings()
+    galleria.imposta_mappata(mappata, ['a', 'b', 'c'])
+    assert galleria.matrice.base is mappata or galleria.matrice is mappata
+
+    galleria.aggiungi(embeddings_casuali(1, seed=2)[0], 'd')
+    assert len(galleria) == 4
+    assert galleria.nomi == ['a', 'b', 'c', 'd']
+    np.testing.assert_array_equal(galleria.matrice[:3], mappata)
+
+
+def test_immagine_di_una_persona_nota_inserita_nel_suo_blocco():
+    embeddings = embeddings_casuali(6)
+    galleria = GalleriaEmbeddings()
+    galleria.aggiungi_molti(embeddings[:4], ['a', 'a', 'b', 'c'])
+    assert galleria._struttura_identita()['ordine'] is None
+
+    assert galleria.aggiungi(embeddings[4], 'a') == 2
+    assert galleria.aggiungi(embeddings[5], 'c') == 5
+    assert galleria.nomi == ['a', 'a', 'a', 'b', 'c', 'c']
+    np.testing.assert_allclose(galleria.matrice, normalizza_righe(embeddings[[0, 1, 4, 2, 3, 5]]), rtol=1e-6)
+    # Blocchi ancora contigui: nessun riordino delle similarità a ogni ricerca
+    assert galleria._struttura_identita()['ordine'] is None
+
+    query = embeddings_casuali(10, seed=5)
+    trovati, punteggi = galleria.cerca_identita(query, modalita='topk', k=2)
+    attesi = punteggi_esaustivi(query, embeddings, ['a', 'a', 'b', 'c', 'a', 'c'], 'topk', 2)
+    matrice_attesa = np.stack([attesi[nome] for nome in ('a', 'b', 'c')], axis=1)
+    assert trovati == [('a', 'b', 'c')[indice] for indice in matrice_attesa.argmax(axis=1)]
+    np.testing.assert_allclose(punteggi, matrice_attesa.max(axis=1), rtol=1e-5, atol=1e-6)
+
+
+def test_inserimento_in_una_matrice_mappata():
+    mappata = normalizza_righe(embeddings_casuali(3))
+    mappata.flags.writeable = False
+
+    galleria = GalleriaEmbeddings()
+    galleria.imposta_mappata(mappata, ['a', 'b', 'c'])
+    nuovo = embeddings_casuali(1, seed=2)
+
+    assert galleria.aggiungi(nuovo[0], 'a') == 1
+    assert galleria.nomi == ['a', 'a', 'b', 'c']
+    np.testing.assert_array_equal(galleria.matrice[[0, 2, 3]], mappata)
+    np.testing.assert_allclose(galleria.matrice[1], normalizza_righe(nuovo)[0], rtol=1e-6)
+
+
+def punteggi_esaustivi(query, embeddings, nomi, modalita, k):
+    """Punteggio di ogni identità calcolato identità per identità."""
+    query = normalizza_righe(query)
+    embeddings = normalizza_righe(embeddings)
+    punteggi = {}
+    for nome in sorted(set(nomi)):
+        blocco = embeddings[[indice for indice, altro in enumerate(nomi) if altro == nome]]
+        if modalita == 'max':
+            punteggi[nome] = (query @ blocco.T).max(axis=1)
+        elif modalita == 'centroide':
+            punteggi[nome] = query @ normalizza_righe(blocco.mean(axis=0, keepdims=True))[0]
+        else:
+            similarita = np.sort(query @ blocco.T, axis=1)[:, ::-1]
+            punteggi[nome] = similarita[:, :k].mean(axis=1)
+    return punteggi
+
+
+@pytest.mark.parametrize('modalita,k', [('max', 3), ('centroide', 3), ('centroide', 1), ('topk', 1), ('topk', 3)])
+def test_cerca_identita_coincide_con_il_calcolo_per_identita(modalita, k):
+    rng = np.random.default_rng(2)
+    # Identità di dimensioni molto diverse, con righe mescolate
+    nomi = [nome for nome, numero in (('anna', 1), ('bruno', 2), ('carla', 40), ('dario', 5)) for _ in range(numero)]
+    nomi = list(rng.permutation(nomi))
+    embeddings = embeddings_casuali(len(nomi), seed=3)
+    galleria = GalleriaEmbeddings()
+    galleria.aggiungi_molti(embeddings, nomi)
+
+    query = embeddings_casuali(20, seed=4)
+    trovati, punteggi = galleria.cerca_identita(query, modalita=modalita, k=k)
+
+    attesi = punteggi_esaustivi(query, embeddings, nomi, modalita, k)
+    nomi_identita = sorted(attesi)
+    matrice_attesa = np.stack([attesi[nome] for nome in nomi_identita], axis=1)
+    assert trovati == [nomi_identita[indice] for indice in matrice_attesa.argmax(axis=1)]
+    np.testing.assert_allclose(punteggi, matrice_attesa.max(axis=1), rtol=1e-5, atol=1e-6)
+
+
+def test_centroide_con_k_1_non_usa_la_massima():
+    galleria = GalleriaEmbeddings()
+    # La query coincide con un'immagine di 'b', ma il centroide di 'a' è più vicino
+    galleria.aggiungi_molti(np.array([[1, 0.2], [1, -0.2], [0, 1], [-1, -0.5]], dtype=np.float32),
+                            ['a', 'a', 'b', 'b'])
+    query = np.array([0.6, 0.8], dtype=np.float32)
+
+    assert galleria.cerca_identita(query, modalita='max', k=1)[0] == ['b']
+    assert galleria.cerca_identita(query, modalita='centroide', k=1)[0] == ['a']
+
+
+def test_modalita_sconosciuta_rifiutata():
+    galleria = GalleriaEmbeddings()
+    galleria.aggiungi(embeddings_casuali(1)[0], 'a')
+    with pytest.raises(ValueError):
+        galleria.cerca_identita(embeddings_casuali(1)[0], modalita='media')
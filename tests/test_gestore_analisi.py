@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils import utils
+from src.utils.GestoreAnalisi import COMPLETATA, GestoreAnalisi
+
+
+class _RiconoscitoreFinto:
+    def carica_volti_noti(self, cartella):
+        pass
+
+
+def test_il_modello_scelto_arriva_all_analisi(monkeypatch):
+    """Il job riceve il modello scelto nell'interfaccia invece di usare sempre AuraFace."""
+    chiamate = []
+
+    def inizializza_tutto(percorso_video=None, modello=None):
+        chiamate.append((percorso_video, modello))
+        return {}
+
+    monkeypatch.setattr(utils, 'inizializza_tutto', inizializza_tutto)
+
+    # Un pool di thread al posto dei processi: il job vede la funzione sostituita
+    gestore = GestoreAnalisi(numero_processi=1)
+    gestore._pool = ThreadPoolExecutor(1)
+    try:
+        id_analisi = gestore.avvia('video.mp4', modello='Custom (ONNX)')
+        gestore._job[id_analisi]['futuro'].result(timeout=10)
+
+        assert gestore.stato(id_analisi)['stato'] == COMPLETATA
+        assert gestore.stato(id_analisi)['parametri']['modello'] == 'Custom (ONNX)'
+        assert chiamate == [('video.mp4', 'Custom (ONNX)')]
+    finally:
+        gestore.chiudi()
+
+
+def test_modello_scelto_caricato_senza_ripiego(monkeypatch):
+    creati = []
+    monkeypatch.setattr(utils, 'crea_riconoscitore', lambda nome: creati.append(nome) or _RiconoscitoreFinto())
+    monkeypatch.setattr(utils, 'RiconoscitoreFacciale', lambda: creati.append('predefinito') or _RiconoscitoreFinto())
+    monkeypatch.setattr(utils, 'avvia_esportatore_metriche', lambda statistiche: None)
+    monkeypatch.setattr(utils, 'creazione_dizionario_nome_Persona', dict)
+    monkeypatch.setattr(utils, 'creazione_e_tracciamento_video_con_YOLO', lambda percorso_video: [])
+    monkeypatch.setattr(utils, 'processa_rilevazioni', lambda risultati, riconoscitore: None)
+
+    utils.inizializza_tutto('video.mp4', 'Buffalo_l')
+    utils.inizializza_tutto('video.mp4')
+    assert creati == ['Buffalo_l', 'predefinito']
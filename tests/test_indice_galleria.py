@@ -0,0 +1,93 @@
+import numpy as np
+
+from src.utils.GalleriaEmbeddings import GalleriaEmbeddings, normalizza_righe
+from src.utils.IndiceGalleria import IndiceFlat, IndiceIVF, crea_indice
+
+
+def galleria_a_cluster(numero_volti=4000, dimensione=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centri = normalizza_righe(rng.standard_normal((40, dimensione)).astype(np.float32))
+    rumore = rng.standard_normal((numero_volti, dimensione)).astype(np.float32) * 0.2
+    galleria = GalleriaEmbeddings()
+    galleria.aggiungi_molti(centri[rng.integers(0, 40, numero_volti)] + rumore,
+                            [str(indice) for indice in range(numero_volti)])
+    return galleria
+
+
+def query_vicine(galleria, numero_query=200, seed=1):
+    rng = np.random.default_rng(seed)
+    indici = rng.choice(len(galleria), numero_query, replace=False)
+    rumore = rng.standard_normal((numero_query, galleria.dimensione)).astype(np.float32) * 0.05
+    return galleria.matrice[indici] + rumore
+
+
+def test_ivf_sotto_la_soglia_resta_esatto():
+    galleria = galleria_a_cluster(500)
+    indice = IndiceIVF(galleria, minimo_addestramento=1000)
+    indice.ricostruisci()
+
+    query = query_vicine(galleria, 50)
+    assert not indice.addestrato
+    np.testing.assert_array_equal(indice.cerca(query)[0], IndiceFlat(galleria).cerca(query)[0])
+
+
+def test_recall_ivf_rispetto_alla_ricerca_esaustiva():
+    galleria = galleria_a_cluster()
+    query = query_vicine(galleria)
+    esatti, _ = IndiceFlat(galleria).cerca(query)
+
+    indice = IndiceIVF(galleria, nprobe=8, minimo_addestramento=0)
+    indice.ricostruisci()
+    trovati, similarita = indice.cerca(query)
+
+    assert np.mean(trovati == esatti) >= 0.95
+    # Le similarità restituite sono quelle reali delle righe trovate
+    np.testing.assert_allclose(similarita, np.sum(galleria.matrice[trovati] * normalizza_righe(query), axis=1),
+                               rtol=1e-5)
+
+
+def test_ivf_con_tutte_le_liste_coincide_con_flat():
+    galleria = galleria_a_cluster(2000)
+    indice = IndiceIVF(galleria, numero_liste=16, nprobe=16, minimo_addestramento=0)
+    indice.ricostruisci()
+
+    query = query_vicine(galleria, 100)
+    np.testing.assert_array_equal(indice.cerca(query)[0], IndiceFlat(galleria).cerca(query)[0])
+
+
+def test_ivf_dopo_un_inserimento_in_mezzo_alla_galleria():
+    galleria = galleria_a_cluster(2000)
+    indice = IndiceIVF(galleria, numero_liste=16, nprobe=16, minimo_addestramento=0)
+    indice.ricostruisci()
+
+    # Una nuova immagine della persona '10' sposta in basso tutte le righe successive
+    riga = galleria.aggiungi(galleria.matrice[10] * 0.9 + galleria.matrice[11] * 0.1, '10')
+    assert riga == 11
+    indice.aggiungi(riga)
+
+    query = query_vicine(galleria, 100)
+    np.testing.assert_array_equal(indice.cerca(query)[0], IndiceFlat(galleria).cerca(query)[0])
+    assert sorted(riga for lista in indice._liste for riga in lista) == list(range(len(galleria)))
+
+
+def test_salvataggio_e_caricamento(tmp_path):
+    galleria = galleria_a_cluster(2000)
+    indice = crea_indice('ivf', galleria, numero_liste=16, nprobe=2, minimo_addestramento=0)
+    indice.ricostruisci()
+    percorso = str(tmp_path / 'indice.npz')
+    indice.salva(percorso)
+
+    caricato = crea_indice('ivf', galleria, numero_liste=16, nprobe=2, minimo_addestramento=0)
+    assert caricato.carica(percorso)
+
+    query = query_vicine(galleria, 100)
+    np.testing.assert_array_equal(caricato.cerca(query)[0], indice.cerca(query)[0])
+
+
+def test_indice_salvato_per_un_altra_galleria_scartato(tmp_path):
+    indice = IndiceIVF(galleria_a_cluster(2000), numero_liste=16, minimo_addestramento=0)
+    indice.ricostruisci()
+    percorso = str(tmp_path / 'indice.npz')
+    indice.salva(percorso)
+
+    assert not IndiceIVF(galleria_a_cluster(1500), minimo_addestramento=0).carica(percorso)
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+
+from src.utils.istantanea_galleria import leggi_istantanea, scrivi_istantanea, stato_cartella
+
+
+def crea_volti(cartella):
+    (cartella / 'Mario').mkdir(parents=True)
+    (cartella / 'Mario' / 'fronte.jpg').write_bytes(b'fronte')
+    (cartella / 'Mario' / 'profilo.jpg').write_bytes(b'profilo')
+    (cartella / 'Anna.jpg').write_bytes(b'anna')
+    return str(cartella)
+
+
+def salva(tmp_path, cartella):
+    matrice = np.eye(3, 4, dtype=np.float32)
+    scrivi_istantanea(str(tmp_path / 'cache'), cartella, stato_cartella(cartella),
+                      matrice, ['Anna', 'Mario', 'Mario'], 'composizione')
+    return matrice
+
+
+def sovrascrivi_senza_toccare_le_cartelle(percorso, contenuto):
+    """Sovrascrive un'immagine e riporta le cartelle alle date di modifica precedenti."""
+    cartelle = [os.path.dirname(percorso), os.path.dirname(os.path.dirname(percorso))]
+    date = {cartella: os.stat(cartella).st_mtime_ns for cartella in cartelle}
+    info = os.stat(percorso)
+
+    with open(percorso, 'wb') as f:
+        f.write(contenuto)
+    os.utime(percorso, ns=(info.st_atime_ns, info.st_mtime_ns + 1_000_000))
+    for cartella, mtime in date.items():
+        os.utime(cartella, ns=(mtime, mtime))
+
+
+def test_istantanea_riaperta_se_nulla_cambia(tmp_path):
+    (tmp_path / 'cache').mkdir()
+    cartella = crea_volti(tmp_path / 'volti')
+    matrice = salva(tmp_path, cartella)
+
+    letta, nomi, composizione = leggi_istantanea(str(tmp_path / 'cache'), cartella)
+    assert isinstance(letta, np.memmap)
+    assert np.array_equal(letta, matrice)
+    assert nomi == ['Anna', 'Mario', 'Mario'] and composizione == 'composizione'
+
+
+def test_immagine_sovrascritta_sul_posto_invalida_l_istantanea(tmp_path):
+    (tmp_path / 'cache').mkdir()
+    cartella = crea_volti(tmp_path / 'volti')
+    salva(tmp_path, cartella)
+
+    sovrascrivi_senza_toccare_le_cartelle(os.path.join(cartella, 'Mario', 'fronte.jpg'), b'fronte')
+    assert leggi_istantanea(str(tmp_path / 'cache'), cartella) is None
+
+
+def test_immagine_aggiunta_o_rimossa_invalida_l_istantanea(tmp_path):
+    (tmp_path / 'cache').mkdir()
+    cartella = crea_volti(tmp_path / 'volti')
+
+    salva(tmp_path, cartella)
+    (tmp_path / 'volti' / 'Mario' / 'nuova.jpg').write_bytes(b'nuova')
+    assert leggi_istantanea(str(tmp_path / 'cache'), cartella) is None
+
+    salva(tmp_path, cartella)
+    os.remove(os.path.join(cartella, 'Anna.jpg'))
+    assert leggi_istantanea(str(tmp_path / 'cache'), cartella) is None
@@ -0,0 +1,95 @@
+import pickle
+import threading
+
+import numpy as np
+import pytest
+
+from src.utils.IstogrammaTempi import IstogrammaTempi
+
+# Errore relativo massimo dei quantili: metà intervallo su 8 per potenza di 2, più l'arrotondamento del rango
+TOLLERANZA = 1 / 16 + 0.01
+
+
+def durate_lognormali(numero=20000, seed=0):
+    """Durate in ns con la coda lunga tipica delle fasi della pipeline (mediana ~2 ms)."""
+    return np.random.default_rng(seed).lognormal(np.log(2e6), 0.8, numero).astype(np.int64)
+
+
+def istogramma_di(durate):
+    istogramma = IstogrammaTempi()
+    for durata in durate:
+        istogramma.aggiungi(durata)
+    return istogramma
+
+
+@pytest.mark.parametrize('q', [0.01, 0.5, 0.9, 0.95, 0.99, 0.999])
+def test_quantili_entro_l_errore_dichiarato(q):
+    durate = durate_lognormali()
+    stimato = istogramma_di(durate).quantile(q)
+    atteso = np.quantile(durate, q, method='inverted_cdf')
+
+    assert abs(stimato - atteso) / atteso <= TOLLERANZA
+
+
+def test_conteggio_somma_minimo_e_massimo_esatti():
+    durate = durate_lognormali(1000)
+    istogramma = istogramma_di(durate)
+
+    assert len(istogramma) == 1000
+    assert istogramma.totale == int(durate.sum())
+    assert (istogramma.minimo, istogramma.massimo) == (int(durate.min()), int(durate.max()))
+
+    riepilogo = istogramma.riepilogo()
+    assert riepilogo['media_ms'] == pytest.approx(durate.mean() / 1e6)
+    assert riepilogo['massimo_ms'] == durate.max() / 1e6
+    assert riepilogo['p50_ms'] <= riepilogo['p95_ms'] <= riepilogo['p99_ms'] <= riepilogo['massimo_ms']
+
+
+def test_valori_piccoli_esatti_e_istogramma_vuoto():
+    istogramma = istogramma_di(range(16))
+    assert [istogramma.quantile(q) for q in (0.25, 0.5, 1.0)] == [3.5, 7.5, 15.0]
+    assert IstogrammaTempi().quantile(0.5) == 0.0
+    assert IstogrammaTempi().riepilogo()['media_ms'] == 0.0
+
+
+def test_unione_equivale_a_un_unico_istogramma():
+    durate = durate_lognormali(5000)
+    parti = [istogramma_di(parte) for parte in np.array_split(durate, 3)]
+    unito = IstogrammaTempi()
+    for parte in parti:
+        unito.unisci(parte)
+
+    completo = istogramma_di(durate)
+    assert unito.riepilogo() == completo.riepilogo()
+    assert unito.conteggi == completo.conteggi
+
+
+def test_conteggi_cumulati_per_prometheus():
+    durate = durate_lognormali(5000)
+    istogramma = istogramma_di(durate)
+    limiti = [1e6, 2e6, 5e6, 1e7, 1e12]
+
+    cumulati, conteggio, totale = istogramma.conteggi_cumulati(limiti)
+
+    assert cumulati == sorted(cumulati)
+    assert cumulati[-1] == conteggio == len(durate)
+    assert totale == int(durate.sum())
+    for limite, cumulato in zip(limiti, cumulati):
+        # Solo intervalli interamente sotto il limite: mai più dei valori reali, e ogni intervallo è largo al più 1/8
+        assert (durate <= limite * 8 / 9).sum() <= cumulato <= (durate <= limite).sum()
+
+
+def test_inserimenti_concorrenti_e_pickle():
+    istogramma = IstogrammaTempi()
+    thread = [threading.Thread(target=lambda: [istogramma.aggiungi(1000 + indice) for indice in range(5000)])
+              for _ in range(4)]
+    for t in thread:
+        t.start()
+    for t in thread:
+        t.join()
+
+    assert len(istogramma) == 20000
+    copia = pickle.loads(pickle.dumps(istogramma))
+    assert copia.riepilogo() == istogramma.riepilogo()
+    copia.aggiungi(1)
+    assert len(copia) == 20001
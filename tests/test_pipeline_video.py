@@ -0,0 +1,72 @@
+import random
+import threading
+import time
+
+import pytest
+
+from src.utils.PipelineVideo import PipelineVideo
+
+# Durata simulata dell'embedding di un ritaglio: time.sleep rilascia il GIL come onnxruntime,
+# quindi i worker si sovrappongono come su una macchina con un core libero per worker
+DURATA_RITAGLIO = 0.01
+
+
+def esegui(frame, numero_worker, dimensione_lavoro=32, casuale=False):
+    """Esegue la pipeline su frame già composti da liste di ritagli; restituisce lavori applicati, thread e durata."""
+    applicati = []
+    thread = {}
+
+    def identifica(ritagli):
+        time.sleep(DURATA_RITAGLIO * len(ritagli) * (random.random() + 0.5 if casuale else 1))
+        for ritaglio in ritagli:
+            thread[ritaglio] = threading.current_thread().name
+        return [ritaglio * 10 for ritaglio in ritagli]
+
+    def applica(ritagli, esito, errore):
+        assert errore is None and esito == [ritaglio * 10 for ritaglio in ritagli]
+        applicati.append(ritagli)
+
+    pipeline = PipelineVideo(lambda indice, ritagli: ritagli, identifica, applica,
+                             numero_worker=numero_worker, dimensione_coda=8, dimensione_lavoro=dimensione_lavoro)
+    inizio = time.perf_counter()
+    pipeline.esegui(frame)
+    return applicati, thread, time.perf_counter() - inizio
+
+
+def frame_con_tracce(numero_frame, tracce):
+    return [[indice * tracce + traccia for traccia in range(tracce)] for indice in range(numero_frame)]
+
+
+@pytest.mark.parametrize('numero_ritagli,numero_worker,dimensione_lavoro,attese', [
+    (5, 4, 32, [2, 1, 1, 1]),
+    (1, 4, 32, [1]),
+    (10, 1, 4, [4, 3, 3]),
+    (100, 2, 32, [25, 25, 25, 25]),
+])
+def test_ritagli_di_un_frame_divisi_tra_i_worker(numero_ritagli, numero_worker, dimensione_lavoro, attese):
+    pipeline = PipelineVideo(None, None, None, numero_worker=numero_worker, dimensione_lavoro=dimensione_lavoro)
+    lavori = pipeline._dividi(list(range(numero_ritagli)))
+
+    assert [len(lavoro) for lavoro in lavori] == attese
+    assert [ritaglio for lavoro in lavori for ritaglio in lavoro] == list(range(numero_ritagli))
+
+
+def test_esiti_applicati_in_ordine_di_frame_e_ritaglio():
+    frame = frame_con_tracce(30, 3)
+    applicati, _, _ = esegui(frame, numero_worker=4, casuale=True)
+
+    assert [ritaglio for lavoro in applicati for ritaglio in lavoro] == [r for ritagli in frame for r in ritagli]
+
+
+def test_tracce_dello_stesso_frame_su_worker_diversi():
+    _, thread, _ = esegui(frame_con_tracce(1, 4), numero_worker=4)
+    assert len(set(thread.values())) == 4
+
+
+def test_accelerazione_con_piu_worker():
+    frame = frame_con_tracce(12, 4)
+    _, _, seriale = esegui(frame, numero_worker=1)
+    _, _, parallela = esegui(frame, numero_worker=4)
+
+    # 4 tracce per frame su 4 worker: idealmente 4 volte più veloce
+    assert seriale / parallela > 2.5
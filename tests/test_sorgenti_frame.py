@@ -0,0 +1,99 @@
+import functools
+import http.server
+import shutil
+import socket
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from src.config.configurazione_attuale import configurazione
+from src.utils.SorgentiFrame import SorgenteFile, SorgenteLive, crea_sorgente
+
+NUMERO_FRAME = 50
+FPS = 25
+
+
+@pytest.fixture
+def video(tmp_path):
+    """Video MJPG di NUMERO_FRAME frame con il numero del frame nell'intensità."""
+    percorso = tmp_path / 'video.avi'
+    scrittore = cv2.VideoWriter(str(percorso), cv2.VideoWriter_fourcc(*'MJPG'), FPS, (160, 120))
+    for indice in range(NUMERO_FRAME):
+        scrittore.write(np.full((120, 160, 3), indice * 4, dtype=np.uint8))
+    scrittore.release()
+    return percorso
+
+
+def porta_libera():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def consuma(sorgente, pausa=0.0):
+    consegnati = 0
+    with sorgente:
+        while sorgente.avanza():
+            assert sorgente.frame() is not None
+            consegnati += 1
+            time.sleep(pausa)
+    return consegnati, sorgente.metriche()
+
+
+def test_webcam_zero_configurata_non_ricade_sul_video(monkeypatch):
+    monkeypatch.setattr(configurazione, 'SORGENTE_VIDEO', 0)
+    sorgente = crea_sorgente()
+    assert isinstance(sorgente, SorgenteLive) and sorgente.sorgente == 0
+
+    monkeypatch.setattr(configurazione, 'SORGENTE_VIDEO', None)
+    sorgente = crea_sorgente()
+    assert isinstance(sorgente, SorgenteFile) and sorgente.sorgente == configurazione.PATHVIDEOTAGLIATO
+
+
+def test_flusso_http_con_consumatore_lento_scarta_i_frame_vecchi(video):
+    gestore = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(video.parent))
+    gestore.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), gestore)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        sorgente = SorgenteLive(f'http://127.0.0.1:{server.server_port}/{video.name}', cv2.CAP_FFMPEG,
+                                dimensione_buffer=2)
+        consegnati, metriche = consuma(sorgente, pausa=0.02)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert sorgente.tipo == 'live' and metriche['tipo'] == 'live'
+    assert metriche['frame_letti'] == NUMERO_FRAME
+    assert metriche['frame_consegnati'] == consegnati
+    # Il lettore va più veloce del consumatore: il buffer da 2 frame scarta i più vecchi
+    assert metriche['frame_scartati'] > 0
+    assert metriche['frame_consegnati'] + metriche['frame_scartati'] == NUMERO_FRAME
+    assert 0 < metriche['latenza_media_ms'] <= metriche['latenza_massima_ms']
+    assert metriche['fps_acquisizione'] > metriche['fps_consegna'] > 0
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg non installato')
+def test_flusso_udp_mpegts_al_ritmo_reale(video):
+    porta = porta_libera()
+    mittente = subprocess.Popen(['ffmpeg', '-loglevel', 'error', '-re', '-i', str(video),
+                                 '-c:v', 'mpeg4', '-f', 'mpegts', f'udp://127.0.0.1:{porta}?pkt_size=1316'])
+    try:
+        sorgente = SorgenteLive(f'udp://127.0.0.1:{porta}?timeout=5000000', cv2.CAP_FFMPEG, dimensione_buffer=4)
+        consegnati, metriche = consuma(sorgente)
+    finally:
+        mittente.kill()
+        mittente.wait()
+
+    # Parte dei frame iniziali può andare persa prima che la cattura sia in ascolto
+    assert 0 < metriche['frame_letti'] <= NUMERO_FRAME
+    assert metriche['frame_consegnati'] == consegnati
+    assert metriche['frame_consegnati'] + metriche['frame_scartati'] == metriche['frame_letti']
+    # -re invia al ritmo del video: l'acquisizione segue gli FPS della sorgente
+    assert FPS / 2 < metriche['fps_acquisizione'] < FPS * 2
+    assert metriche['latenza_massima_ms'] < 1000
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from src.utils.StatisticaFlusso import StatisticaFlusso
+
+
+def flusso_di(valori, **parametri):
+    statistica = StatisticaFlusso(**parametri)
+    for valore in valori:
+        statistica.aggiungi(valore)
+    return statistica
+
+
+def test_media_e_varianza_come_numpy():
+    valori = np.random.default_rng(0).normal(0.6, 0.15, 10000)
+    statistica = flusso_di(valori)
+
+    assert len(statistica) == 10000
+    assert statistica.media == pytest.approx(valori.mean(), rel=1e-12)
+    assert statistica.varianza == pytest.approx(valori.var(ddof=1), rel=1e-10)
+    assert statistica.deviazione_standard == pytest.approx(valori.std(ddof=1), rel=1e-10)
+    assert (statistica.minimo, statistica.massimo) == (valori.min(), valori.max())
+
+
+def test_welford_stabile_con_media_grande():
+    # La formula ingenua somma dei quadrati - quadrato della somma perde tutte le cifre significative
+    valori = 1e9 + np.random.default_rng(1).normal(0, 1, 10000)
+    assert flusso_di(valori).varianza == pytest.approx(valori.var(ddof=1), rel=1e-6)
+
+
+def test_unione_di_parti_equivale_al_flusso_completo():
+    valori = np.random.default_rng(2).exponential(3.0, 9000)
+    unita = StatisticaFlusso(minimo=0.0, massimo=30.0, intervalli=50)
+    for parte in np.array_split(valori, [10, 4000, 4001]):
+        unita.unisci(flusso_di(parte, minimo=0.0, massimo=30.0, intervalli=50))
+    unita.unisci(StatisticaFlusso(minimo=0.0, massimo=30.0, intervalli=50))
+
+    completa = flusso_di(valori, minimo=0.0, massimo=30.0, intervalli=50)
+    assert unita.conteggio == completa.conteggio
+    assert unita.media == pytest.approx(completa.media, rel=1e-12)
+    assert unita.varianza == pytest.approx(completa.varianza, rel=1e-10)
+    assert (unita.minimo, unita.massimo) == (completa.minimo, completa.massimo)
+    assert list(unita.conteggi) == list(completa.conteggi)
+
+
+def test_unione_in_una_statistica_vuota():
+    parte = flusso_di([1.0, 2.0, 4.0])
+    vuota = StatisticaFlusso()
+    vuota.unisci(parte)
+
+    assert vuota.riepilogo() == parte.riepilogo()
+
+
+@pytest.mark.parametrize('q', [0.05, 0.5, 0.95, 0.99])
+def test_quantili_entro_mezzo_intervallo(q):
+    valori = np.random.default_rng(3).beta(5, 2, 20000)
+    statistica = flusso_di(valori, intervalli=100)
+
+    assert abs(statistica.quantile(q) - np.quantile(valori, q)) <= 0.5 / 100 + 1e-3
+
+
+def test_valori_fuori_intervallo_e_senza_istogramma():
+    statistica = flusso_di([-0.5, 0.5, 1.5], intervalli=10)
+    assert statistica.conteggi[0] == 1 and statistica.conteggi[-1] == 1
+    # I quantili restano al centro degli intervalli estremi
+    assert statistica.quantile(0.0) == pytest.approx(0.05) and statistica.quantile(1.0) == pytest.approx(0.95)
+    assert (statistica.minimo, statistica.massimo) == (-0.5, 1.5)
+
+    senza_istogramma = flusso_di([0.2, 0.4])
+    assert senza_istogramma.quantile(0.5) is None
+    assert 'p50' not in senza_istogramma.riepilogo()
+    assert StatisticaFlusso().varianza == 0.0